@@ -0,0 +1,482 @@
+#!/usr/bin/env python3
+"""
+Approximate nearest-neighbor search over the flat index (IVF-PQ).
+
+``AIRST_VECTOR_BACKEND=ivf`` stores chunks exactly like the ``flat`` backend,
+in the same directory (see flat_index.py), and adds to each user's index an
+inverted file with product-quantized residuals, built locally with NumPy:
+
+- ``IVF_NLIST`` coarse centroids (spherical k-means); each row is filed under
+  its nearest one
+- the row's residual to that centroid is split into ``IVF_PQ_M`` sub-vectors,
+  each stored as one byte: the nearest of 256 sub-centroids
+
+A query scores the rows of the ``IVF_NPROBE`` nearest lists from lookup tables
+(no vector reads), then re-scores the best ``IVF_RERANK`` exactly against the
+float16 vectors. Rows written since the build are searched exactly alongside
+it and rows deleted since are skipped, so results are never stale. Once those
+reach ``IVF_REBUILD_FRACTION`` of the build, a rebuild starts in a background
+thread and searches keep using the previous build until the new one replaces
+it. Indexes under ``IVF_MIN_ROWS`` chunks are searched exactly and not built.
+
+    python ann_index.py build --user alice
+    python ann_index.py recall --user alice --k 10 --nprobe 8 16 32 64
+
+``recall`` reports recall@k and latency against exact search for each search
+setting, to tune them for a tenant.
+
+A build refers to rows by file (its id and the segment it was added in, see
+``FlatIndex.add``) and position in the file, so flat compactions, which move
+rows between segments, do not invalidate it.
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import shutil
+import argparse
+import threading
+
+import numpy as np
+
+from flat_index import FlatIndex, FlatBackend, _unit_vectors, _SCORE_BLOCK_ROWS
+
+# Chunks below which a user's index is searched exactly and not built
+IVF_MIN_ROWS = int(os.getenv("AIRST_IVF_MIN_ROWS", 50_000))
+
+# Coarse lists per build; 0 picks about 4 * sqrt(rows)
+IVF_NLIST = int(os.getenv("AIRST_IVF_NLIST", 0))
+
+# Bytes per vector; rounded down to a divisor of the embedding dimension
+IVF_PQ_M = int(os.getenv("AIRST_IVF_PQ_M", 48))
+
+# Rows sampled to train the coarse and PQ centroids
+IVF_TRAIN_ROWS = int(os.getenv("AIRST_IVF_TRAIN_ROWS", 65_536))
+
+# Lists scanned per query
+IVF_NPROBE = int(os.getenv("AIRST_IVF_NPROBE", 32))
+
+# Candidates re-scored exactly per query
+IVF_RERANK = int(os.getenv("AIRST_IVF_RERANK", 256))
+
+# Rows added, re-ingested or deleted since the build, as a share of it, that trigger a rebuild
+IVF_REBUILD_FRACTION = float(os.getenv("AIRST_IVF_REBUILD_FRACTION", 0.1))
+
+KMEANS_ITERATIONS = 10
+
+# Sub-centroids per PQ sub-vector (one byte)
+PQ_CENTROIDS = 256
+
+BUILD_POINTER_NAME = "ivf.json"
+
+def _nearest(rows, centroids, spherical=False):
+    """Index of each row's nearest centroid: by inner product if ``spherical``, else by L2."""
+    bias = None if spherical else -0.5 * np.einsum("ij,ij->i", centroids, centroids)
+    nearest = np.empty(len(rows), dtype=np.int64)
+    for start in range(0, len(rows), 4096):
+        scores = rows[start:start + 4096] @ centroids.T
+        if bias is not None:
+            scores += bias
+        nearest[start:start + 4096] = np.argmax(scores, axis=1)
+    return nearest
+
+def _kmeans(sample, k, rng, spherical=False, iterations=KMEANS_ITERATIONS):
+    """``k`` centroids of ``sample``; spherical centroids are unit length."""
+    k = min(k, len(sample))
+    centroids = sample[rng.choice(len(sample), k, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = _nearest(sample, centroids, spherical)
+        counts = np.bincount(assignment, minlength=k)
+        filled = counts > 0
+        sums = np.zeros_like(centroids)
+        sums[filled] = np.add.reduceat(sample[np.argsort(assignment)], (np.cumsum(counts) - counts)[filled])
+        # Empty clusters restart from random rows
+        centroids = np.where(filled[:, None], sums / np.maximum(counts, 1)[:, None],
+                             sample[rng.choice(len(sample), k)])
+        if spherical:
+            centroids = _unit_vectors(centroids)
+    return centroids.astype(np.float32)
+
+def _pq_m(dimensions, m):
+    m = max(1, min(m, dimensions))
+    while dimensions % m:
+        m -= 1
+    return m
+
+def _file_key(run):
+    """(file_id, origin) of a manifest run; ``FlatIndex`` gives every run an origin."""
+    return run[0], run[3]
+
+def _score_rows(vectors, rows, query):
+    """Scores of ``rows`` (sorted) of float16 ``vectors``, converted in blocks."""
+    scores = np.empty(len(rows), dtype=np.float32)
+    for start in range(0, len(rows), _SCORE_BLOCK_ROWS):
+        block = np.asarray(vectors[rows[start:start + _SCORE_BLOCK_ROWS]], dtype=np.float32)
+        np.dot(block, query, out=scores[start:start + len(block)])
+    return scores
+
+class IvfBuild:
+    """A finished build, memory-mapped from its directory."""
+
+    def __init__(self, directory):
+        self.name = os.path.basename(directory)
+        with open(os.path.join(directory, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        self.params = meta["params"]
+        self.rows = meta["rows"]
+        self.files = [tuple(key) for key in meta["files"]]
+        load = lambda name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+        self.centroids = np.asarray(load("centroids"))
+        self.codebooks = np.asarray(load("codebooks"))
+        self.list_offsets = np.asarray(load("list_offsets"))
+        self.codes = load("codes")
+        self.keys = load("keys")
+
+    def candidates(self, query, nprobe, rerank):
+        """
+        Approximate best ``rerank`` rows for a unit ``query``.
+
+        Returns:
+            numpy.ndarray: (index into ``files``, position in the file) rows
+        """
+        list_scores = self.centroids @ query
+        nprobe = min(nprobe, len(list_scores))
+        probed = np.argpartition(-list_scores, nprobe - 1)[:nprobe]
+        starts, stops = self.list_offsets[probed], self.list_offsets[probed + 1]
+        if not (stops - starts).sum():
+            return np.empty((0, 2), dtype=np.int32)
+        rows = np.concatenate([np.arange(start, stop) for start, stop in zip(starts, stops)])
+
+        # q . (centroid + residual): the list's score plus one table lookup per sub-vector
+        m, _, sub = self.codebooks.shape
+        table = np.einsum("jkd,jd->jk", self.codebooks, query.reshape(m, sub))
+        scores = np.repeat(list_scores[probed], stops - starts)
+        scores += table[np.arange(m), self.codes[rows]].sum(axis=1)
+
+        k = min(rerank, len(rows))
+        return self.keys[rows[np.argpartition(-scores, k - 1)[:k]]]
+
+class IvfIndex(FlatIndex):
+    """A flat index searched through its latest IVF-PQ build."""
+
+    def __init__(self, directory, username=None):
+        super().__init__(directory, username)
+        self._build = None
+        self._build_stamp = None
+        self._view = None          # (build name, file locations, rows searched exactly, stale rows)
+        self._build_thread = None
+        self._build_error = None
+
+    def _set_manifest(self, manifest, stamp):
+        super()._set_manifest(manifest, stamp)
+        self._view = None
+
+    # ---------- Builds ----------
+
+    def _current_build(self):
+        """The latest finished build, reloaded if another process replaced it; None if never built."""
+        pointer = self._path(BUILD_POINTER_NAME)
+        try:
+            stat = os.stat(pointer)
+            stamp = (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            stamp = None
+        if stamp != self._build_stamp:
+            build = None
+            if stamp is not None:
+                with open(pointer, "r", encoding="utf-8") as f:
+                    build = IvfBuild(self._path(json.load(f)["build"]))
+            self._build, self._build_stamp = build, stamp
+        return self._build
+
+    def build(self, nlist=None, m=None, train_rows=None, seed=0, log=print):
+        """
+        Build the IVF-PQ index of the chunks stored now and make it current.
+
+        Args:
+            nlist (int): Coarse lists (default ``IVF_NLIST``)
+            m (int): Bytes per vector (default ``IVF_PQ_M``)
+            train_rows (int): Rows sampled for training (default ``IVF_TRAIN_ROWS``)
+
+        Returns:
+            dict: rows, nlist, m, train_rows and seconds; None for an empty index
+        """
+        start = time.perf_counter()
+        with self._lock:
+            segments = self._open_segments()
+            manifest = self._manifest
+        for *_, records in segments:
+            records.close()
+
+        # Open maps stay readable if a compaction removes their segments meanwhile
+        files, parts = [], []
+        for segment, (_, vectors, *_) in zip(manifest["segments"], segments):
+            for run in segment["files"]:
+                files.append(_file_key(run))
+                parts.append((vectors, run[1], run[2]))
+        rows = sum(stop - first for _, first, stop in parts)
+        if not rows:
+            return None
+
+        dimensions = manifest["dimensions"]
+        nlist = nlist or IVF_NLIST or max(1, int(4 * rows ** 0.5))
+        m = _pq_m(dimensions, m or IVF_PQ_M)
+        rng = np.random.default_rng(seed)
+
+        def blocks():
+            """(first row, float32 vectors) covering every row in ``parts`` order."""
+            row = 0
+            for vectors, first, stop in parts:
+                for begin in range(first, stop, _SCORE_BLOCK_ROWS):
+                    block = np.asarray(vectors[begin:min(begin + _SCORE_BLOCK_ROWS, stop)], dtype=np.float32)
+                    yield row, block
+                    row += len(block)
+
+        sample_rows = np.sort(rng.choice(rows, min(rows, train_rows or IVF_TRAIN_ROWS), replace=False))
+        sample = np.empty((len(sample_rows), dimensions), dtype=np.float32)
+        for first, block in blocks():
+            low, high = np.searchsorted(sample_rows, [first, first + len(block)])
+            sample[low:high] = block[sample_rows[low:high] - first]
+
+        centroids = _kmeans(sample, nlist, rng, spherical=True)
+        nlist = len(centroids)
+        residuals = sample - centroids[_nearest(sample, centroids, spherical=True)]
+        sub = dimensions // m
+        codebooks = np.stack([_kmeans(residuals[:, j * sub:(j + 1) * sub], PQ_CENTROIDS, rng) for j in range(m)])
+        del sample, residuals
+        log(f"🧮 Trained {nlist} lists and {m}-byte codes on {len(sample_rows)} chunks")
+
+        # (file, position in the file) and list of every row
+        keys = np.empty((rows, 2), dtype=np.int32)
+        row = 0
+        for file_index, (_, first, stop) in enumerate(parts):
+            keys[row:row + stop - first] = [file_index, 0]
+            keys[row:row + stop - first, 1] = np.arange(stop - first)
+            row += stop - first
+        assignment = np.empty(rows, dtype=np.int64)
+        codes = np.empty((rows, m), dtype=np.uint8)
+        for first, block in blocks():
+            lists = _nearest(block, centroids, spherical=True)
+            assignment[first:first + len(block)] = lists
+            block = block - centroids[lists]
+            for j in range(m):
+                codes[first:first + len(block), j] = _nearest(block[:, j * sub:(j + 1) * sub], codebooks[j])
+
+        order = np.argsort(assignment, kind="stable")
+        list_offsets = np.zeros(nlist + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignment, minlength=nlist), out=list_offsets[1:])
+
+        name = f"ivf-{uuid.uuid4().hex[:12]}"
+        directory = self._path(name)
+        params = {"nlist": nlist, "m": m, "train_rows": len(sample_rows)}
+        # Another process's swap deletes every build but its own, so only write under the lock
+        with self._write_lock:
+            os.makedirs(directory)
+            try:
+                arrays = {"centroids": centroids, "codebooks": codebooks, "list_offsets": list_offsets,
+                          "codes": codes[order], "keys": keys[order]}
+                for array_name, array in arrays.items():
+                    np.save(os.path.join(directory, f"{array_name}.npy"), array)
+                with open(os.path.join(directory, "meta.json"), "w", encoding="utf-8") as f:
+                    f.write(json.dumps({"params": params, "rows": rows, "files": files}))
+                self._swap_build(name)
+            except BaseException:
+                shutil.rmtree(directory, ignore_errors=True)
+                raise
+
+        seconds = time.perf_counter() - start
+        log(f"🏗️ Built IVF index of {rows} chunks for {self.username} in {seconds:.1f} s")
+        return dict(params, rows=rows, seconds=seconds)
+
+    def _swap_build(self, name):
+        """Make build ``name`` current and delete the one it replaces; the caller holds ``_write_lock``."""
+        pointer = self._path(BUILD_POINTER_NAME)
+        with self._lock:
+            temp_path = f"{pointer}.{os.getpid()}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                f.write(json.dumps({"build": name}))
+            os.replace(temp_path, pointer)
+            self._current_build()
+        # Searches still holding the old build's maps finish on them. Also drops builds
+        # left by killed processes
+        for entry in os.scandir(self.directory):
+            if entry.name.startswith("ivf-") and entry.name != name:
+                shutil.rmtree(entry.path, ignore_errors=True)
+
+    def start_build(self):
+        """
+        Build in a background thread, unless one is running, the index is under
+        ``IVF_MIN_ROWS`` chunks or a background build already failed.
+
+        Returns:
+            threading.Thread: The running build, or None
+        """
+        with self._lock:
+            if self._build_thread is not None and self._build_thread.is_alive():
+                return self._build_thread
+            if self._build_error is not None or self.count() < IVF_MIN_ROWS:
+                return None
+            self._build_thread = threading.Thread(
+                target=self._background_build, name=f"ivf-{self.name}", daemon=True
+            )
+            self._build_thread.start()
+            return self._build_thread
+
+    def _background_build(self):
+        try:
+            self.build()
+        except Exception as e:
+            # Not retried in this process; searches stay exact or on the previous build
+            self._build_error = e
+            print(f"❌ IVF build for {self.username} failed: {e}")
+
+    # ---------- Search ----------
+
+    def _current_view(self, build):
+        """
+        Where the build's files are now and which rows it misses.
+
+        Returns:
+            tuple: {file index: (segment position, first row)}, {segment position:
+            rows to search exactly}, rows added or removed since the build
+        """
+        if self._view is not None and self._view[0] == build.name:
+            return self._view[1:]
+
+        files = {key: file_index for file_index, key in enumerate(build.files)}
+        locations, unbuilt = {}, {}
+        stale = build.rows
+        for position, segment in enumerate(self._manifest["segments"]):
+            for run in segment["files"]:
+                file_index = files.get(_file_key(run))
+                if file_index is not None:
+                    locations[file_index] = (position, run[1])
+                    stale -= run[2] - run[1]
+                else:
+                    unbuilt.setdefault(position, []).append(np.arange(run[1], run[2]))
+                    stale += run[2] - run[1]
+        unbuilt = {position: np.concatenate(rows) for position, rows in unbuilt.items()}
+
+        self._view = (build.name, locations, unbuilt, stale)
+        return locations, unbuilt, stale
+
+    def query(self, embedding, top_k=5, nprobe=None, rerank=None):
+        with self._lock:
+            build = self._current_build()
+            if build is not None:
+                segments = self._open_segments()
+                locations, unbuilt, stale = self._current_view(build)
+        if build is None:
+            self.start_build()
+            return super().query(embedding, top_k)
+        if stale > IVF_REBUILD_FRACTION * build.rows:
+            self.start_build()
+
+        query = _unit_vectors(embedding)[0]
+        try:
+            # Approximate candidates from the build, still stored, mapped to where they are now
+            rows = {}
+            for file_index, offset in build.candidates(query, nprobe or IVF_NPROBE,
+                                                       max(rerank or IVF_RERANK, top_k)).tolist():
+                location = locations.get(file_index)
+                if location is not None:
+                    rows.setdefault(location[0], []).append(location[1] + offset)
+            rows = {position: np.sort(found) for position, found in rows.items()}
+
+            candidates = []
+            for position, found in list(rows.items()) + list(unbuilt.items()):
+                scores = _score_rows(segments[position][1], found, query)
+                k = min(top_k, len(found))
+                for best in np.argpartition(-scores, k - 1)[:k]:
+                    candidates.append((float(scores[best]), position, int(found[best])))
+            return self._read_results(segments, candidates, top_k)
+        finally:
+            for *_, records in segments:
+                records.close()
+
+class IvfBackend(FlatBackend):
+    """Per-user flat indexes searched through IVF-PQ builds."""
+
+    index_class = IvfIndex
+
+def measure_recall(index, top_k=10, queries=100, nprobe=None, rerank=None, seed=0):
+    """
+    Recall@k of ``index``'s approximate search against exact search.
+
+    Queries are stored chunk embeddings plus Gaussian noise (about 0.7 cosine
+    to the chunk), so they land where real queries do.
+
+    Returns:
+        dict: recall, ann_ms and exact_ms (median latencies)
+    """
+    rng = np.random.default_rng(seed)
+    with index._lock:
+        segments = index._open_segments()
+    for *_, records in segments:
+        records.close()
+    live = [np.arange(len(vectors)) if mask is None else np.flatnonzero(mask) for _, vectors, _, mask, _ in segments]
+    sizes = np.cumsum([0] + [len(rows) for rows in live])
+    samples = []
+    for row in rng.choice(sizes[-1], queries):
+        position = np.searchsorted(sizes, row, side="right") - 1
+        vector = np.asarray(segments[position][1][live[position][row - sizes[position]]], dtype=np.float32)
+        samples.append(vector + rng.normal(scale=len(vector) ** -0.5, size=len(vector)))
+
+    key = lambda result: (result[0], result[3]["chunk"])
+    hits, ann_times, exact_times = 0, [], []
+    for query in samples:
+        start = time.perf_counter()
+        approximate = index.query(query, top_k, nprobe=nprobe, rerank=rerank)
+        ann_times.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        exact = FlatIndex.query(index, query, top_k)
+        exact_times.append(time.perf_counter() - start)
+        hits += len({key(result) for result in approximate} & {key(result) for result in exact})
+
+    return {
+        "recall": hits / max(1, top_k * len(samples)),
+        "ann_ms": float(np.median(ann_times)) * 1000,
+        "exact_ms": float(np.median(exact_times)) * 1000
+    }
+
+def main():
+    from vector_store import FLAT_INDEX_PATH
+
+    parser = argparse.ArgumentParser(description="Build a user's IVF-PQ index or measure its recall.")
+    parser.add_argument("command", choices=["build", "recall"])
+    parser.add_argument("--user", required=True, help="User whose index is built or measured")
+    parser.add_argument("--path", default=FLAT_INDEX_PATH, help="Index directory (default: AIRST_FLAT_INDEX_PATH)")
+    parser.add_argument("--nlist", type=int, help="Coarse lists (default: AIRST_IVF_NLIST, else 4 * sqrt(chunks))")
+    parser.add_argument("--m", type=int, default=IVF_PQ_M, help="Bytes per vector")
+    parser.add_argument("--k", type=int, default=10, help="Results per query")
+    parser.add_argument("--queries", type=int, default=100, help="Queries sampled from the index")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[IVF_NPROBE], help="Lists scanned per query")
+    parser.add_argument("--rerank", type=int, nargs="+", default=[IVF_RERANK], help="Candidates re-scored exactly")
+    args = parser.parse_args()
+
+    index = IvfBackend(args.path).user_index(args.user)
+    if not index.count():
+        print(f"❌ No chunks for {args.user} in {args.path}")
+        return False
+
+    if args.command == "build":
+        return index.build(nlist=args.nlist, m=args.m) is not None
+
+    build = index._current_build()
+    if build is None:
+        print(f"❌ No IVF index for {args.user} yet; run the build command first")
+        return False
+    print(f"📏 recall@{args.k} over {args.queries} queries: {index.count()} chunks, {build.params['nlist']} lists, "
+          f"{build.params['m']}-byte codes")
+    for nprobe in args.nprobe:
+        for rerank in args.rerank:
+            result = measure_recall(index, args.k, args.queries, nprobe, rerank)
+            print(f"   nprobe {nprobe:4d}, rerank {rerank:4d}: recall {result['recall']:.3f}, "
+                  f"{result['ann_ms']:6.1f} ms (exact {result['exact_ms']:6.1f} ms)")
+    return True
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
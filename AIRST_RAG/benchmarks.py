@@ -0,0 +1,537 @@
+#!/usr/bin/env python3
+"""
+Benchmark script for performance-sensitive parts of the AI pipeline
+
+Usage:
+    python benchmarks.py [domain] [cleaning] [segmentation] [extraction] [tables] [docx] [vectorstore]
+"""
+
+import os
+import re
+import sys
+import time
+import glob
+
+# Small labelled corpus for the domain classifier benchmark
+DOMAIN_SAMPLES = [
+    ("legal", "This Agreement is entered into by and between the parties hereinafter referred to as the Lessor and the Lessee. "
+              "The Lessee shall indemnify the Lessor against any liability arising pursuant to this contract. "
+              "Any dispute shall be settled by arbitration under the jurisdiction of the courts of Pune."),
+    ("legal", "The plaintiff filed a petition before the High Court alleging breach of the statute. "
+              "The defendant contends that the clause relied upon is void. The court held that the parties are bound."),
+    ("legal", "Terms of Service. By accessing the website you agree to be bound by these terms. "
+              "We reserve the right to terminate your account. Governing law: India."),
+    ("scientific", "Abstract. We propose a contrastive self-supervised learning method for human activity recognition. "
+                   "Experiments on three public datasets show improved accuracy over the baseline [12], [13]. "
+                   "Related work is reviewed in Section 2 and the evaluation protocol follows Chen et al. [4]."),
+    ("scientific", "In this paper we study the hypothesis that attention improves sequence modelling. "
+                   "Our algorithm is evaluated on benchmark datasets and compared with neural baselines."),
+    ("scientific", "The samples were incubated at 37 degrees for 24 hours and the optical density was measured. "
+                   "Statistical significance was assessed with a two-tailed t-test."),
+    ("report", "Executive Summary. Revenue for the fiscal quarter grew 12% and the budget remained on track. "
+               "Key findings and recommendations for stakeholders are listed below, together with KPI progress."),
+    ("report", "Quarterly progress report: all deliverables for milestone 3 were completed. "
+               "The objectives for the next quarter include expanding the pilot and reviewing the budget."),
+    ("report", "Annual report 2024. The company opened four new offices and hired 120 employees. "
+               "Management discusses performance and outlook in the following sections."),
+]
+
+def _time_calls(func, samples, repeats=1):
+    """Run func over samples and return (predictions, seconds per document)."""
+    predictions = []
+    start = time.perf_counter()
+    for _ in range(repeats):
+        predictions = [func(text) for _, text in samples]
+    elapsed = time.perf_counter() - start
+    return predictions, elapsed / (len(samples) * repeats)
+
+def benchmark_domain_cascade(samples=DOMAIN_SAMPLES, long_document_repeat=20):
+    """Compare the keyword/zero-shot cascade against zero-shot alone."""
+    from models import predict_domain_with_details
+
+    print("🔍 Domain classification: cascade vs zero-shot only")
+
+    # Long documents are where the full-premise zero-shot cost shows up
+    long_samples = [(label, " ".join([text] * long_document_repeat)) for label, text in samples]
+
+    for name, corpus in [("short", samples), ("long", long_samples)]:
+        for mode, use_cascade in [("zero-shot", False), ("cascade", True)]:
+            details, seconds = _time_calls(
+                lambda text: predict_domain_with_details(text, use_cascade=use_cascade), corpus
+            )
+            correct = sum(1 for (label, _), d in zip(corpus, details) if d["label"] == label)
+            skipped = sum(1 for d in details if d["method"] == "keyword")
+            print(f"   {name:5s} {mode:9s}: accuracy {correct}/{len(corpus)}, "
+                  f"{seconds * 1000:8.1f} ms/doc, zero-shot skipped {skipped}/{len(corpus)}")
+
+def _legacy_clean_text(text):
+    """The original eight-pass clean_text, kept as the benchmark baseline."""
+    text = re.sub(r"Page \d+", "", text)
+    text = re.sub(r"\b\d+\s*of\s*\d+\b", "", text)
+    text = re.sub(r"\n+", " ", text)
+    text = re.sub(r"\s+", " ", text)
+    text = re.sub(r"©\s*\d{4}", "", text)
+    text = re.sub(r"All rights reserved", "", text)
+    text = re.sub(r'\S+@\S+', '', text)
+    text = re.sub(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+', '', text)
+    return text.strip()
+
+def load_corpus_text(min_chars=4_000_000):
+    """Text extracted from the uploads corpus, repeated up to ``min_chars``."""
+    texts = []
+    try:
+        import fitz
+        for path in sorted(glob.glob(os.path.join("uploads", "*.pdf"))):
+            with fitz.open(path) as doc:
+                texts.append("\n".join(page.get_text() for page in doc))
+    except ImportError:
+        pass
+
+    if not texts:
+        # Synthetic extracted-PDF text with the artifacts clean_text removes
+        texts = [
+            "Page 3\nContrastive learning for activity recognition [12].\n"
+            "Contact: author@example.edu  https://example.org/paper?id=42\n"
+            "© 2024 All rights reserved\n3 of 17\n\n"
+            "We evaluate on UCI-HAR and report accuracy, F1 and latency.\n"
+        ]
+
+    corpus = "\n".join(texts)
+    return corpus * max(1, min_chars // max(len(corpus), 1) + 1)
+
+def benchmark_clean_text(repeats=3):
+    """Compare the precompiled cleaning engine with the original clean_text."""
+    from text_cleaning import apply_rules, clean_with_offsets
+
+    text = load_corpus_text()
+    print(f"🧹 clean_text on {len(text) / 1_000_000:.1f} MB of extracted text")
+
+    results = {}
+    for name, func in [
+        ("legacy (8 passes)", _legacy_clean_text),
+        ("engine", lambda t: apply_rules(t, "document")),
+        ("engine + offsets", lambda t: clean_with_offsets(t, "document")[0]),
+    ]:
+        start = time.perf_counter()
+        for _ in range(repeats):
+            results[name] = func(text)
+        seconds = (time.perf_counter() - start) / repeats
+        print(f"   {name:18s}: {seconds * 1000:8.1f} ms ({len(text) / seconds / 1_000_000:6.1f} MB/s)")
+
+    # The engine collapses whitespace after removals, the legacy code before
+    normalize = lambda t: " ".join(t.split())
+    baseline = normalize(results["legacy (8 passes)"])
+    for name, output in results.items():
+        print(f"   {name:18s}: output {'matches' if normalize(output) == baseline else 'DIFFERS from'} legacy")
+
+def _boundaries(text, sentences):
+    """End offsets of sentences located in text, for boundary comparison."""
+    ends = set()
+    position = 0
+    for sentence in sentences:
+        start = text.find(sentence, position)
+        if start >= 0:
+            position = start + len(sentence)
+            ends.add(position)
+    return ends
+
+def benchmark_segmentation(min_chars=2_000_000):
+    """Compare the rule-based segmenter with NLTK punkt for speed and agreement."""
+    from text_cleaning import apply_rules
+    from sentence_segmenter import sentence_spans
+
+    text = apply_rules(load_corpus_text(min_chars), "document")
+    print(f"✂️ Sentence segmentation on {len(text) / 1_000_000:.1f} MB of cleaned text")
+
+    start = time.perf_counter()
+    fast_spans = sentence_spans(text)
+    fast_seconds = time.perf_counter() - start
+    print(f"   fast segmenter: {fast_seconds * 1000:8.1f} ms, {len(fast_spans)} sentences")
+
+    from preprocessing import get_punkt_tokenizer
+    tokenizer = get_punkt_tokenizer()
+    if tokenizer is None:
+        print("   ⚠️ punkt unavailable, skipping comparison")
+        return
+
+    start = time.perf_counter()
+    punkt_sentences = tokenizer.tokenize(text)
+    punkt_seconds = time.perf_counter() - start
+
+    print(f"   nltk punkt    : {punkt_seconds * 1000:8.1f} ms, {len(punkt_sentences)} sentences "
+          f"({punkt_seconds / fast_seconds:.1f}x slower)")
+
+    fast_ends = {end for _, end in fast_spans}
+    punkt_ends = _boundaries(text, punkt_sentences)
+    agreed = len(fast_ends & punkt_ends)
+    precision = agreed / len(fast_ends) if fast_ends else 0.0
+    recall = agreed / len(punkt_ends) if punkt_ends else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    print(f"   boundary agreement with punkt: precision {precision:.3f}, recall {recall:.3f}, F1 {f1:.3f}")
+
+def benchmark_pdf_extraction(max_workers=None):
+    """Serial vs page-parallel extraction over the uploads corpus."""
+    from pdf_extraction import PDF_WORKERS, extract_pages, summarize_timings
+
+    paths = sorted(glob.glob(os.path.join("uploads", "*.pdf")))
+    if not paths:
+        print("   ⚠️ no PDFs in uploads/, skipping")
+        return
+
+    workers = max_workers or PDF_WORKERS
+    print(f"📄 PDF extraction on {len(paths)} files, {workers} workers")
+
+    for mode, mode_workers in [("serial", 1), ("parallel", workers)]:
+        pages = []
+        start = time.perf_counter()
+        for path in paths:
+            pages.extend(extract_pages(path, tables="none", max_workers=mode_workers))
+        seconds = time.perf_counter() - start
+        timings = summarize_timings(pages)
+        print(f"   {mode:8s}: {seconds * 1000:8.1f} ms for {timings['pages']} pages, "
+              f"slowest page {timings['slowest_page'][1] * 1000:.1f} ms")
+
+def benchmark_table_extraction():
+    """pdfplumber on every page vs only on pages the table detector selects."""
+    from pdf_extraction import extract_pages, has_pdfplumber, summarize_timings
+
+    paths = sorted(glob.glob(os.path.join("uploads", "*.pdf")))
+    if not paths or not has_pdfplumber():
+        print("   ⚠️ needs PDFs in uploads/ and pdfplumber, skipping")
+        return
+
+    print(f"📊 Table extraction on {len(paths)} files")
+
+    results = {}
+    for mode in ("all", "selective"):
+        pages = []
+        start = time.perf_counter()
+        for path in paths:
+            pages.extend(extract_pages(path, tables=mode, max_workers=1))
+        seconds = time.perf_counter() - start
+        results[mode] = pages
+        timings = summarize_timings(pages)
+        table_count = sum(len(page["tables"]) for page in pages)
+        print(f"   {mode:9s}: {seconds * 1000:9.1f} ms, {table_count} tables, pages per engine {timings['engines']}")
+
+    # Pages where pdfplumber-everywhere finds a table that the detector skipped
+    table_pages = {(i, p["page"]) for i, p in enumerate(results["all"]) if p["tables"]}
+    found = {(i, p["page"]) for i, p in enumerate(results["selective"]) if p["tables"]}
+    print(f"   table pages recovered by selective mode: {len(table_pages & found)}/{len(table_pages)}")
+
+def _write_large_docx(path, paragraphs):
+    """A generated report: a heading every 20 paragraphs, a 6x4 table every 50."""
+    from docx import Document
+
+    doc = Document()
+    doc.sections[0].header.paragraphs[0].text = "Generated benchmark report"
+    for i in range(paragraphs):
+        if i % 20 == 0:
+            doc.add_heading(f"Section {i // 20 + 1}", level=1)
+        doc.add_paragraph(
+            f"Paragraph {i} reports the measured throughput of the ingestion pipeline. "
+            "Results are stable across repeated runs and match the previous quarter."
+        )
+        if i % 50 == 49:
+            table = doc.add_table(rows=6, cols=4)
+            for r, row in enumerate(table.rows):
+                for c, cell in enumerate(row.cells):
+                    cell.text = f"r{r}c{c}"
+    doc.save(path)
+
+def _peak_rss_kb():
+    """Peak resident memory of this process (VmHWM, which unlike ru_maxrss is not inherited)."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def _docx_extract_run(path, mode):
+    """Extract one DOCX in a fresh process; returns (seconds, chars, peak RSS growth in MB)."""
+    from docx import Document
+    from docx_extraction import iter_docx_blocks, blocks_text
+
+    baseline = _peak_rss_kb()
+    start = time.perf_counter()
+    if mode == "python-docx":
+        # The original extractor: paragraphs only, concatenated one by one
+        text = ""
+        for paragraph in Document(path).paragraphs:
+            text += paragraph.text + "\n"
+    else:
+        text = blocks_text(iter_docx_blocks(path))
+    seconds = time.perf_counter() - start
+    peak = _peak_rss_kb()
+    return seconds, len(text), (peak - baseline) / 1024
+
+def benchmark_docx_extraction(sizes=(2_000, 20_000)):
+    """python-docx paragraphs vs the streaming block extractor on generated DOCX files."""
+    import tempfile
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    try:
+        import docx  # noqa: F401
+    except ImportError:
+        print("   ⚠️ python-docx not installed, skipping")
+        return
+
+    print("📝 DOCX extraction: python-docx paragraphs vs streaming blocks")
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            path = os.path.join(directory, f"report_{size}.docx")
+            _write_large_docx(path, size)
+            print(f"   {size} paragraphs ({os.path.getsize(path) / 1024:.0f} KB):")
+            for mode in ("python-docx", "streaming"):
+                # A fresh process per run so peak memory is not shared between modes
+                with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn")) as pool:
+                    seconds, chars, peak_mb = pool.submit(_docx_extract_run, path, mode).result()
+                print(f"      {mode:11s}: {seconds * 1000:8.1f} ms, {chars} chars, peak memory +{peak_mb:.1f} MB")
+
+def _add_file_chunks(collection, file_id, embeddings, metadata=None):
+    """Add a file's chunks to a raw Chroma collection."""
+    collection.add(
+        ids=[f"{file_id}/{j}" for j in range(len(embeddings))],
+        embeddings=embeddings,
+        documents=[f"chunk {j} of {file_id}" for j in range(len(embeddings))],
+        metadatas=[dict(metadata or {}, file_id=file_id, chunk=j) for j in range(len(embeddings))]
+    )
+
+def _index_file_chunks(index, file_id, embeddings, first_chunk=0):
+    """Add a file's chunks to a user index (see vector_store.py)."""
+    chunks = range(first_chunk, first_chunk + len(embeddings))
+    index.add(
+        file_id,
+        [f"chunk {j} of {file_id}" for j in chunks],
+        embeddings,
+        [{"file_id": file_id, "page": 1, "section": "", "chunk": j} for j in chunks]
+    )
+
+def _vector_store_restart(backend, path, username, query):
+    """Open a persistent store in a fresh process; returns (open, first query, warm query) seconds."""
+    from vector_store import open_backend
+
+    start = time.perf_counter()
+    index = open_backend(backend, path).user_index(username)
+    opened = time.perf_counter() - start
+
+    timings = []
+    for _ in range(2):
+        start = time.perf_counter()
+        index.query(query)
+        timings.append(time.perf_counter() - start)
+    return opened, timings[0], timings[1]
+
+def _available_backends():
+    """Names of the vector backends whose dependencies are installed."""
+    available = []
+    for name, module in [("chroma", "chromadb"), ("flat", "numpy")]:
+        try:
+            __import__(module)
+            available.append(name)
+        except ImportError:
+            print(f"   ⚠️ {module} not installed, skipping the {name} backend")
+    return available
+
+def benchmark_vector_store(files=200, chunks_per_file=50, dimensions=384):
+    """Restart time and first-query latency of each persistent vector backend."""
+    import random
+    import tempfile
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    from vector_store import open_backend
+
+    print(f"🗄️ Persistent vector store: {files} files x {chunks_per_file} chunks, {dimensions}-d")
+    for backend in _available_backends():
+        rng = random.Random(0)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, backend)
+            index = open_backend(backend, path).user_index("benchmark")
+            start = time.perf_counter()
+            for i in range(files):
+                _index_file_chunks(
+                    index, f"file{i:05d}.pdf",
+                    [[rng.random() for _ in range(dimensions)] for _ in range(chunks_per_file)]
+                )
+            indexing = time.perf_counter() - start
+            del index
+
+            query = [rng.random() for _ in range(dimensions)]
+            # A fresh process is a real restart: nothing is cached in memory
+            with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn")) as pool:
+                opened, first, warm = pool.submit(_vector_store_restart, backend, path, "benchmark", query).result()
+            print(f"   {backend}: initial indexing (embeddings precomputed) {indexing * 1000:.0f} ms, "
+                  f"restart {opened * 1000:.1f} ms, first search {first * 1000:.1f} ms, warm {warm * 1000:.1f} ms")
+
+def _search_latency(search, repeats=5):
+    """Median seconds of ``search()`` after one warm-up call."""
+    search()
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        search()
+        timings.append(time.perf_counter() - start)
+    return sorted(timings)[len(timings) // 2]
+
+def benchmark_search_scaling(tenant_sizes=(10, 100, 1_000, 10_000), chunks_per_file=5, dimensions=384,
+                             per_file_max=1_000):
+    """Search latency as a tenant grows: per-file collections, one filtered collection, per-user collections."""
+    import random
+
+    try:
+        from vector_store import get_chroma_client, ChromaBackend
+        client = get_chroma_client(":memory:")
+    except ImportError:
+        print("   ⚠️ chromadb not installed, skipping")
+        return
+
+    print(f"🔎 Search scaling: {chunks_per_file} chunks per file, {dimensions}-d, plus a neighbour tenant of equal size")
+    rng = random.Random(0)
+    vectors = lambda: [[rng.random() for _ in range(dimensions)] for _ in range(chunks_per_file)]
+    query = [rng.random() for _ in range(dimensions)]
+    shared = client.create_collection(name="all-users")
+    backend = ChromaBackend(client)
+    tenant = backend.user_index("tenant")
+    neighbour = backend.user_index("neighbour")
+    indexed = 0
+    for size in tenant_sizes:
+        for i in range(indexed, size):
+            file_id = f"file{i:05d}.pdf"
+            embeddings = vectors()
+            _index_file_chunks(tenant, file_id, embeddings)
+            _add_file_chunks(shared, file_id, embeddings, {"user": "tenant"})
+            embeddings = vectors()
+            _index_file_chunks(neighbour, file_id, embeddings)
+            _add_file_chunks(shared, f"n-{file_id}", embeddings, {"user": "neighbour"})
+        indexed = size
+
+        per_user = _search_latency(lambda: tenant.query(query))
+        filtered = _search_latency(
+            lambda: shared.query(query_embeddings=[query], n_results=5, where={"user": "tenant"})
+        )
+
+        per_file = None
+        if size <= per_file_max:
+            per_file_client = get_chroma_client(":memory:")
+            collections = []
+            for i in range(size):
+                collection = per_file_client.create_collection(name=f"file{i:05d}.pdf")
+                _add_file_chunks(collection, collection.name, vectors())
+                collections.append(collection)
+            per_file = _search_latency(
+                lambda: [c.query(query_embeddings=[query], n_results=5) for c in collections], repeats=3
+            )
+            for collection in collections:
+                per_file_client.delete_collection(name=collection.name)
+
+        per_file_text = f"{per_file * 1000:8.1f} ms" if per_file is not None else "   skipped"
+        print(f"   {size:6d} files: per-file collections {per_file_text}, "
+              f"shared + user filter {filtered * 1000:6.1f} ms, per-user collection {per_user * 1000:5.1f} ms")
+
+def _tree_mb(path):
+    total = 0
+    for root, _, names in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in names)
+    return total / 1e6
+
+def benchmark_backends(sizes=(10_000, 100_000, 1_000_000), dimensions=384, chunks_per_file=50,
+                       write_batch_size=256, queries=20):
+    """Ingest throughput, query latency and disk size of the Chroma and flat backends for one tenant."""
+    import tempfile
+    import numpy as np
+    from vector_store import open_backend
+
+    print(f"⚖️ Vector backends: one tenant, {dimensions}-d, {chunks_per_file} chunks per file, "
+          f"writes of {write_batch_size} chunks")
+    for size in sizes:
+        for backend in _available_backends():
+            rng = np.random.default_rng(0)
+            with tempfile.TemporaryDirectory() as directory:
+                index = open_backend(backend, os.path.join(directory, backend)).user_index("tenant")
+                start = time.perf_counter()
+                for first in range(0, size, chunks_per_file):
+                    file_id = f"file{first // chunks_per_file:06d}.pdf"
+                    count = min(chunks_per_file, size - first)
+                    # As ingestion.write_chunks does: one add per write batch
+                    for offset in range(0, count, write_batch_size):
+                        batch = rng.normal(size=(min(write_batch_size, count - offset), dimensions))
+                        _index_file_chunks(index, file_id, batch.astype(np.float32).tolist(), offset)
+                ingest = time.perf_counter() - start
+
+                samples = rng.normal(size=(queries, dimensions)).astype(np.float32).tolist()
+                index.query(samples[0])
+                timings = []
+                for query in samples:
+                    start = time.perf_counter()
+                    index.query(query)
+                    timings.append(time.perf_counter() - start)
+                timings.sort()
+                print(f"   {size:>9,} chunks {backend:6s}: ingest {ingest:7.1f} s ({size / ingest:7.0f} chunks/s), "
+                      f"query p50 {timings[len(timings) // 2] * 1000:7.1f} ms, "
+                      f"p95 {timings[int(len(timings) * 0.95) - 1] * 1000:7.1f} ms, "
+                      f"disk {_tree_mb(os.path.join(directory, backend)):7.1f} MB")
+
+def benchmark_ann(sizes=(100_000, 1_000_000), dimensions=384, topics=2_000, spread=1.25, chunks_per_file=50,
+                  nprobes=(8, 16, 32, 64), rerank=256, top_k=10, queries=30):
+    """IVF-PQ build time, recall@k and latency against exact flat search for one tenant."""
+    import tempfile
+    import numpy as np
+    from ann_index import IvfBackend, measure_recall
+
+    print(f"🧭 IVF-PQ vs exact search: one tenant, {dimensions}-d chunks around {topics} topics, "
+          f"rerank {rerank}, recall@{top_k} over {queries} queries")
+    for size in sizes:
+        rng = np.random.default_rng(0)
+        # Random vectors have no neighborhoods to find; real chunks cluster by topic
+        centers = rng.normal(size=(topics, dimensions))
+        with tempfile.TemporaryDirectory() as directory:
+            index = IvfBackend(directory).user_index("tenant")
+            for first in range(0, size, chunks_per_file):
+                count = min(chunks_per_file, size - first)
+                embeddings = centers[rng.integers(topics, size=count)]
+                embeddings = embeddings + rng.normal(scale=spread, size=(count, dimensions))
+                _index_file_chunks(index, f"file{first // chunks_per_file:06d}.pdf", embeddings.astype(np.float32))
+
+            build = index.build(log=lambda message: None)
+            build_mb = _tree_mb(os.path.join(index.directory, index._current_build().name))
+            print(f"   {size:>9,} chunks: built {build['nlist']} lists x {build['m']}-byte codes "
+                  f"in {build['seconds']:.1f} s, {build_mb:.1f} MB")
+            for nprobe in nprobes:
+                result = measure_recall(index, top_k, queries, nprobe, rerank)
+                print(f"      nprobe {nprobe:3d}: recall {result['recall']:.3f}, "
+                      f"p50 {result['ann_ms']:6.1f} ms (exact {result['exact_ms']:7.1f} ms)")
+
+BENCHMARKS = {
+    "domain": benchmark_domain_cascade,
+    "cleaning": benchmark_clean_text,
+    "segmentation": benchmark_segmentation,
+    "extraction": benchmark_pdf_extraction,
+    "tables": benchmark_table_extraction,
+    "docx": benchmark_docx_extraction,
+    "vectorstore": benchmark_vector_store,
+    "search": benchmark_search_scaling,
+    "backends": benchmark_backends,
+    "ann": benchmark_ann,
+}
+
+def main():
+    """Run the benchmarks named on the command line (all by default)."""
+    names = sys.argv[1:] or list(BENCHMARKS)
+
+    for name in names:
+        if name not in BENCHMARKS:
+            print(f"❌ Unknown benchmark: {name} (choose from {', '.join(BENCHMARKS)})")
+            return False
+        BENCHMARKS[name]()
+        print()
+
+    return True
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
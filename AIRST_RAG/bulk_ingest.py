@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+Resumable bulk ingestion of a directory of PDF/DOCX files.
+
+Files are extracted and chunked in a pool of worker processes, embedded in
+this process with one model and written to the same vector store and
+``user_files.json`` mapping the app uses, so they show up in the user's
+document list. Progress is appended to a JSON-lines checkpoint; re-running the
+same command after an interruption skips every file already recorded there for
+the same user and vector store.
+
+    python bulk_ingest.py papers/ --user alice
+
+Both write to the persistent vector store selected by ``AIRST_VECTOR_BACKEND``
+(see vector_store.py), so the app searches the ingested files as soon as it
+starts. With the ``ivf`` backend the user's approximate index is rebuilt in
+the background once ingestion finishes; the command waits for it before
+exiting, and the app searches exactly (or with the previous index) meanwhile.
+The app can keep running: writes to ``user_files.json`` and to flat/ivf
+indexes are serialized across processes by lock files (see file_lock.py).
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+import pdf_extraction
+from ingestion import (
+    EMBED_MODEL_NAME, EMBED_BATCH_SIZE, WRITE_BATCH_SIZE, SUPPORTED_EXTENSIONS, DEFAULT_TABLE_MODE,
+    prepare_chunks, write_chunks, attach_indexed_file
+)
+from upload_store import (
+    BLOBS_KEY, load_user_files, hash_file, store_file, register_uploads, blob_path
+)
+from vector_store import VECTOR_BACKEND, BACKENDS, IN_MEMORY, backend_path, open_backend
+
+CHECKPOINT_NAME = ".airst_ingest_checkpoint.jsonl"
+
+# Completed files registered in user_files.json (and checkpointed) per write
+DEFAULT_FLUSH_EVERY = 100
+
+# Seconds between throughput lines
+DEFAULT_REPORT_EVERY = 10.0
+
+def iter_documents(directory):
+    """Yield paths of supported files under ``directory``, in a stable order."""
+    entries = sorted(os.scandir(directory), key=lambda entry: entry.name)
+    for entry in entries:
+        if entry.is_dir(follow_symlinks=False):
+            yield from iter_documents(entry.path)
+        elif entry.is_file() and os.path.splitext(entry.name)[1].lower() in SUPPORTED_EXTENSIONS:
+            yield entry.path
+
+def _fingerprint(path):
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+def load_checkpoint(checkpoint_path, username=None, backend_name=None):
+    """
+    {relative path: record} of files finished by earlier runs; failed files are retried.
+
+    With ``username`` and ``backend_name``, only records of runs for that user
+    into that vector store count, so another user or backend ingests every file.
+    """
+    finished = {}
+    if not os.path.exists(checkpoint_path):
+        return finished
+    with open(checkpoint_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # Torn last line from a killed run
+                continue
+            if username is not None and (record.get("user"), record.get("backend")) != (username, backend_name):
+                continue
+            if record.get("status") in ("done", "empty"):
+                finished[record["path"]] = record
+            else:
+                finished.pop(record["path"], None)
+    return finished
+
+def _init_worker():
+    # One process per file already; no nested page-level pools
+    pdf_extraction.PDF_WORKERS = 1
+
+class _Throughput:
+    """Periodic files/pages/chunks per second report."""
+
+    def __init__(self, report_every, log):
+        self.report_every = report_every
+        self.log = log
+        self.started = time.monotonic()
+        self.last_report = self.started
+        self.counts = {"files": 0, "skipped": 0, "errors": 0, "pages": 0, "chunks": 0}
+
+    def add(self, **counts):
+        for name, value in counts.items():
+            self.counts[name] += value
+        now = time.monotonic()
+        if self.report_every and now - self.last_report >= self.report_every:
+            self.last_report = now
+            self.log(self.line())
+
+    def line(self):
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        c = self.counts
+        return (
+            f"📈 {c['files']} files ({c['files'] / elapsed:.1f}/s), "
+            f"{c['pages']} pages ({c['pages'] / elapsed:.1f}/s), "
+            f"{c['chunks']} chunks ({c['chunks'] / elapsed:.1f}/s), "
+            f"{c['skipped']} skipped, {c['errors']} errors"
+        )
+
+def ingest_directory(directory, username, backend, encode, checkpoint_path=None, workers=None,
+                     tables=DEFAULT_TABLE_MODE, batch_size=EMBED_BATCH_SIZE, write_batch_size=WRITE_BATCH_SIZE,
+                     flush_every=DEFAULT_FLUSH_EVERY, report_every=DEFAULT_REPORT_EVERY, log=print, backend_name=None):
+    """
+    Ingest every supported file under ``directory`` for ``username``.
+
+    Args:
+        backend: Vector store backend the app reads from (see vector_store.py)
+        encode (callable): Embeds a list of texts
+        checkpoint_path (str): Progress file (default: inside ``directory``)
+        workers (int): Extraction processes; 1 extracts in this process
+        backend_name (str): Names the vector store in checkpoint records, e.g.
+            "flat:/data/flat_index" (default: the backend's class and path); a
+            file is only skipped when it was finished for this user and store
+
+    Returns:
+        dict: files, skipped, errors, pages and chunks counts for this run;
+        the caller starts the search index build (see ``start_build``)
+    """
+    directory = os.path.abspath(directory)
+    checkpoint_path = checkpoint_path or os.path.join(directory, CHECKPOINT_NAME)
+    workers = workers or pdf_extraction.PDF_WORKERS
+    if backend_name is None:
+        path = getattr(backend, "path", None)
+        backend_name = f"{type(backend).__name__}:{os.path.abspath(path)}" if path else type(backend).__name__
+    finished = load_checkpoint(checkpoint_path, username, backend_name)
+
+    index = backend.user_index(username)
+    blobs = load_user_files().get(BLOBS_KEY, {})
+    indexed = {name for name, blob in blobs.items() if blob.get("indexed")}
+    del blobs
+
+    progress = _Throughput(report_every, log)
+    waiting = {}      # stored filename -> files with that content awaiting extraction
+    completed = []    # (checkpoint record, registration entry or None) not yet flushed
+
+    checkpoint = open(checkpoint_path, "a", encoding="utf-8")
+
+    def flush():
+        entries = [entry for _, entry in completed if entry is not None]
+        if entries:
+            orphans, released = register_uploads(username, entries)
+            # The relative path now holds different content
+            for orphan in orphans:
+                if os.path.exists(blob_path(orphan)):
+                    os.remove(blob_path(orphan))
+                backend.purge_file(orphan)
+            for stored_filename in released:
+                index.delete_file(stored_filename)
+        # Checkpoint only after the mapping is saved, so a crash redoes rather than loses files
+        for record, _ in completed:
+            checkpoint.write(json.dumps(record) + "\n")
+        checkpoint.flush()
+        os.fsync(checkpoint.fileno())
+        completed.clear()
+
+    def finish(record, entry=None):
+        completed.append((record, entry))
+        if len(completed) >= flush_every:
+            flush()
+
+    def store(stored_filename, page_count, chunks):
+        """Embed and store one extracted file, then record every file with its content."""
+        files = waiting.pop(stored_filename)
+        chunk_count, _ = write_chunks(
+            index, stored_filename, chunks, encode, batch_size=batch_size, write_batch_size=write_batch_size
+        )
+        if chunk_count:
+            store_file(files[0]["source"], stored_filename)
+            indexed.add(stored_filename)
+        for info in files:
+            record = dict(info["record"], stored=stored_filename, chunks=chunk_count,
+                          status="done" if chunk_count else "empty")
+            finish(record, (info["record"]["path"], stored_filename, info["record"]["size"]) if chunk_count else None)
+        progress.add(files=len(files), pages=page_count, chunks=chunk_count)
+
+    def fail(stored_filename, error):
+        files = waiting.pop(stored_filename)
+        for info in files:
+            finish(dict(info["record"], status="error", error=str(error)))
+            log(f"❌ {info['record']['path']}: {error}")
+        progress.add(errors=len(files))
+
+    pool = None
+    if workers > 1:
+        pool = ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn"), initializer=_init_worker
+        )
+    pending = {}
+
+    def collect(block):
+        if block:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        else:
+            done = [future for future in pending if future.done()]
+        for future in done:
+            stored_filename = pending.pop(future)
+            try:
+                page_count, chunks = future.result()
+            except Exception as e:
+                fail(stored_filename, e)
+                continue
+            store(stored_filename, page_count, chunks)
+
+    try:
+        for path in iter_documents(directory):
+            relative = os.path.relpath(path, directory)
+            try:
+                size, mtime_ns = _fingerprint(path)
+                previous = finished.get(relative)
+                if previous and (previous["size"], previous["mtime_ns"]) == (size, mtime_ns):
+                    progress.add(skipped=1)
+                    continue
+                stored_filename = f"{hash_file(path)}{os.path.splitext(path)[1].lower()}"
+            except OSError as e:
+                log(f"❌ {relative}: {e}")
+                progress.add(errors=1)
+                continue
+
+            record = {"path": relative, "size": size, "mtime_ns": mtime_ns, "user": username, "backend": backend_name}
+            if stored_filename in indexed and attach_indexed_file(backend, username, stored_filename):
+                # Same content already embedded (by the app or earlier in this run); no re-embedding
+                finish(dict(record, stored=stored_filename, status="done"), (relative, stored_filename, size))
+                progress.add(files=1)
+                continue
+            if stored_filename in waiting:
+                waiting[stored_filename].append({"source": path, "record": record})
+                continue
+            waiting[stored_filename] = [{"source": path, "record": record}]
+
+            if pool is None:
+                try:
+                    page_count, chunks = prepare_chunks(path, stored_filename.split(".")[0], tables)
+                except Exception as e:
+                    fail(stored_filename, e)
+                    continue
+                store(stored_filename, page_count, chunks)
+                continue
+
+            # Bounded in-flight window keeps memory flat on huge directories
+            pending[pool.submit(prepare_chunks, path, stored_filename.split(".")[0], tables)] = stored_filename
+            collect(block=len(pending) >= workers * 2)
+
+        while pending:
+            collect(block=True)
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+        flush()
+        checkpoint.close()
+
+    log(progress.line())
+    return dict(progress.counts)
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest a directory of PDF/DOCX files into the RAG vector store.")
+    parser.add_argument("directory", help="Directory searched recursively for .pdf/.doc/.docx files")
+    parser.add_argument("--user", required=True, help="User whose document list receives the files")
+    parser.add_argument("--workers", type=int, default=pdf_extraction.PDF_WORKERS,
+                        help="Extraction worker processes (default: CPU count)")
+    parser.add_argument("--checkpoint", help=f"Progress file (default: <directory>/{CHECKPOINT_NAME})")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default=VECTOR_BACKEND,
+                        help="Vector store backend (default: AIRST_VECTOR_BACKEND, as used by the app)")
+    parser.add_argument("--chroma-path",
+                        help="Persistent Chroma directory (default: AIRST_CHROMA_PATH, as used by the app)")
+    parser.add_argument("--flat-index-path",
+                        help="Flat/ivf index directory (default: AIRST_FLAT_INDEX_PATH, as used by the app)")
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE, help="Chunks embedded per batch")
+    parser.add_argument("--write-batch-size", type=int, default=WRITE_BATCH_SIZE,
+                        help="Chunks written to the vector store per batch")
+    parser.add_argument("--flush-every", type=int, default=DEFAULT_FLUSH_EVERY,
+                        help="Files registered and checkpointed per write")
+    parser.add_argument("--report-every", type=float, default=DEFAULT_REPORT_EVERY,
+                        help="Seconds between throughput lines")
+    args = parser.parse_args()
+
+    if args.user == BLOBS_KEY:
+        parser.error(f"'{BLOBS_KEY}' is reserved")
+    if not os.path.isdir(args.directory):
+        parser.error(f"not a directory: {args.directory}")
+    path = {
+        "chroma": args.chroma_path, "flat": args.flat_index_path, "ivf": args.flat_index_path
+    }.get(args.backend) or backend_path(args.backend)
+    if path == IN_MEMORY:
+        parser.error("bulk ingestion needs a persistent --chroma-path")
+
+    from sentence_transformers import SentenceTransformer
+
+    backend = open_backend(args.backend, path)
+    model = SentenceTransformer(EMBED_MODEL_NAME)
+    encode = lambda texts: model.encode(texts, batch_size=args.batch_size)
+
+    print(f"🚀 Ingesting {args.directory} for {args.user} with {args.workers} worker(s) into {args.backend} store {path}")
+    try:
+        counts = ingest_directory(
+            args.directory, args.user, backend, encode, args.checkpoint, args.workers,
+            batch_size=args.batch_size, write_batch_size=args.write_batch_size,
+            flush_every=args.flush_every, report_every=args.report_every,
+            backend_name=f"{args.backend}:{os.path.abspath(path)}"
+        )
+    except KeyboardInterrupt:
+        print("\n⏸️ Interrupted; run the same command again to resume")
+        return False
+
+    print(f"✅ Done: {counts['files']} ingested, {counts['skipped']} already done, {counts['errors']} failed")
+    build = backend.user_index(args.user).start_build() if counts["chunks"] else None
+    if build is not None:
+        print(f"🏗️ Building the search index for {args.user}")
+        try:
+            build.join()
+        except KeyboardInterrupt:
+            print("\n⏸️ Index build interrupted; the app builds it in the background")
+            return False
+    return counts["errors"] == 0
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -1,28 +1,73 @@
+import re
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
 import streamlit as st
 from transformers import pipeline
 import torch
+from pipeline_dag import run_in_script_context
 
 # Global cache for classifiers
 _classifiers = {}
+_classifiers_lock = threading.Lock()
 
-def load_classifier(model_name="allenai/scibert_scivocab_uncased"):
-    """Load text classification model with caching."""
+# {model_name: error} of loads that failed
+_classifier_errors = {}
+
+LANGUAGE_DETECTION_MODEL = "papluca/xlm-roberta-base-language-detection"
+
+# How often the cheap pre-filter answered without the transformer
+_language_detection_stats = {"prefilter": 0, "transformer": 0}
+
+# Shared executor for independent metadata stages
+_metadata_executor = None
+_metadata_executor_lock = threading.Lock()
+
+# Combined wall-clock budget for all metadata stages
+METADATA_TIMEOUT_SECONDS = 120
+
+# Frequent English character trigrams (word-boundary padded with spaces)
+_ENGLISH_TRIGRAMS = frozenset([
+    " th", "the", "he ", " an", "and", "nd ", " of", "of ", " in", "ing", "ng ",
+    " to", "to ", "ion", "on ", "tio", "ed ", " a ", "is ", " is", "er ", "es ",
+    "re ", " co", "ent", "at ", "for", " fo", "or ", "hat", "tha", " be", "al "
+])
+
+# Function words (and the genitive/locative suffixes) of Marathi and Hindi. Only
+# one language's markers showing up is decisive; anything else is left to the model
+_MARATHI_WORDS = frozenset(["आहे", "आहेत", "आणि", "नाही", "होते", "होता", "मध्ये", "आम्ही", "त्यांनी", "केले"])
+_MARATHI_SUFFIXES = ("च्या", "ची", "चे", "चा", "ळ")
+_HINDI_WORDS = frozenset(["है", "हैं", "और", "का", "की", "के", "में", "नहीं", "से", "था", "थे", "थी", "यह", "किया"])
+
+# Words of other Devanagari languages (Nepali, Sanskrit) that rule the shortcut out
+_OTHER_DEVANAGARI_WORDS = frozenset(["छ", "छन्", "पनि", "हुन्छ", "गर्न", "अस्ति", "इति", "च", "तत्"])
+
+def load_classifier(model_name="allenai/scibert_scivocab_uncased", retry=False):
+    """Load text classification model with caching (see ``preload_models`` for ``retry``)."""
     if model_name in _classifiers:
         return _classifiers[model_name]
     
-    try:
-        with st.spinner(f"Loading classifier: {model_name}"):
-            classifier = pipeline(
-                "text-classification", 
-                model=model_name,
-                device=0 if torch.cuda.is_available() else -1
-            )
-            _classifiers[model_name] = classifier
-            return classifier
-            
-    except Exception as e:
-        st.error(f"Error loading classifier {model_name}: {e}")
-        return None
+    with _classifiers_lock:
+        if model_name in _classifiers:
+            return _classifiers[model_name]
+        if model_name in _classifier_errors and not retry:
+            return None
+        
+        try:
+            with st.spinner(f"Loading classifier: {model_name}"):
+                classifier = pipeline(
+                    "text-classification", 
+                    model=model_name,
+                    device=0 if torch.cuda.is_available() else -1
+                )
+                _classifiers[model_name] = classifier
+                _classifier_errors.pop(model_name, None)
+                return classifier
+                
+        except Exception as e:
+            _classifier_errors[model_name] = e
+            st.error(f"Error loading classifier {model_name}: {e}")
+            return None
 
 def classify_document(text, model_name="allenai/scibert_scivocab_uncased"):
     """Classify document type."""
@@ -59,41 +104,150 @@ def get_domain_classifier(document_type):
     model_name = model_mapping.get(document_type.lower(), "distilbert-base-uncased")
     return load_classifier(model_name)
 
-def classify_document_sections(text):
+def classify_texts(texts, model_name="allenai/scibert_scivocab_uncased", batch_size=8, max_chars=512):
+    """
+    Classify several texts with a single batched pipeline call.
+    
+    Inputs are sorted by length before batching so each padded batch holds
+    similarly sized samples, then results are returned in the original order.
+    """
+    results = [{"label": "unknown", "score": 0.0} for _ in texts]
+    
+    # Only non-empty texts are sent to the model
+    indexed_samples = [(i, t[:max_chars]) for i, t in enumerate(texts) if t]
+    if not indexed_samples:
+        return results
+    
+    classifier = load_classifier(model_name)
+    if not classifier:
+        return results
+    
+    indexed_samples.sort(key=lambda item: len(item[1]))
+    
+    try:
+        outputs = classifier(
+            [sample for _, sample in indexed_samples],
+            batch_size=batch_size,
+            truncation=True
+        )
+    except Exception as e:
+        st.error(f"Error in batched classification: {e}")
+        return results
+    
+    for (i, _), output in zip(indexed_samples, outputs):
+        results[i] = output[0] if isinstance(output, list) else output
+    
+    return results
+
+def classify_document_and_sections(text, sections=None):
+    """Classify the whole-document sample and every section in one batch.
+    
+    Returns:
+        tuple: (document classification dict, {section_name: classification})
+    """
+    if sections is None:
+        from preprocessing import extract_key_sections
+        sections = extract_key_sections(text)
+    
+    section_names = [name for name, section_text in sections.items() if section_text]
+    outputs = classify_texts([text] + [sections[name] for name in section_names])
+    
+    return outputs[0], dict(zip(section_names, outputs[1:]))
+
+def classify_document_sections(text, sections=None):
     """Classify different sections of a document."""
-    from preprocessing import extract_key_sections
+    if sections is None:
+        from preprocessing import extract_key_sections
+        sections = extract_key_sections(text)
     
-    sections = extract_key_sections(text)
-    classifications = {}
+    section_names = [name for name, section_text in sections.items() if section_text]
+    outputs = classify_texts([sections[name] for name in section_names])
+    
+    return dict(zip(section_names, outputs))
+
+def _prefilter_language(sample):
+    """
+    Decide obvious cases from script and character n-grams without a model.
     
-    for section_name, section_text in sections.items():
-        if section_text:
-            classification = classify_document(section_text)
-            classifications[section_name] = classification
+    Returns a result dict for confident cases, otherwise None.
+    """
+    letters = [ch for ch in sample if ch.isalpha()]
+    if len(letters) < 20:
+        return None
+    
+    # Devanagari script (Marathi / Hindi uploads)
+    devanagari = sum(1 for ch in letters if "\u0900" <= ch <= "\u097f")
+    if devanagari / len(letters) > 0.6:
+        # Dandas (।, ॥) end sentences, not words
+        words = re.findall(r"[\u0900-\u0963\u0966-\u097f]+", sample)
+        if any(word in _OTHER_DEVANAGARI_WORDS for word in words):
+            return None
+        marathi = sum(1 for word in words if word in _MARATHI_WORDS or word.endswith(_MARATHI_SUFFIXES))
+        hindi = sum(1 for word in words if word in _HINDI_WORDS)
+        if marathi >= 2 and not hindi:
+            return {"label": "mr", "score": 0.9}
+        if hindi >= 2 and not marathi:
+            return {"label": "hi", "score": 0.9}
+        return None
     
-    return classifications
+    # Pure ASCII text dominated by English trigrams
+    if all(ord(ch) < 128 for ch in letters):
+        padded = " " + re.sub(r"[^a-z]+", " ", sample.lower()) + " "
+        trigrams = [padded[i:i + 3] for i in range(len(padded) - 2)]
+        if trigrams:
+            hits = sum(1 for t in trigrams if t in _ENGLISH_TRIGRAMS)
+            if hits / len(trigrams) > 0.12:
+                return {"label": "en", "score": 0.95}
+    
+    return None
+
+def needs_language_model(text, sample_size=500):
+    """Whether ``detect_document_language`` runs the transformer for ``text``."""
+    return _prefilter_language((text or "")[:sample_size]) is None
 
-def detect_document_language(text):
+def detect_document_language(text, sample_size=500):
     """Detect the language of the document."""
+    sample_text = (text or "")[:sample_size]
+    
+    result = _prefilter_language(sample_text)
+    if result:
+        _language_detection_stats["prefilter"] += 1
+        return dict(result, method="prefilter")
+    
     try:
-        from transformers import pipeline
-        language_detector = pipeline("text-classification", model="papluca/xlm-roberta-base-language-detection")
-        
-        # Use first 100 characters for language detection
-        sample_text = text[:100]
-        result = language_detector(sample_text)
+        language_detector = load_classifier(LANGUAGE_DETECTION_MODEL)
+        if not language_detector:
+            raise RuntimeError("language detector unavailable")
         
-        return result[0] if isinstance(result, list) else result
+        _language_detection_stats["transformer"] += 1
+        result = language_detector(sample_text, truncation=True)
+        result = result[0] if isinstance(result, list) else result
+        return dict(result, method="transformer")
         
     except Exception as e:
         st.warning(f"Language detection failed: {e}")
-        return {"label": "en", "score": 1.0}
+        return {"label": "en", "score": 1.0, "method": "default"}
 
-def analyze_document_complexity(text):
-    """Analyze document complexity and readability."""
-    from preprocessing import segment_text
+def get_language_detection_stats():
+    """Report how often the transformer was skipped by the pre-filter."""
+    prefilter = _language_detection_stats["prefilter"]
+    transformer = _language_detection_stats["transformer"]
+    total = prefilter + transformer
     
-    sentences = segment_text(text)
+    return {
+        "prefilter": prefilter,
+        "transformer": transformer,
+        "total": total,
+        "skip_rate": round(prefilter / total, 3) if total else 0.0
+    }
+
+def analyze_document_complexity(text, doc_ir=None):
+    """Analyze document complexity and readability."""
+    if doc_ir is not None:
+        sentences = doc_ir.sentences
+    else:
+        from preprocessing import segment_text
+        sentences = segment_text(text)
     words = text.split()
     
     if not sentences or not words:
@@ -123,25 +277,70 @@ def analyze_document_complexity(text):
         "total_words": len(words)
     }
 
-def get_document_metadata(text):
-    """Extract comprehensive document metadata."""
-    metadata = {}
+def _get_metadata_executor():
+    """Create the shared metadata executor on first use."""
+    global _metadata_executor
+    with _metadata_executor_lock:
+        if _metadata_executor is None:
+            _metadata_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="metadata")
+        return _metadata_executor
+
+def _timed(func):
+    """Wrap func to return (result, seconds) and keep the Streamlit session context."""
+    def run():
+        start = time.perf_counter()
+        result = func()
+        return result, time.perf_counter() - start
     
-    # Language detection
-    language_info = detect_document_language(text)
-    metadata["language"] = language_info
+    return run_in_script_context(run)
+
+def _classification_stage(text, doc_ir=None):
+    """Document and section classification, run as one stage to keep them batched."""
+    sections = doc_ir.sections if doc_ir is not None else None
+    classification, sections = classify_document_and_sections(text, sections=sections)
+    return {"classification": classification, "sections": sections}
+
+def get_document_metadata(text, timeout=METADATA_TIMEOUT_SECONDS, doc_ir=None):
+    """
+    Extract comprehensive document metadata.
+    
+    Language detection, complexity analysis and classification are independent,
+    so they run concurrently on a shared executor under one combined timeout.
+    Fields whose stage failed or timed out keep a default value and are marked
+    in ``metadata["status"]``. Pass ``doc_ir`` to reuse its sentences and sections.
+    """
+    metadata = {
+        "language": {"label": "unknown", "score": 0.0},
+        "complexity": {"complexity": "unknown", "readability_score": 0},
+        "classification": {"label": "unknown", "score": 0.0},
+        "sections": {},
+        "status": {},
+        "timings": {}
+    }
+    
+    stages = {
+        "language": lambda: {"language": detect_document_language(text)},
+        "complexity": lambda: {"complexity": analyze_document_complexity(text, doc_ir=doc_ir)},
+        "classification": lambda: _classification_stage(text, doc_ir)
+    }
     
-    # Complexity analysis
-    complexity_info = analyze_document_complexity(text)
-    metadata["complexity"] = complexity_info
+    executor = _get_metadata_executor()
+    futures = {executor.submit(_timed(stage)): name for name, stage in stages.items()}
+    done, not_done = wait(futures, timeout=timeout)
     
-    # Document classification
-    classification = classify_document(text)
-    metadata["classification"] = classification
+    for future in done:
+        name = futures[future]
+        try:
+            fields, elapsed = future.result()
+            metadata.update(fields)
+            metadata["status"][name] = "ok"
+            metadata["timings"][name] = round(elapsed, 3)
+        except Exception as e:
+            metadata["status"][name] = f"failed: {e}"
     
-    # Section classification
-    section_classifications = classify_document_sections(text)
-    metadata["sections"] = section_classifications
+    for future in not_done:
+        future.cancel()
+        metadata["status"][futures[future]] = "timeout"
     
     return metadata
 
@@ -0,0 +1,148 @@
+"""
+Document intermediate representation shared by every analysis module.
+
+A ``DocumentIR`` is built once per upload and computes cleaned text,
+sentence / paragraph / section / chunk spans and the page map lazily, so a
+full analysis segments the document exactly once no matter how many modules
+read it.
+"""
+
+import re
+from bisect import bisect_right
+from functools import cached_property
+
+from preprocessing import clean_text, segment_spans, chunk_sentence_spans, find_section_spans
+from section_parser import parse_sections, build_section_tree
+from text_cleaning import map_to_original, map_to_clean
+
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+
+class DocumentIR:
+    """Lazily computed structure of one document.
+
+    Sentence and chunk spans index into ``cleaned_text``; paragraph and
+    section spans index into ``raw_text``.
+    """
+
+    def __init__(self, raw_text, page_offsets=None, font_headings=None):
+        self.raw_text = raw_text or ""
+        # Start offset of each page in raw_text, if the extractor provided pages
+        self.page_offsets = list(page_offsets) if page_offsets else None
+        # Heading lines detected from PDF font sizes, if available
+        self.font_headings = font_headings
+        self.segmentation_count = 0
+        self._chunk_spans = {}
+
+    @classmethod
+    def from_pages(cls, pages, font_headings=None):
+        """Build an IR from per-page texts, recording where each page starts."""
+        offsets = []
+        position = 0
+        for page in pages:
+            offsets.append(position)
+            position += len(page) + 1
+        return cls("\n".join(pages), page_offsets=offsets, font_headings=font_headings)
+
+    @cached_property
+    def _cleaned(self):
+        return clean_text(self.raw_text, return_offsets=True)
+
+    @property
+    def cleaned_text(self):
+        return self._cleaned[0]
+
+    @property
+    def offset_map(self):
+        return self._cleaned[1]
+
+    @cached_property
+    def sentence_spans(self):
+        """(start, end) of every sentence in ``cleaned_text``."""
+        self.segmentation_count += 1
+        return segment_spans(self.cleaned_text)
+
+    @cached_property
+    def sentences(self):
+        text = self.cleaned_text
+        return [text[start:end] for start, end in self.sentence_spans]
+
+    @cached_property
+    def paragraph_spans(self):
+        """(start, end) of every blank-line separated paragraph in ``raw_text``."""
+        spans = []
+        start = 0
+        for match in _PARAGRAPH_BREAK.finditer(self.raw_text):
+            if self.raw_text[start:match.start()].strip():
+                spans.append((start, match.start()))
+            start = match.end()
+        if self.raw_text[start:].strip():
+            spans.append((start, len(self.raw_text)))
+        return spans
+
+    @cached_property
+    def section_tree(self):
+        """Nested headings of ``raw_text`` with their offsets."""
+        return build_section_tree(parse_sections(self.raw_text, self.font_headings))
+
+    @cached_property
+    def section_spans(self):
+        """
+        Key sections as {name: {"span": raw (start, end), "sentences": (first, last + 1)}}.
+
+        Sections are located on the raw text (which still has line breaks)
+        and mapped onto the sentence list through the cleaning offset map.
+        Later sections with the same name replace earlier ones.
+        """
+        sentence_starts = [map_to_original(self.offset_map, start) for start, _ in self.sentence_spans]
+        sentence_ends = [map_to_original(self.offset_map, end - 1) + 1 for _, end in self.sentence_spans]
+        sections = {}
+
+        for name, start, end in find_section_spans(self.raw_text, self.font_headings):
+            # A header usually has no full stop, so it merges into the first
+            # sentence of its section; count sentences that overlap the content
+            first = bisect_right(sentence_ends, start)
+            last = bisect_right(sentence_starts, end - 1)
+            if last > first:
+                sections[name] = {"span": (start, end), "sentences": (first, last)}
+
+        return sections
+
+    @cached_property
+    def sections(self):
+        """Section name -> cleaned section text."""
+        return {
+            name: " ".join(self.sentences[first:last])
+            for name, info in self.section_spans.items()
+            for first, last in [info["sentences"]]
+        }
+
+    def chunk_spans(self, max_length=512, sentence_range=None):
+        """Chunk spans over ``cleaned_text``, optionally restricted to a sentence range."""
+        key = (max_length, sentence_range)
+        if key not in self._chunk_spans:
+            spans = self.sentence_spans
+            if sentence_range is not None:
+                spans = spans[sentence_range[0]:sentence_range[1]]
+            self._chunk_spans[key] = chunk_sentence_spans(spans, max_length)
+        return self._chunk_spans[key]
+
+    def chunks(self, max_length=512, sentence_range=None):
+        text = self.cleaned_text
+        return [text[start:end] for start, end in self.chunk_spans(max_length, sentence_range)]
+
+    def section_chunks(self, name, max_length=1000):
+        """Chunks of one section, reusing the document's sentence spans."""
+        return self.chunks(max_length, self.section_spans[name]["sentences"])
+
+    @cached_property
+    def cleaned_page_offsets(self):
+        """Start offset of each page within ``cleaned_text``."""
+        if not self.page_offsets:
+            return None
+        return [map_to_clean(self.offset_map, offset) for offset in self.page_offsets]
+
+    def page_for_offset(self, clean_offset):
+        """1-based page number for an offset in ``cleaned_text``."""
+        if not self.cleaned_page_offsets:
+            return None
+        return max(1, bisect_right(self.cleaned_page_offsets, clean_offset))
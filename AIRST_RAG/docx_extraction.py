@@ -0,0 +1,186 @@
+"""
+Streaming DOCX extraction.
+
+``word/document.xml`` is read with an incremental XML parser straight from the
+DOCX zip, and every top-level paragraph or table is dropped from the tree as
+soon as it has been turned into a block. Memory therefore stays flat however
+long the document is, and no python-docx object model is built.
+
+Blocks come out in document order:
+
+    {"kind": "paragraph" | "table" | "header" | "footer",
+     "text": ..., "style": "Heading 1", "level": 1}
+
+``level`` is the heading depth from the paragraph's style (``Heading N``, or
+an outline level set on the style or the paragraph) and None for body text.
+Table rows are tab-separated lines, the way PDF tables are appended to page
+text. Running headers and footers are emitted once each, before and after the
+body.
+"""
+
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+_PARAGRAPH = f"{_W}p"
+_TABLE = f"{_W}tbl"
+_ROW = f"{_W}tr"
+_CELL = f"{_W}tc"
+_BODY = f"{_W}body"
+_VAL = f"{_W}val"
+
+# Run content that becomes text
+_TEXT = f"{_W}t"
+_BREAKS = {f"{_W}tab": "\t", f"{_W}br": "\n", f"{_W}cr": "\n", f"{_W}noBreakHyphen": "-"}
+
+_HEADING_STYLE = re.compile(r"^heading\s*(\d)$", re.IGNORECASE)
+
+def _heading_level(name, outline_level):
+    match = _HEADING_STYLE.match(name or "")
+    if match:
+        return int(match.group(1))
+    if outline_level is not None and outline_level < 9:
+        return outline_level + 1
+    return None
+
+def _read_styles(archive):
+    """{style id: (style name, heading level or None)}, following ``basedOn`` chains."""
+    try:
+        root = ET.fromstring(archive.read("word/styles.xml"))
+    except KeyError:
+        return {}
+
+    raw = {}
+    for style in root.iter(f"{_W}style"):
+        style_id = style.get(f"{_W}styleId")
+        name = style.find(f"{_W}name")
+        based_on = style.find(f"{_W}basedOn")
+        outline = style.find(f"{_W}pPr/{_W}outlineLvl")
+        raw[style_id] = (
+            name.get(_VAL) if name is not None else style_id,
+            based_on.get(_VAL) if based_on is not None else None,
+            int(outline.get(_VAL)) if outline is not None else None
+        )
+
+    styles = {}
+    for style_id, (name, based_on, outline) in raw.items():
+        level = _heading_level(name, outline)
+        seen = {style_id}
+        while level is None and based_on in raw and based_on not in seen:
+            seen.add(based_on)
+            parent_name, based_on, parent_outline = raw[based_on]
+            level = _heading_level(parent_name, parent_outline)
+        # Display names the way Word shows them ("heading 1" -> "Heading 1")
+        styles[style_id] = (name[:1].upper() + name[1:] if name else name, level)
+    return styles
+
+def _paragraph_text(paragraph):
+    parts = []
+    for node in paragraph.iter():
+        if node.tag == _TEXT:
+            parts.append(node.text or "")
+        elif node.tag in _BREAKS:
+            parts.append(_BREAKS[node.tag])
+    return "".join(parts)
+
+def _paragraph_block(paragraph, styles, kind="paragraph"):
+    style_id = None
+    outline_level = None
+    properties = paragraph.find(f"{_W}pPr")
+    if properties is not None:
+        style = properties.find(f"{_W}pStyle")
+        style_id = style.get(_VAL) if style is not None else None
+        outline = properties.find(f"{_W}outlineLvl")
+        outline_level = int(outline.get(_VAL)) if outline is not None else None
+
+    name, level = styles.get(style_id, (style_id, None))
+    if outline_level is not None:
+        level = _heading_level(None, outline_level)
+    return {"kind": kind, "text": _paragraph_text(paragraph), "style": name, "level": level}
+
+def _table_block(table, kind="table"):
+    rows = []
+    for row in table.findall(_ROW):
+        cells = [" ".join(_paragraph_text(p) for p in cell.iter(_PARAGRAPH)).strip() for cell in row.findall(_CELL)]
+        rows.append("\t".join(cell for cell in cells if cell))
+    return {"kind": kind, "text": "\n".join(row for row in rows if row), "style": None, "level": None}
+
+def _part_blocks(archive, prefix, kind, styles):
+    """Blocks of header or footer parts, skipping repeats (first/even/odd pages often match)."""
+    names = sorted(
+        (n for n in archive.namelist() if re.fullmatch(rf"word/{prefix}\d*\.xml", n)),
+        key=lambda n: int(re.sub(r"\D", "", n) or 0)
+    )
+    seen = set()
+    for name in names:
+        root = ET.fromstring(archive.read(name))
+        for child in root:
+            if child.tag == _PARAGRAPH:
+                block = _paragraph_block(child, styles, kind)
+            elif child.tag == _TABLE:
+                block = _table_block(child, kind)
+            else:
+                continue
+            if block["text"].strip() and block["text"] not in seen:
+                seen.add(block["text"])
+                yield block
+
+def iter_docx_blocks(source, headers=True):
+    """
+    Yield the blocks of a DOCX file in document order.
+
+    Args:
+        source: File path or binary file-like object
+        headers (bool): Include running header and footer blocks
+    """
+    with zipfile.ZipFile(source) as archive:
+        styles = _read_styles(archive)
+
+        if headers:
+            yield from _part_blocks(archive, "header", "header", styles)
+
+        body = None
+        depth = 0
+        with archive.open("word/document.xml") as document:
+            for event, element in ET.iterparse(document, events=("start", "end")):
+                if event == "start":
+                    depth += 1
+                    if element.tag == _BODY:
+                        body, body_depth = element, depth
+                    continue
+                depth -= 1
+                if body is None or depth != body_depth:
+                    continue
+                # A finished top-level element: emit it, then free its subtree
+                if element.tag == _PARAGRAPH:
+                    yield _paragraph_block(element, styles)
+                elif element.tag == _TABLE:
+                    yield _table_block(element)
+                body.remove(element)
+
+        if headers:
+            yield from _part_blocks(archive, "footer", "footer", styles)
+
+def blocks_text(blocks):
+    """Plain text of a block stream: one paragraph per line, tables as row lines."""
+    return "".join(block["text"] + "\n" for block in blocks)
+
+def _is_heading(block, max_chars):
+    text = block["text"].strip()
+    return block["kind"] == "paragraph" and block["level"] and text and len(text) <= max_chars and "\n" not in text
+
+def heading_levels(blocks, max_chars=200):
+    """{heading text: level} for style-detected headings, as ``parse_sections`` font headings."""
+    return {block["text"].strip(): block["level"] for block in blocks if _is_heading(block, max_chars)}
+
+def text_and_headings(blocks, max_chars=200):
+    """``blocks_text`` and ``heading_levels`` in one pass over a block stream."""
+    parts = []
+    headings = {}
+    for block in blocks:
+        parts.append(block["text"] + "\n")
+        if _is_heading(block, max_chars):
+            headings[block["text"].strip()] = block["level"]
+    return "".join(parts), headings
@@ -0,0 +1,123 @@
+"""
+On-disk cache of extracted page texts, keyed by file content hash.
+
+Each entry is a JSON-lines file with one page per line, written while the
+pages stream out of the extractor and renamed into place only once the whole
+document has been read. Hits refresh the entry's modification time; when the
+cache grows past ``EXTRACTION_CACHE_MAX_BYTES`` the least recently used
+entries are evicted.
+"""
+
+import os
+import json
+import threading
+
+EXTRACTION_CACHE_DIR = os.getenv("AIRST_EXTRACTION_CACHE_DIR", ".extraction_cache")
+EXTRACTION_CACHE_MAX_BYTES = int(os.getenv("AIRST_EXTRACTION_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+
+# Bump when extractor output changes so stale entries are ignored
+EXTRACTION_CACHE_VERSION = 1
+
+_cache_stats = {"hits": 0, "misses": 0, "evictions": 0}
+_evict_lock = threading.Lock()
+
+def cache_key(content_hash, variant):
+    """Entry name for one file and one extraction variant (e.g. "pdf-selective")."""
+    return f"{content_hash}-{variant}-v{EXTRACTION_CACHE_VERSION}"
+
+def _entry_path(key):
+    return os.path.join(EXTRACTION_CACHE_DIR, f"{key}.jsonl")
+
+def has_entry(key):
+    return os.path.exists(_entry_path(key))
+
+def evict(max_bytes=None):
+    """Delete least recently used entries until the cache fits in ``max_bytes``."""
+    max_bytes = EXTRACTION_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    with _evict_lock:
+        try:
+            names = [n for n in os.listdir(EXTRACTION_CACHE_DIR) if n.endswith(".jsonl")]
+        except FileNotFoundError:
+            return 0
+
+        entries = []
+        for name in names:
+            try:
+                stat = os.stat(os.path.join(EXTRACTION_CACHE_DIR, name))
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+
+        total = sum(size for _, size, _ in entries)
+        evicted = 0
+        for _, size, name in sorted(entries):
+            if total <= max_bytes:
+                break
+            try:
+                os.remove(os.path.join(EXTRACTION_CACHE_DIR, name))
+            except FileNotFoundError:
+                pass
+            total -= size
+            evicted += 1
+
+        _cache_stats["evictions"] += evicted
+        return evicted
+
+def cached_pages(key, extract):
+    """
+    Yield page texts from the cache, or from ``extract()`` while caching them.
+
+    Args:
+        key (str): Entry name from ``cache_key``
+        extract (callable): Returns an iterable of page texts; only called on a miss
+
+    A partially consumed miss leaves no entry behind.
+    """
+    path = _entry_path(key)
+    try:
+        entry = open(path, "r", encoding="utf-8")
+    except FileNotFoundError:
+        entry = None
+
+    if entry is not None:
+        _cache_stats["hits"] += 1
+        with entry:
+            # Touch on read so eviction is least-recently-used, not oldest-written
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                pass
+            for line in entry:
+                yield json.loads(line)
+        return
+
+    _cache_stats["misses"] += 1
+    os.makedirs(EXTRACTION_CACHE_DIR, exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    complete = False
+
+    try:
+        with open(temp_path, "w", encoding="utf-8") as f:
+            for page in extract():
+                f.write(json.dumps(page) + "\n")
+                yield page
+        os.replace(temp_path, path)
+        complete = True
+    finally:
+        if not complete and os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    evict()
+
+def get_cached_pages(key):
+    """All cached page texts for ``key``, or None without extracting anything."""
+    if not has_entry(key):
+        return None
+    try:
+        return list(cached_pages(key, lambda: ()))
+    except FileNotFoundError:
+        return None
+
+def get_extraction_cache_stats():
+    """Hit/miss/eviction counters for this process."""
+    return dict(_cache_stats)
@@ -0,0 +1,59 @@
+"""
+Locks that hold across threads and processes.
+
+The app and ``bulk_ingest.py`` can run at the same time, and both
+read-modify-write ``user_files.json`` and the flat/IVF index manifests.
+``FileLock`` pairs a re-entrant thread lock with an exclusive ``flock`` on a
+lock file, taken by the outermost holder in this process. Without ``fcntl``
+(Windows) it only serializes the threads of one process.
+"""
+
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+class FileLock:
+    """Re-entrant lock on ``path`` (a lock file path, or a callable returning one)."""
+
+    def __init__(self, path):
+        self._path = path
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._file = None
+
+    def acquire(self):
+        self._lock.acquire()
+        if self._depth == 0 and fcntl is not None:
+            try:
+                path = self._path() if callable(self._path) else self._path
+                directory = os.path.dirname(path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self._file = open(path, "a")
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+            except BaseException:
+                if self._file is not None:
+                    self._file.close()
+                    self._file = None
+                self._lock.release()
+                raise
+        self._depth += 1
+
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0 and self._file is not None:
+            # Closing the file drops the flock
+            self._file.close()
+            self._file = None
+        self._lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
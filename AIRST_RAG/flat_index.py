@@ -0,0 +1,430 @@
+"""
+Exact vector index on NumPy memory-mapped files.
+
+A dependency-light alternative to Chroma for small and medium tenants
+(``AIRST_VECTOR_BACKEND=flat``, see vector_store.py). Each user's chunks live
+in their own directory of append-only segments:
+
+    manifest.json           segments and the rows each file owns in them
+    seg-<id>.npy            float16 unit-length embeddings, memory-mapped
+    seg-<id>.jsonl          one {"document", "metadata"} record per row
+    seg-<id>.offsets.npy    byte offset of every record line
+
+``add`` writes a new segment and ``delete_file`` only drops the file's rows
+from the manifest, so writes never touch existing data. A search is one
+matrix-vector product per segment (converted to float32 in blocks) and an
+``argpartition`` for the top k: results are exact and latency only depends
+on the number of rows. Once there are more than ``FLAT_MAX_SEGMENTS``
+segments the smallest ones of similar size are merged, and once ``FLAT_MAX_DELETED_FRACTION``
+of the rows are deleted every segment is rewritten without them.
+
+Embeddings are normalized before they are stored, and distances are squared
+L2 between unit vectors (``2 - 2 cos``), the same ranking as cosine
+similarity. Writes take ``write.lock`` in the index directory, so the app and
+``bulk_ingest.py`` can write the same index; other processes pick up changes
+to the manifest on their next call.
+"""
+
+import os
+import json
+import uuid
+import threading
+
+import numpy as np
+
+from file_lock import FileLock
+from vector_store import user_index_name
+
+# Segments per user index before the smallest ones are merged
+FLAT_MAX_SEGMENTS = int(os.getenv("AIRST_FLAT_MAX_SEGMENTS", 8))
+
+# Share of deleted rows that triggers rewriting every segment
+FLAT_MAX_DELETED_FRACTION = float(os.getenv("AIRST_FLAT_MAX_DELETED_FRACTION", 0.25))
+
+MANIFEST_NAME = "manifest.json"
+
+# Held by every write, in this process and others
+WRITE_LOCK_NAME = "write.lock"
+
+# Rows converted from float16 per matrix-vector product (fits in CPU cache)
+_SCORE_BLOCK_ROWS = 8192
+
+def _unit_vectors(embeddings):
+    vectors = np.atleast_2d(np.asarray(embeddings, dtype=np.float32))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+def _record_line(document, metadata):
+    return json.dumps({"document": document, "metadata": metadata}).encode("utf-8") + b"\n"
+
+def _live_rows(segment):
+    return sum(run[2] - run[1] for run in segment["files"])
+
+def _merge_candidates(segments):
+    """
+    Names of the smallest segments of similar size: the two smallest, plus each
+    next one no larger than those picked so far together. A merge at least
+    doubles the segment a row is in, so rows are rewritten O(log n) times.
+    """
+    ordered = sorted(segments, key=_live_rows)
+    picked = ordered[:2]
+    total = sum(_live_rows(segment) for segment in picked)
+    for segment in ordered[2:]:
+        if _live_rows(segment) > total:
+            break
+        picked.append(segment)
+        total += _live_rows(segment)
+    return [segment["name"] for segment in picked]
+
+class FlatIndex:
+    """One user's chunks as float16 segments in ``directory``."""
+
+    def __init__(self, directory, username=None):
+        self.directory = directory
+        self.name = os.path.basename(directory)
+        self._username = username
+        self._lock = threading.RLock()
+        # Taken before ``_lock``; reads only take ``_lock``
+        self._write_lock = FileLock(self._path(WRITE_LOCK_NAME))
+        self._manifest = None
+        self._manifest_stamp = None
+        self._arrays = {}     # segment name -> (vectors memmap, offsets memmap)
+        self._masks = {}      # segment name -> boolean live-row mask, None when every row is live
+
+    @property
+    def username(self):
+        if self._username is None:
+            with self._lock:
+                self._load()
+        return self._username
+
+    # ---------- Manifest ----------
+
+    def _path(self, *parts):
+        return os.path.join(self.directory, *parts)
+
+    def _load(self):
+        """The manifest, re-read if another process changed it."""
+        try:
+            stat = os.stat(self._path(MANIFEST_NAME))
+            stamp = (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            stamp = None
+        if self._manifest is not None and stamp == self._manifest_stamp:
+            return self._manifest
+
+        if stamp is None:
+            manifest = {"user": self._username, "dimensions": None, "segments": []}
+        else:
+            with open(self._path(MANIFEST_NAME), "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            # Runs from before origins were recorded get one from where they are now, which
+            # tells apart the runs of one file; the next compaction stores it
+            for segment in manifest["segments"]:
+                for run in segment["files"]:
+                    if len(run) < 4:
+                        run.append(f"{segment['name']}:{run[1]}")
+        self._set_manifest(manifest, stamp)
+        return manifest
+
+    def _save(self, manifest):
+        os.makedirs(self.directory, exist_ok=True)
+        temp_path = self._path(f"{MANIFEST_NAME}.{os.getpid()}.tmp")
+        with open(temp_path, "w", encoding="utf-8") as f:
+            # dumps, not dump: dump streams through the pure-Python encoder
+            f.write(json.dumps(manifest))
+        os.replace(temp_path, self._path(MANIFEST_NAME))
+        stat = os.stat(self._path(MANIFEST_NAME))
+        self._set_manifest(manifest, (stat.st_mtime_ns, stat.st_size))
+
+    def _set_manifest(self, manifest, stamp):
+        self._manifest, self._manifest_stamp = manifest, stamp
+        if self._username is None:
+            self._username = manifest.get("user")
+        live = {segment["name"] for segment in manifest["segments"]}
+        self._arrays = {name: arrays for name, arrays in self._arrays.items() if name in live}
+        self._masks = {}
+
+    # ---------- Segments ----------
+
+    def _write_segment(self, parts, rows, dimensions):
+        """
+        Write a segment from ``parts``, an iterable of (float16 vectors, record lines).
+
+        Returns:
+            str: The new segment's name
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        name = f"seg-{uuid.uuid4().hex[:12]}"
+        vectors = np.lib.format.open_memmap(
+            self._path(f"{name}.npy"), mode="w+", dtype=np.float16, shape=(rows, dimensions)
+        )
+        offsets = np.zeros(rows + 1, dtype=np.int64)
+        row = 0
+        with open(self._path(f"{name}.jsonl"), "wb") as records:
+            for part_vectors, lines in parts:
+                vectors[row:row + len(lines)] = part_vectors
+                for line in lines:
+                    records.write(line)
+                    row += 1
+                    offsets[row] = offsets[row - 1] + len(line)
+        vectors.flush()
+        del vectors
+        np.save(self._path(f"{name}.offsets.npy"), offsets)
+        return name
+
+    def _remove_segment_files(self, name):
+        for suffix in (".npy", ".jsonl", ".offsets.npy"):
+            try:
+                os.remove(self._path(f"{name}{suffix}"))
+            except FileNotFoundError:
+                pass
+
+    def _segment_arrays(self, name):
+        arrays = self._arrays.get(name)
+        if arrays is None:
+            arrays = (
+                np.load(self._path(f"{name}.npy"), mmap_mode="r"),
+                np.load(self._path(f"{name}.offsets.npy"), mmap_mode="r")
+            )
+            self._arrays[name] = arrays
+        return arrays
+
+    def _live_mask(self, segment):
+        name = segment["name"]
+        if name not in self._masks:
+            if _live_rows(segment) == segment["rows"]:
+                self._masks[name] = None
+            else:
+                mask = np.zeros(segment["rows"], dtype=bool)
+                for run in segment["files"]:
+                    mask[run[1]:run[2]] = True
+                self._masks[name] = mask
+        return self._masks[name]
+
+    def _record_lines(self, name, rows):
+        """Raw record lines of ``rows`` (sorted) in segment ``name``."""
+        _, offsets = self._segment_arrays(name)
+        lines = []
+        with open(self._path(f"{name}.jsonl"), "rb") as records:
+            for row in rows:
+                records.seek(int(offsets[row]))
+                lines.append(records.read(int(offsets[row + 1] - offsets[row])))
+        return lines
+
+    # ---------- Index interface (see vector_store.py) ----------
+
+    def add(self, file_id, documents, embeddings, metadatas):
+        documents = list(documents)
+        if not documents:
+            return
+        vectors = _unit_vectors(embeddings).astype(np.float16)
+        lines = [_record_line(document, metadata) for document, metadata in zip(documents, metadatas)]
+        with self._write_lock, self._lock:
+            manifest = self._load()
+            if manifest["dimensions"] is None:
+                manifest["dimensions"] = vectors.shape[1]
+            elif manifest["dimensions"] != vectors.shape[1]:
+                raise ValueError(
+                    f"Embedding dimension {vectors.shape[1]} does not match the index ({manifest['dimensions']})"
+                )
+            name = self._write_segment([(vectors, lines)], len(lines), vectors.shape[1])
+            # The segment a file was added in stays its origin through compactions, telling a
+            # re-ingested file apart from the one it replaced
+            manifest["segments"].append({
+                "name": name, "rows": len(lines), "files": [[file_id, 0, len(lines), name]]
+            })
+            self._save(manifest)
+            self._maybe_compact()
+
+    def has_file(self, file_id):
+        with self._lock:
+            return any(run[0] == file_id for segment in self._load()["segments"] for run in segment["files"])
+
+    def get_file(self, file_id):
+        documents, embeddings, metadatas = [], [], []
+        with self._lock:
+            for segment in self._load()["segments"]:
+                rows = [row for run in segment["files"] if run[0] == file_id for row in range(run[1], run[2])]
+                if not rows:
+                    continue
+                vectors, _ = self._segment_arrays(segment["name"])
+                embeddings.extend(vectors[rows].astype(np.float32).tolist())
+                for line in self._record_lines(segment["name"], rows):
+                    record = json.loads(line)
+                    documents.append(record["document"])
+                    metadatas.append(record["metadata"])
+        return {"documents": documents, "embeddings": embeddings, "metadatas": metadatas}
+
+    def delete_file(self, file_id):
+        with self._write_lock, self._lock:
+            manifest = self._load()
+            emptied = []
+            changed = False
+            for segment in manifest["segments"]:
+                runs = [run for run in segment["files"] if run[0] != file_id]
+                if len(runs) != len(segment["files"]):
+                    segment["files"] = runs
+                    changed = True
+                    if not runs:
+                        emptied.append(segment["name"])
+            if not changed:
+                return
+            manifest["segments"] = [segment for segment in manifest["segments"] if segment["files"]]
+            self._save(manifest)
+            for name in emptied:
+                self._remove_segment_files(name)
+            self._maybe_compact()
+
+    def count(self):
+        with self._lock:
+            return sum(_live_rows(segment) for segment in self._load()["segments"])
+
+    def _snapshot(self):
+        """(name, vectors, offsets, live mask, open record file) of every segment."""
+        segments = []
+        try:
+            for segment in self._load()["segments"]:
+                vectors, offsets = self._segment_arrays(segment["name"])
+                records = open(self._path(f"{segment['name']}.jsonl"), "rb")
+                segments.append((segment["name"], vectors, offsets, self._live_mask(segment), records))
+        except BaseException:
+            for *_, records in segments:
+                records.close()
+            raise
+        return segments
+
+    def _open_segments(self):
+        """``_snapshot`` of the current manifest; call with the lock held, and close the record files."""
+        try:
+            return self._snapshot()
+        except FileNotFoundError:
+            # Another process compacted between reading the manifest and opening its segments
+            self._manifest = None
+            return self._snapshot()
+
+    def _read_results(self, segments, candidates, top_k):
+        """Query results of the best ``top_k`` (score, segment position, row) candidates."""
+        results = []
+        for score, position, row in sorted(candidates, key=lambda candidate: -candidate[0])[:top_k]:
+            _, _, offsets, _, records = segments[position]
+            records.seek(int(offsets[row]))
+            record = json.loads(records.read(int(offsets[row + 1] - offsets[row])))
+            metadata = record["metadata"]
+            results.append((metadata["file_id"], record["document"], max(2.0 - 2.0 * score, 0.0), metadata))
+        return results
+
+    def query(self, embedding, top_k=5):
+        query = _unit_vectors(embedding)[0]
+        with self._lock:
+            segments = self._open_segments()
+
+        # Open maps and files stay readable after a concurrent compaction unlinks them
+        try:
+            candidates = []
+            buffer = np.empty((_SCORE_BLOCK_ROWS, len(query)), dtype=np.float32)
+            for position, (_, vectors, _, mask, _) in enumerate(segments):
+                scores = np.empty(len(vectors), dtype=np.float32)
+                for start in range(0, len(vectors), _SCORE_BLOCK_ROWS):
+                    block = vectors[start:start + _SCORE_BLOCK_ROWS]
+                    np.copyto(buffer[:len(block)], block)
+                    np.dot(buffer[:len(block)], query, out=scores[start:start + len(block)])
+                if mask is not None:
+                    scores[~mask] = -np.inf
+                k = min(top_k, len(scores) if mask is None else int(mask.sum()))
+                if k <= 0:
+                    continue
+                for row in np.argpartition(-scores, k - 1)[:k]:
+                    candidates.append((float(scores[row]), position, int(row)))
+            return self._read_results(segments, candidates, top_k)
+        finally:
+            for *_, records in segments:
+                records.close()
+
+    def start_build(self):
+        # Exact search has nothing to build
+        return None
+
+    # ---------- Compaction ----------
+
+    def _maybe_compact(self):
+        manifest = self._load()
+        segments = manifest["segments"]
+        rows = sum(segment["rows"] for segment in segments)
+        deleted = rows - sum(_live_rows(segment) for segment in segments)
+        if rows and deleted / rows > FLAT_MAX_DELETED_FRACTION:
+            self.compact()
+        elif len(segments) > FLAT_MAX_SEGMENTS:
+            self.compact(_merge_candidates(segments))
+
+    def compact(self, names=None):
+        """Merge segments ``names`` (default: all) into one, dropping deleted rows."""
+        with self._write_lock, self._lock:
+            manifest = self._load()
+            merged = [segment for segment in manifest["segments"] if names is None or segment["name"] in names]
+            if not merged or (len(merged) == 1 and _live_rows(merged[0]) == merged[0]["rows"]):
+                return
+
+            files = []
+            rows = 0
+            for segment in merged:
+                for file_id, start, stop, *origin in segment["files"]:
+                    files.append([file_id, rows, rows + stop - start, *origin])
+                    rows += stop - start
+
+            def parts():
+                for segment in merged:
+                    vectors, _ = self._segment_arrays(segment["name"])
+                    for _, start, stop, *_ in segment["files"]:
+                        yield vectors[start:stop], self._record_lines(segment["name"], range(start, stop))
+
+            merged_names = {segment["name"] for segment in merged}
+            kept = [segment for segment in manifest["segments"] if segment["name"] not in merged_names]
+            if rows:
+                name = self._write_segment(parts(), rows, manifest["dimensions"])
+                kept.append({"name": name, "rows": rows, "files": files})
+            manifest["segments"] = kept
+            self._save(manifest)
+            for segment in merged:
+                self._remove_segment_files(segment["name"])
+
+class FlatBackend:
+    """Per-user flat indexes under ``path``."""
+
+    index_class = FlatIndex
+
+    def __init__(self, path):
+        self.path = path
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    def _index(self, name, username=None):
+        with self._lock:
+            if name not in self._indexes:
+                self._indexes[name] = self.index_class(os.path.join(self.path, name), username)
+            return self._indexes[name]
+
+    def user_index(self, username):
+        """The user's index (its directory is created by the first write)."""
+        return self._index(user_index_name(username), username)
+
+    def user_indexes(self):
+        """Every user's index."""
+        if not os.path.isdir(self.path):
+            return
+        for entry in sorted(os.scandir(self.path), key=lambda entry: entry.name):
+            if entry.is_dir() and os.path.exists(os.path.join(entry.path, MANIFEST_NAME)):
+                yield self._index(entry.name)
+
+    def purge_file(self, file_id):
+        """Delete a file's chunks from every user's index."""
+        for index in self.user_indexes():
+            index.delete_file(file_id)
+
+    def migrate_legacy_file(self, index, file_id):
+        # Per-file collections only ever existed in Chroma
+        return False
+
+    def drop_legacy_file(self, file_id):
+        pass
@@ -0,0 +1,150 @@
+"""
+Incremental re-ingestion of revised documents.
+
+When a user uploads a new version of a file, pages are compared by a hash of
+their content stream and of every resource it draws (form XObjects, fonts,
+images), which is cheap: no text extraction. Unchanged pages take their text
+from the previous version's extraction cache entry and only runs of changed
+pages are extracted again. Chunks are page aligned, so an edit only
+reshapes the chunks of the pages it touches, and every chunk whose text is
+unchanged carries its embedding over from the previous collection.
+"""
+
+import hashlib
+import re
+from collections import Counter
+
+from pdf_extraction import extract_page_range
+
+# Indirect reference ("12 0 R") inside a PDF object definition
+_REFERENCE = re.compile(rb"(\d+) \d+ R")
+
+def _object_digest(doc, xref, digests, visiting):
+    """
+    Hash of a PDF object, its stream and every object it references.
+
+    References are replaced by the digest of their target, so the hash does
+    not depend on object numbering, and pages that differ only in a shared
+    form XObject's contents get different hashes.
+    """
+    if xref in digests:
+        return digests[xref]
+    if xref in visiting or not 0 < xref < doc.xref_length():
+        return b"-"
+
+    visiting.add(xref)
+    source = doc.xref_object(xref, compressed=True).encode("utf-8", errors="surrogateescape")
+    source = _REFERENCE.sub(lambda m: _object_digest(doc, int(m.group(1)), digests, visiting), source)
+    digest = hashlib.sha256(source + b"\0" + (doc.xref_stream_raw(xref) or b"")).hexdigest().encode()
+    visiting.discard(xref)
+    digests[xref] = digest
+    return digest
+
+def _resources_digest(doc, page_xref, digests):
+    """Digest of a page's resource dictionary, inherited from the page tree if need be."""
+    xref = page_xref
+    while xref:
+        kind, value = doc.xref_get_key(xref, "Resources")
+        if kind == "xref":
+            return _object_digest(doc, int(value.split()[0]), digests, set())
+        if kind == "dict":
+            return _REFERENCE.sub(
+                lambda m: _object_digest(doc, int(m.group(1)), digests, set()),
+                value.encode("utf-8", errors="surrogateescape")
+            )
+        kind, value = doc.xref_get_key(xref, "Parent")
+        xref = int(value.split()[0]) if kind == "xref" else 0
+    return b""
+
+def pdf_page_hashes(file_path):
+    """SHA-256 of each page's content stream and resources, in page order."""
+    import fitz
+    digests = {}
+    with fitz.open(file_path) as doc:
+        return [
+            hashlib.sha256(b"\0".join([
+                page.read_contents(),
+                _resources_digest(doc, page.xref, digests),
+                f"{tuple(page.rect)} {page.rotation}".encode()
+            ])).hexdigest()
+            for page in doc
+        ]
+
+def chunk_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def iter_revised_pages(file_path, previous_path, previous_pages, tables="none", stats=None, font_headings=None):
+    """
+    Yield the page texts of ``file_path``, reusing unchanged pages of the previous version.
+
+    Args:
+        file_path (str): The new PDF
+        previous_path (str): The previous version's PDF
+        previous_pages (list): Page texts of the previous version, or None
+        tables (str): Table mode for pages that must be extracted
+        stats (dict): Filled with "pages" and "extracted" counts
+        font_headings: ``FontHeadings`` taking in the font cues of extracted pages
+    """
+    stats = stats if stats is not None else {}
+    new_hashes = pdf_page_hashes(file_path)
+
+    previous_text = {}
+    if previous_pages is not None:
+        previous_hashes = pdf_page_hashes(previous_path)
+        if len(previous_hashes) == len(previous_pages):
+            # A hash seen twice in either version cannot tell its pages apart
+            previous_counts = Counter(previous_hashes)
+            new_counts = Counter(new_hashes)
+            previous_text = {
+                page_hash: text for page_hash, text in zip(previous_hashes, previous_pages)
+                if previous_counts[page_hash] == 1 and new_counts[page_hash] == 1
+            }
+
+    stats["pages"] = len(new_hashes)
+    stats["extracted"] = 0
+
+    index = 0
+    while index < len(new_hashes):
+        if new_hashes[index] in previous_text:
+            yield previous_text[new_hashes[index]]
+            index += 1
+            continue
+
+        # Extract the whole run of changed pages in one call
+        stop = index
+        while stop < len(new_hashes) and new_hashes[stop] not in previous_text:
+            stop += 1
+        for page in extract_page_range(file_path, index, stop, tables, fonts=font_headings is not None):
+            if font_headings is not None:
+                font_headings.add_page(page["fonts"])
+            yield page["text"]
+        stats["extracted"] += stop - index
+        index = stop
+
+def load_reusable_embeddings(index, file_id):
+    """{chunk text hash: embedding} for every chunk of ``file_id`` in a user's index (see vector_store.py)."""
+    stored = index.get_file(file_id)
+    documents = stored["documents"]
+    embeddings = stored["embeddings"]
+    return {
+        chunk_hash(document): [float(value) for value in embedding]
+        for document, embedding in zip(documents, embeddings)
+    }
+
+def embed_with_reuse(texts, reusable, encode):
+    """
+    Embeddings for ``texts``, encoding only those not found in ``reusable``.
+
+    Returns:
+        tuple: (list of embeddings, number of reused embeddings)
+    """
+    hashes = [chunk_hash(text) for text in texts]
+    missing = [i for i, h in enumerate(hashes) if h not in reusable]
+
+    embeddings = [reusable.get(h) for h in hashes]
+    if missing:
+        encoded = encode([texts[i] for i in missing])
+        for i, embedding in zip(missing, encoded):
+            embeddings[i] = [float(value) for value in embedding]
+
+    return embeddings, len(texts) - len(missing)
@@ -0,0 +1,394 @@
+"""
+Document ingestion shared by the Streamlit app and the bulk CLI.
+
+Turns a stored upload into page texts (through the extraction cache, reusing
+the previous version's pages for revisions), page-aligned chunks and
+embedded records in the user's chunk index (see vector_store.py). The
+vector store and the encoder are passed in, so this module stays importable
+from extraction worker processes without loading Streamlit, ChromaDB or any
+model.
+"""
+
+import os
+import time
+import threading
+
+from extraction_cache import cache_key, cached_pages, get_cached_pages, has_entry
+from incremental_ingest import iter_revised_pages, load_reusable_embeddings, embed_with_reuse
+from pdf_extraction import iter_pages, has_pdfplumber
+from preprocessing import iter_page_chunks
+from section_parser import FontHeadings
+from upload_store import BLOBS_KEY, load_user_files, blob_path, hash_file, mark_indexed, mark_indexed_many
+from docx_extraction import iter_docx_blocks, blocks_text, text_and_headings
+from stream_pipeline import iter_pipeline, batched
+from vector_store import copy_file_chunks
+
+# Sentence embedding model used for every chunk and query
+EMBED_MODEL_NAME = "all-MiniLM-L6-v2"
+
+# Number of streamed chunks per embedding call
+EMBED_BATCH_SIZE = int(os.getenv("AIRST_EMBED_BATCH_SIZE", 64))
+
+# Number of embedded chunks per vector store write
+WRITE_BATCH_SIZE = int(os.getenv("AIRST_WRITE_BATCH_SIZE", 256))
+
+# Retrieval chunk size and overlap, in characters
+CHUNK_MAX_LENGTH = 1000
+CHUNK_OVERLAP = 200
+
+SUPPORTED_EXTENSIONS = (".pdf", ".doc", ".docx")
+
+# pdfplumber only runs on pages that look like tables (see pdf_extraction.py)
+DEFAULT_TABLE_MODE = "selective" if has_pdfplumber() else "none"
+
+# One writer per stored file: an upload and the startup reconciliation may race
+_ingest_locks = {}
+_ingest_locks_guard = threading.Lock()
+
+_reconciliation = None
+_reconciliation_guard = threading.Lock()
+
+def _ingest_lock(stored_filename):
+    with _ingest_locks_guard:
+        return _ingest_locks.setdefault(stored_filename, threading.Lock())
+
+def iter_pdf_page_texts(file_path, tables=DEFAULT_TABLE_MODE, on_warning=print, font_headings=None):
+    """
+    Page texts of a PDF; the first table extraction failure is reported once.
+
+    ``font_headings`` (a ``FontHeadings``) takes in each page's font cues,
+    found by the extraction workers, before the page text is yielded.
+    """
+    warned = False
+    for page in iter_pages(file_path, tables=tables, fonts=font_headings is not None):
+        if page["error"] and not warned:
+            on_warning(f"pdfplumber table extraction failed: {page['error']}. Using PyMuPDF text only.")
+            warned = True
+        if font_headings is not None:
+            font_headings.add_page(page["fonts"])
+        yield page["text"]
+
+def docx_text(source):
+    """Text of a DOCX file path or file-like object: paragraphs, tables, headers and footers."""
+    return blocks_text(iter_docx_blocks(source))
+
+def docx_blocks(file_path, content_hash):
+    """The block stream of a DOCX file (see docx_extraction.py), through the extraction cache."""
+    return cached_pages(cache_key(content_hash, "docx-blocks"), lambda: iter_docx_blocks(file_path))
+
+def cached_pdf_headings(content_hash):
+    """{heading line: level} found from a PDF's font cues, or None if not cached yet."""
+    lines = get_cached_pages(cache_key(content_hash, "pdf-font-headings"))
+    return None if lines is None else dict(lines)
+
+def _cache_pdf_headings(pages, font_headings, content_hash):
+    """Yield ``pages``, then cache the headings their font cues gave once every page was read."""
+    yield from pages
+    for _ in cached_pages(cache_key(content_hash, "pdf-font-headings"), lambda: sorted(font_headings.headings.items())):
+        pass
+
+def file_pages(file_path, content_hash, tables=DEFAULT_TABLE_MODE, previous_path=None, previous_hash=None,
+               page_stats=None, on_warning=print, headings=None):
+    """
+    Page texts of a PDF or DOCX file, through the extraction cache.
+
+    Args:
+        file_path (str): File to read
+        content_hash (str): SHA-256 of the file, keying its cache entry
+        previous_path, previous_hash: The prior version of a revised PDF, whose
+            cached pages are reused for unchanged pages
+        page_stats (dict): Filled with "pages" and "extracted" for revisions
+        headings (dict): Filled with {heading line: level} from DOCX heading
+            styles or PDF font cues, for ``file_chunks``; PDF headings are
+            added as the pages stream (see ``FontHeadings``), and a DOCX is
+            returned as a single page
+    """
+    extension = os.path.splitext(file_path)[1].lower()
+
+    if extension == ".pdf":
+        key = cache_key(content_hash, f"pdf-{tables}")
+        font_headings = None
+        if headings is not None:
+            cached_headings = cached_pdf_headings(content_hash)
+            if cached_headings is not None:
+                headings.update(cached_headings)
+            else:
+                font_headings = FontHeadings(headings)
+        previous_pages = None
+        if previous_hash is not None and os.path.exists(previous_path):
+            previous_pages = get_cached_pages(cache_key(previous_hash, f"pdf-{tables}"))
+        if previous_pages is not None:
+            if font_headings is not None:
+                # Only changed pages are extracted; unchanged ones keep the previous version's headings
+                headings.update(cached_pdf_headings(previous_hash) or {})
+            extract = lambda: iter_revised_pages(
+                file_path, previous_path, previous_pages, tables, stats=page_stats, font_headings=font_headings
+            )
+        else:
+            extract = lambda: iter_pdf_page_texts(file_path, tables, on_warning, font_headings)
+        if font_headings is None:
+            return cached_pages(key, extract)
+        if has_entry(key):
+            # Pages cached without their headings (e.g. by the upload preview) are read again for the font cues
+            return _cache_pdf_headings(iter_pdf_page_texts(file_path, tables, on_warning, font_headings),
+                                       font_headings, content_hash)
+        return _cache_pdf_headings(cached_pages(key, extract), font_headings, content_hash)
+
+    if extension in (".doc", ".docx"):
+        text, levels = text_and_headings(docx_blocks(file_path, content_hash))
+        if headings is not None:
+            headings.update(levels)
+        return [text]
+
+    raise ValueError(f"Unsupported file type: {extension}")
+
+def file_chunks(pages, headings=None):
+    """Page-aligned retrieval chunks, so edits only change the chunks of edited pages."""
+    return iter_page_chunks(
+        pages, max_length=CHUNK_MAX_LENGTH, overlap=CHUNK_OVERLAP, page_aligned=True, headings=headings
+    )
+
+def prepare_chunks(file_path, content_hash, tables=DEFAULT_TABLE_MODE):
+    """
+    Extract and chunk one file, for bulk ingestion worker processes.
+
+    Returns:
+        tuple: (page count, list of chunk dicts)
+    """
+    headings = {}
+    pages = list(file_pages(file_path, content_hash, tables, headings=headings))
+    return len(pages), list(file_chunks(pages, headings))
+
+def write_chunks(index, file_id, chunks, encode, reusable=None, batch_size=EMBED_BATCH_SIZE,
+                 write_batch_size=None, queue_size=None):
+    """
+    Embed and store one file's chunks through a streaming pipeline.
+
+    Chunk production (page extraction, cleaning, chunking), embedding and
+    store writes each run on their own thread, connected by bounded queues
+    (see stream_pipeline.py), so only a few batches are in memory at once and
+    extraction of later pages overlaps embedding and writing of earlier ones.
+
+    Args:
+        index: The user's chunk index (``backend.user_index``, see vector_store.py)
+        file_id (str): Stored filename of the upload
+        batch_size (int): Chunks per embedding call
+        write_batch_size (int): Chunks per ``index.add`` call
+        queue_size (int): Batches buffered between two stages
+
+    Returns:
+        tuple: (chunks written, embeddings reused from ``reusable``)
+    """
+    write_batch_size = write_batch_size or WRITE_BATCH_SIZE
+    reusable = reusable or {}
+
+    # Drop partial chunks left by an interrupted earlier attempt
+    index.delete_file(file_id)
+
+    def embed(batches):
+        for batch in batches:
+            embeddings, reused = embed_with_reuse([chunk["text"] for chunk in batch], reusable, encode)
+            yield batch, embeddings, reused
+
+    def store(embedded):
+        pending_chunks, pending_embeddings, pending_reused = [], [], 0
+        for batch, embeddings, reused in embedded:
+            pending_chunks.extend(batch)
+            pending_embeddings.extend(embeddings)
+            pending_reused += reused
+            if len(pending_chunks) >= write_batch_size:
+                yield _add_chunks(index, file_id, pending_chunks, pending_embeddings), pending_reused
+                pending_chunks, pending_embeddings, pending_reused = [], [], 0
+        if pending_chunks:
+            yield _add_chunks(index, file_id, pending_chunks, pending_embeddings), pending_reused
+
+    chunk_count = 0
+    reused_count = 0
+    for written, reused in iter_pipeline(batched(chunks, batch_size), [embed, store], queue_size):
+        chunk_count += written
+        reused_count += reused
+
+    return chunk_count, reused_count
+
+def _add_chunks(index, file_id, chunks, embeddings):
+    index.add(
+        file_id,
+        [chunk["text"] for chunk in chunks],
+        embeddings,
+        [
+            {
+                "file_id": file_id,
+                "page": chunk["page"],
+                "section": chunk["section"] or "",
+                "chunk": chunk["index"]
+            }
+            for chunk in chunks
+        ]
+    )
+    return len(chunks)
+
+def is_revision(index, stored_filename, previous, previous_blob):
+    """Whether ``previous`` is an indexed earlier version of the same kind of file."""
+    return (
+        previous_blob is not None and previous != stored_filename
+        and os.path.splitext(previous)[1] == os.path.splitext(stored_filename)[1]
+        and index.has_file(previous)
+    )
+
+def ingest_stored_file(index, encode, stored_filename, blob, tables=DEFAULT_TABLE_MODE,
+                       previous=None, previous_blob=None, on_warning=print):
+    """
+    Extract, chunk, embed and store one upload in a user's chunk index.
+
+    Pages stream through chunking, embedding and store writes in batches, so
+    memory stays flat no matter how many pages the document has.
+
+    Returns:
+        dict: {"chunks", "reused", "revision", "pages", "extracted"}; "pages"
+        and "extracted" are only set when a PDF revision was diffed by page
+    """
+    with _ingest_lock(stored_filename):
+        return _ingest_stored_file(
+            index, encode, stored_filename, blob, tables, previous, previous_blob, on_warning
+        )
+
+def _ingest_stored_file(index, encode, stored_filename, blob, tables, previous, previous_blob, on_warning):
+    revision = is_revision(index, stored_filename, previous, previous_blob)
+    if not revision:
+        previous = previous_blob = None
+
+    # Extraction runs on a pipeline thread; warnings are reported from the caller's
+    page_stats = {}
+    warnings = []
+    headings = {}
+    pages = file_pages(
+        blob_path(stored_filename), blob["sha256"], tables,
+        blob_path(previous) if revision else None, previous_blob["sha256"] if revision else None,
+        page_stats, warnings.append, headings
+    )
+
+    # Unchanged chunks of the previous version keep their embeddings
+    reusable = load_reusable_embeddings(index, previous) if revision else {}
+
+    chunk_count, reused_count = write_chunks(index, stored_filename, file_chunks(pages, headings), encode, reusable)
+    for warning in warnings:
+        on_warning(warning)
+    return dict(page_stats, chunks=chunk_count, reused=reused_count, revision=revision)
+
+def _file_users(user_files, stored_filename):
+    """Users whose file list references ``stored_filename``."""
+    return sorted(
+        username for username, files in user_files.items()
+        if username != BLOBS_KEY and stored_filename in files.values()
+    )
+
+def _copy_from_other_user(backend, index, username, stored_filename, user_files):
+    """Copy another referencing user's chunks of a file into ``index``; False if nobody has them."""
+    for other in _file_users(user_files, stored_filename):
+        if other != username and copy_file_chunks(backend.user_index(other), index, stored_filename):
+            return True
+    return False
+
+def attach_indexed_file(backend, username, stored_filename):
+    """
+    Give ``username`` chunks of content another user already indexed.
+
+    Returns:
+        bool: True if the user now has the file's chunks without re-embedding
+    """
+    index = backend.user_index(username)
+    with _ingest_lock(stored_filename):
+        if index.has_file(stored_filename):
+            return True
+        return _copy_from_other_user(backend, index, username, stored_filename, load_user_files())
+
+def reconcile_index(backend, encode, tables=DEFAULT_TABLE_MODE, log=print):
+    """
+    Make sure every (user, file) in ``user_files.json`` has chunks in the user's index.
+
+    Missing chunks are restored as cheaply as possible: copied from another
+    user with the same content, copied from a per-file collection written
+    before chunks were sharded by user, or else extracted and embedded again.
+    Files that already have their chunks are left alone. Blobs are flagged as
+    not indexed before they are re-indexed, so an upload of the same bytes
+    meanwhile is not mistaken for already embedded.
+
+    Returns:
+        dict: files, missing, copied, reindexed, failed and seconds
+    """
+    start = time.perf_counter()
+    user_files = load_user_files()
+    blobs = user_files.get(BLOBS_KEY, {})
+    indexes = {username: backend.user_index(username) for username in user_files if username != BLOBS_KEY}
+    references = sorted({
+        (username, stored_filename)
+        for username, files in user_files.items() if username != BLOBS_KEY
+        for stored_filename in files.values()
+    })
+    missing = [(u, f) for u, f in references if not indexes[u].has_file(f)]
+    stats = {"files": len(references), "missing": len(missing), "copied": 0, "reindexed": 0, "failed": 0}
+    # Content nobody has chunks of any more must not be taken as indexed by new uploads
+    missing_users = {}
+    for username, stored_filename in missing:
+        missing_users.setdefault(stored_filename, set()).add(username)
+    unindexed = [f for f, users in missing_users.items() if users == set(_file_users(user_files, f))]
+    mark_indexed_many(sorted(unindexed), False)
+
+    migrated = set()
+    for username, stored_filename in missing:
+        index = indexes[username]
+        try:
+            with _ingest_lock(stored_filename):
+                if index.has_file(stored_filename):
+                    # Re-uploaded while we were working through the list
+                    continue
+                if _copy_from_other_user(backend, index, username, stored_filename, user_files) or \
+                        backend.migrate_legacy_file(index, stored_filename):
+                    migrated.add(stored_filename)
+                    stats["copied"] += 1
+                    mark_indexed(stored_filename)
+                    continue
+                if not os.path.exists(blob_path(stored_filename)):
+                    raise FileNotFoundError(f"stored file {blob_path(stored_filename)} is gone")
+                # Legacy uploads have no blob entry (see upload_store.migrate_legacy_uploads)
+                blob = blobs.get(stored_filename) or {"sha256": hash_file(blob_path(stored_filename))}
+                result = _ingest_stored_file(index, encode, stored_filename, blob, tables, None, None, log)
+            if not result["chunks"]:
+                raise ValueError("no text could be extracted")
+            mark_indexed(stored_filename)
+            stats["reindexed"] += 1
+        except Exception as e:
+            log(f"❌ Could not re-index {stored_filename} for {username}: {e}")
+            stats["failed"] += 1
+
+    # Per-file collections are redundant once their chunks are in the users' indexes
+    for stored_filename in migrated:
+        backend.drop_legacy_file(stored_filename)
+
+    stats["seconds"] = time.perf_counter() - start
+    return stats
+
+def start_reconciliation(get_backend, encode, tables=DEFAULT_TABLE_MODE, log=print):
+    """
+    Run ``reconcile_index`` once per process on a background thread.
+
+    Args:
+        get_backend (callable): Returns the vector store backend; called on
+            the thread so opening the store stays off the caller's path
+
+    Returns:
+        threading.Thread: The reconciliation thread (already started)
+    """
+    global _reconciliation
+
+    def run():
+        stats = reconcile_index(get_backend(), encode, tables, log)
+        log(f"🔁 Vector store reconciled in {stats['seconds'] * 1000:.0f} ms: {stats['files']} files, "
+            f"{stats['missing']} missing, {stats['copied']} copied, {stats['reindexed']} re-indexed, "
+            f"{stats['failed']} failed")
+
+    with _reconciliation_guard:
+        if _reconciliation is None:
+            _reconciliation = threading.Thread(target=run, name="vector-store-reconciliation", daemon=True)
+            _reconciliation.start()
+        return _reconciliation
@@ -1,4 +1,5 @@
 # AIRST_RAG/models.py
+import re
 from transformers import AutoTokenizer, AutoModelForTokenClassification, pipeline
 
 # -----------------------------
@@ -31,24 +32,110 @@ except Exception as e:
     print(f"Warning: Could not load zero-shot classifier: {e}")
     zero_shot_clf = None
 
+DOMAIN_LABELS = ["legal", "scientific", "report"]
+
+# Cheap first stage of the domain cascade: keyword evidence per label
+DOMAIN_KEYWORDS = {
+    "legal": [
+        "agreement", "hereinafter", "hereby", "herein", "plaintiff", "defendant",
+        "court", "clause", "parties", "shall", "liability", "jurisdiction",
+        "contract", "pursuant", "indemnify", "statute", "arbitration", "lessee"
+    ],
+    "scientific": [
+        "abstract", "et al", "methodology", "experiment", "experiments", "hypothesis",
+        "dataset", "datasets", "we propose", "accuracy", "references", "doi",
+        "algorithm", "baseline", "evaluation", "related work", "neural"
+    ],
+    "report": [
+        "executive summary", "quarter", "quarterly", "revenue", "fiscal",
+        "stakeholders", "recommendations", "annual report", "budget", "kpi",
+        "objectives", "progress report", "deliverables", "key findings"
+    ]
+}
+
+_DOMAIN_PATTERNS = {
+    label: re.compile(r"\b(?:" + "|".join(re.escape(k) for k in keywords) + r")\b", re.IGNORECASE)
+    for label, keywords in DOMAIN_KEYWORDS.items()
+}
+_NUMERIC_CITATION = re.compile(r"\[\d+(?:[,\u2013-]\s*\d+)*\]")
+
+# Keyword stage thresholds: minimum evidence and share of the winning label
+DOMAIN_MIN_HITS = 5
+DOMAIN_MIN_SHARE = 0.6
+
+# Sample sizes for each cascade stage
+DOMAIN_KEYWORD_SAMPLE_CHARS = 20000
+DOMAIN_ZERO_SHOT_MAX_TOKENS = 256
+
+# How often each cascade stage produced the final label
+_domain_cascade_stats = {"keyword": 0, "zero_shot": 0, "fallback": 0}
+
+def keyword_domain_scores(text):
+    """Count keyword evidence for each domain label in a leading sample."""
+    sample = text[:DOMAIN_KEYWORD_SAMPLE_CHARS]
+    scores = {label: len(pattern.findall(sample)) for label, pattern in _DOMAIN_PATTERNS.items()}
+    # Numeric citations like [12] are strong evidence for papers
+    scores["scientific"] += len(_NUMERIC_CITATION.findall(sample))
+    return scores
+
+def truncate_to_tokens(text, max_tokens=DOMAIN_ZERO_SHOT_MAX_TOKENS):
+    """Bound a zero-shot premise by tokenizer tokens rather than characters."""
+    tokenizer = getattr(zero_shot_clf, "tokenizer", None)
+    if tokenizer is None:
+        return text[:max_tokens * 4]
+    # Roughly 4 characters per token; only tokenize what can possibly be kept
+    tokens = tokenizer.tokenize(text[:max_tokens * 8])[:max_tokens]
+    return tokenizer.convert_tokens_to_string(tokens)
+
+def predict_domain_with_details(text: str, use_cascade: bool = True) -> dict:
+    """
+    Predict the document domain and report which cascade stage decided it.
+    
+    The keyword stage labels documents with clear evidence; low-margin cases
+    fall through to BART-MNLI zero-shot on a token-bounded sample.
+    """
+    details = {"label": "general", "method": "fallback", "scores": {}}
+    
+    if not text or len(text.strip()) < 10:
+        return details
+    
+    if use_cascade:
+        scores = keyword_domain_scores(text)
+        total = sum(scores.values())
+        best = max(scores, key=scores.get)
+        details["scores"] = scores
+        
+        if total >= DOMAIN_MIN_HITS and scores[best] / total >= DOMAIN_MIN_SHARE:
+            details.update(label=best, method="keyword")
+            return details
+    
+    if zero_shot_clf is None:
+        return details
+    
+    premise = truncate_to_tokens(text) if use_cascade else text
+    result = zero_shot_clf(premise, candidate_labels=DOMAIN_LABELS)
+    
+    if result and "labels" in result and len(result["labels"]) > 0:
+        details.update(
+            label=result["labels"][0],
+            method="zero_shot",
+            scores=dict(zip(result["labels"], result["scores"]))
+        )
+    return details
+
 def predict_domain(text: str) -> str:
     try:
-        if not text or len(text.strip()) < 10:
-            return "general"
-        
-        if zero_shot_clf is None:
-            return "general"
-        
-        labels = ["legal", "scientific", "report"]
-        result = zero_shot_clf(text, candidate_labels=labels)
-        
-        if result and "labels" in result and len(result["labels"]) > 0:
-            return result["labels"][0]
-        else:
-            return "general"
+        details = predict_domain_with_details(text)
+        _domain_cascade_stats[details["method"]] += 1
+        return details["label"]
     except Exception as e:
+        _domain_cascade_stats["fallback"] += 1
         return "general"
 
+def get_domain_cascade_stats():
+    """Report how many predictions each cascade stage handled."""
+    return dict(_domain_cascade_stats)
+
 # -----------------------------
 # Summarizer with error handling
 # -----------------------------
@@ -1,35 +1,73 @@
+import os
+import re
+import json
+import math
+import hashlib
+import threading
+from bisect import bisect_right
+from collections import Counter, OrderedDict
+
 import streamlit as st
 from transformers import AutoTokenizer, AutoModelForTokenClassification, pipeline
 import torch
 
 # Global cache for models
 _ner_models = {}
+_ner_models_lock = threading.Lock()
+
+# {model_name: error} of loads that failed
+_ner_model_errors = {}
+
+# Recently used entity indexes, keyed by (document hash, document type)
+_entity_indexes = OrderedDict()
+_entity_indexes_lock = threading.Lock()
+
+# Entity indexes kept in memory; older ones are reloaded from their sidecar
+MAX_CACHED_ENTITY_INDEXES = 16
+
+# Bump when the on-disk entity index layout changes
+ENTITY_INDEX_VERSION = 2
 
-def load_ner_model(model_name="dslim/bert-base-NER"):
-    """Load NER model with caching to avoid reloading."""
+# Model labels -> the entity groups used throughout the app
+ENTITY_GROUP_ALIASES = {
+    "PER": "PERSON",
+    "ORGANIZATION": "ORG",
+    "LOCATION": "LOC",
+}
+
+def load_ner_model(model_name="dslim/bert-base-NER", retry=False):
+    """Load NER model with caching to avoid reloading (see ``preload_models`` for ``retry``)."""
     if model_name in _ner_models:
         return _ner_models[model_name]
     
-    try:
-        with st.spinner(f"Loading NER model: {model_name}"):
-            tokenizer = AutoTokenizer.from_pretrained(model_name)
-            model = AutoModelForTokenClassification.from_pretrained(model_name)
-            
-            # Create pipeline
-            ner_pipeline = pipeline(
-                "ner", 
-                model=model, 
-                tokenizer=tokenizer, 
-                aggregation_strategy="simple",
-                device=0 if torch.cuda.is_available() else -1
-            )
-            
-            _ner_models[model_name] = ner_pipeline
-            return ner_pipeline
-            
-    except Exception as e:
-        st.error(f"Error loading NER model {model_name}: {e}")
-        return None
+    with _ner_models_lock:
+        if model_name in _ner_models:
+            return _ner_models[model_name]
+        if model_name in _ner_model_errors and not retry:
+            return None
+        
+        try:
+            with st.spinner(f"Loading NER model: {model_name}"):
+                tokenizer = AutoTokenizer.from_pretrained(model_name)
+                model = AutoModelForTokenClassification.from_pretrained(model_name)
+                
+                # Create pipeline
+                ner_pipeline = pipeline(
+                    "ner", 
+                    model=model, 
+                    tokenizer=tokenizer, 
+                    aggregation_strategy="simple",
+                    device=0 if torch.cuda.is_available() else -1
+                )
+                
+                _ner_models[model_name] = ner_pipeline
+                _ner_model_errors.pop(model_name, None)
+                return ner_pipeline
+                
+        except Exception as e:
+            _ner_model_errors[model_name] = e
+            st.error(f"Error loading NER model {model_name}: {e}")
+            return None
 
 def extract_entities(text, model_pipeline, max_length=512):
     """Extract named entities from text."""
@@ -48,7 +86,7 @@ def extract_entities(text, model_pipeline, max_length=512):
         st.error(f"Error extracting entities: {e}")
         return []
 
-def get_domain_specific_ner_model(document_type):
+def get_domain_specific_ner_model(document_type, retry=False):
     """Get appropriate NER model based on document type."""
     model_mapping = {
         "research": "allenai/scibert_scivocab_uncased",
@@ -58,7 +96,14 @@ def get_domain_specific_ner_model(document_type):
     }
     
     model_name = model_mapping.get(document_type.lower(), "dslim/bert-base-NER")
-    return load_ner_model(model_name)
+    return load_ner_model(model_name, retry=retry)
+
+def normalize_entity_group(label):
+    """One label per entity type, e.g. "PER", "B-PER" and "PERSON" all become "PERSON"."""
+    label = (label or "MISC").upper()
+    if label[:2] in ("B-", "I-"):
+        label = label[2:]
+    return ENTITY_GROUP_ALIASES.get(label, label)
 
 def categorize_entities(entities):
     """Categorize entities by type for better organization."""
@@ -72,7 +117,7 @@ def categorize_entities(entities):
     }
     
     for entity in entities:
-        entity_type = entity.get('entity_group', 'MISC')
+        entity_type = normalize_entity_group(entity.get('entity_group'))
         if entity_type in categories:
             categories[entity_type].append(entity)
         else:
@@ -80,28 +125,234 @@ def categorize_entities(entities):
     
     return categories
 
-def extract_key_entities(text, document_type="general", top_k=10):
-    """Extract and rank key entities from text."""
-    model = get_domain_specific_ner_model(document_type)
-    entities = extract_entities(text, model)
+def compute_document_hash(text):
+    """Stable content hash used to key per-document artifacts."""
+    return hashlib.sha256(text.encode("utf-8", errors="ignore")).hexdigest()
+
+def canonicalize_entity(word):
+    """Normalize an entity surface form so different mentions aggregate together."""
+    if not word:
+        return ""
     
-    if not entities:
+    # Undo WordPiece artifacts left by the aggregation strategy
+    word = word.replace(" ##", "").replace("##", "")
+    word = re.sub(r"\s+", " ", word)
+    word = word.strip(" .,;:!?\"'()[]{}")
+    
+    # Drop possessives so "Google's" and "Google" count as one entity
+    word = re.sub(r"['’]s$", "", word)
+    
+    return word.lower()
+
+def iter_text_windows(text, window_size=512, overlap=64):
+    """Yield (window_index, start_offset, window_text) covering the whole text."""
+    start = 0
+    window_index = 0
+    text_length = len(text)
+    
+    while start < text_length:
+        end = min(start + window_size, text_length)
+        
+        # Avoid cutting a word in half at the window edge
+        if end < text_length:
+            last_space = text.rfind(" ", start + overlap + 1, end)
+            if last_space > start:
+                end = last_space
+        
+        yield window_index, start, text[start:end]
+        
+        if end >= text_length:
+            break
+        start = max(end - overlap, start + 1)
+        window_index += 1
+
+def _page_for_offset(offset, page_offsets):
+    """Map a character offset to a 1-based page number using page start offsets."""
+    if not page_offsets:
+        return None
+    return max(1, bisect_right(page_offsets, offset))
+
+def build_entity_index(text, model_pipeline, page_offsets=None, window_size=512, batch_size=8):
+    """
+    Run NER over the whole document and aggregate every mention by canonical form.
+    
+    Args:
+        text (str): Document text
+        model_pipeline: Hugging Face NER pipeline (aggregation_strategy="simple")
+        page_offsets (list): Optional sorted start offsets of each page in ``text``
+        window_size (int): Characters per NER window
+        batch_size (int): Windows per pipeline batch
+    
+    Returns:
+        dict: Entity index with per-entity mentions and a frequency/confidence ranking
+    """
+    index = {
+        "version": ENTITY_INDEX_VERSION,
+        "document_hash": compute_document_hash(text) if text else "",
+        "num_windows": 0,
+        "entities": {},
+        "ranked": []
+    }
+    
+    if not text or not model_pipeline:
+        return index
+    
+    windows = list(iter_text_windows(text, window_size=window_size))
+    index["num_windows"] = len(windows)
+    
+    try:
+        window_results = model_pipeline([w[2] for w in windows], batch_size=batch_size)
+    except Exception as e:
+        st.error(f"Error extracting entities: {e}")
+        return index
+    
+    # Windows overlap, so the same mention can be reported twice
+    seen_spans = set()
+    entities = index["entities"]
+    
+    for (window_index, window_start, _), window_entities in zip(windows, window_results):
+        for entity in window_entities or []:
+            canonical = canonicalize_entity(entity.get("word", ""))
+            if not canonical:
+                continue
+            
+            start = window_start + int(entity.get("start", 0) or 0)
+            end = window_start + int(entity.get("end", 0) or 0)
+            if (start, end) in seen_spans:
+                continue
+            seen_spans.add((start, end))
+            
+            record = entities.setdefault(canonical, {
+                "canonical": canonical,
+                "surface_forms": {},
+                "entity_groups": {},
+                "mentions": []
+            })
+            
+            surface = text[start:end].strip() or entity.get("word", "")
+            entity_group = normalize_entity_group(entity.get("entity_group"))
+            record["surface_forms"][surface] = record["surface_forms"].get(surface, 0) + 1
+            record["entity_groups"][entity_group] = record["entity_groups"].get(entity_group, 0) + 1
+            record["mentions"].append({
+                "start": start,
+                "end": end,
+                "page": _page_for_offset(start, page_offsets),
+                "window": window_index,
+                "score": float(entity.get("score", 0))
+            })
+    
+    for record in entities.values():
+        scores = [m["score"] for m in record["mentions"]]
+        record["count"] = len(scores)
+        record["mean_score"] = sum(scores) / len(scores)
+        record["max_score"] = max(scores)
+        record["entity_group"] = Counter(record["entity_groups"]).most_common(1)[0][0]
+        record["word"] = Counter(record["surface_forms"]).most_common(1)[0][0]
+        # Frequency boosts confidence logarithmically so one noisy hit cannot dominate
+        record["rank_score"] = record["mean_score"] * (1 + math.log(record["count"]))
+    
+    index["ranked"] = sorted(entities, key=lambda c: entities[c]["rank_score"], reverse=True)
+    return index
+
+def _entity_index_path(artifact_path):
+    """Sidecar file storing the entity index next to a document artifact."""
+    return f"{artifact_path}.entities.json"
+
+def load_entity_index(artifact_path, document_hash=None, document_type=None):
+    """Load a stored entity index, ignoring it if it belongs to different content."""
+    path = _entity_index_path(artifact_path)
+    if not os.path.exists(path):
+        return None
+    
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return None
+    
+    if index.get("version") != ENTITY_INDEX_VERSION:
+        return None
+    if document_hash and index.get("document_hash") != document_hash:
+        return None
+    if document_type and index.get("document_type") != document_type:
+        return None
+    return index
+
+def save_entity_index(index, artifact_path):
+    """Persist an entity index alongside its document artifact."""
+    try:
+        with open(_entity_index_path(artifact_path), "w", encoding="utf-8") as f:
+            json.dump(index, f)
+    except OSError as e:
+        st.warning(f"Could not save entity index: {e}")
+
+def get_entity_index(text, document_type="general", artifact_path=None, page_offsets=None):
+    """
+    Return the entity index for a document, running NER only on the first request.
+    
+    Lookups go memory cache -> sidecar next to ``artifact_path`` -> fresh NER run.
+    ``artifact_path`` is the stored upload (``upload_store.blob_path``).
+    """
+    document_hash = compute_document_hash(text or "")
+    cache_key = (document_hash, document_type.lower())
+    
+    with _entity_indexes_lock:
+        if cache_key in _entity_indexes:
+            _entity_indexes.move_to_end(cache_key)
+            return _entity_indexes[cache_key]
+    
+    index = None
+    if artifact_path:
+        index = load_entity_index(artifact_path, document_hash, document_type.lower())
+    
+    if index is None:
+        model = get_domain_specific_ner_model(document_type)
+        index = build_entity_index(text, model, page_offsets=page_offsets)
+        index["document_type"] = document_type.lower()
+        if artifact_path and index["entities"]:
+            save_entity_index(index, artifact_path)
+    
+    with _entity_indexes_lock:
+        _entity_indexes[cache_key] = index
+        _entity_indexes.move_to_end(cache_key)
+        while len(_entity_indexes) > MAX_CACHED_ENTITY_INDEXES:
+            _entity_indexes.popitem(last=False)
+    return index
+
+def ranked_entities(entity_index, top_k=None, entity_group=None):
+    """Return ranked entities from an index in the pipeline's entity dict shape."""
+    if not entity_index:
         return []
     
-    # Sort by confidence score
-    entities.sort(key=lambda x: x.get('score', 0), reverse=True)
+    results = []
+    entities = entity_index.get("entities", {})
     
-    # Remove duplicates (keep highest confidence)
-    seen = set()
-    unique_entities = []
+    for canonical in entity_index.get("ranked", []):
+        record = entities[canonical]
+        if entity_group and record["entity_group"] != normalize_entity_group(entity_group):
+            continue
+        
+        results.append({
+            "word": record["word"],
+            "entity_group": record["entity_group"],
+            "score": record["max_score"],
+            "mean_score": record["mean_score"],
+            "count": record["count"],
+            "rank_score": record["rank_score"],
+            "pages": sorted({m["page"] for m in record["mentions"] if m["page"]})
+        })
+        
+        if top_k and len(results) >= top_k:
+            break
     
-    for entity in entities:
-        entity_text = entity.get('word', '').lower()
-        if entity_text not in seen:
-            seen.add(entity_text)
-            unique_entities.append(entity)
+    return results
+
+def extract_key_entities(text, document_type="general", top_k=10, artifact_path=None, entity_index=None):
+    """Extract and rank key entities by frequency and confidence across the document."""
+    if entity_index is None:
+        entity_index = get_entity_index(text, document_type, artifact_path=artifact_path)
     
-    return unique_entities[:top_k]
+    return ranked_entities(entity_index, top_k=top_k)
 
 def format_entities_for_display(entities):
     """Format entities for nice display in Streamlit."""
@@ -113,7 +364,11 @@ def format_entities_for_display(entities):
         word = entity.get('word', '')
         entity_type = entity.get('entity_group', 'MISC')
         confidence = entity.get('score', 0)
+        count = entity.get('count')
         
-        formatted.append(f"**{word}** ({entity_type}) - {confidence:.2f}")
+        if count:
+            formatted.append(f"**{word}** ({entity_type}) - {confidence:.2f}, {count} mention(s)")
+        else:
+            formatted.append(f"**{word}** ({entity_type}) - {confidence:.2f}")
     
     return "\n".join(formatted)
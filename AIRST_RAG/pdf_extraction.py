@@ -0,0 +1,322 @@
+"""
+Page-parallel PDF text extraction.
+
+The page range is split into small blocks that worker processes extract
+independently (each opens the file itself), and pages are yielded back in
+order. Text comes from PyMuPDF; the slow pdfplumber table extractor only runs
+on pages whose ruling lines or aligned columns suggest a table. This module
+only imports PyMuPDF / pdfplumber so that spawned workers start quickly
+without loading Streamlit or any models.
+"""
+
+import os
+import time
+import threading
+import multiprocessing
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# Worker processes for page extraction (1 disables the pool)
+PDF_WORKERS = int(os.getenv("AIRST_PDF_WORKERS", os.cpu_count() or 1))
+
+# Pages handed to a worker per task
+PAGES_PER_TASK = 8
+
+# Documents shorter than this are extracted in-process
+PARALLEL_MIN_PAGES = 16
+
+# How tables are extracted (see extract_page_range)
+TABLE_MODES = ("selective", "all", "none")
+
+# Table-likelihood thresholds: pages need horizontal and vertical ruling
+# lines, or enough text rows sharing a column layout, to reach pdfplumber
+MIN_RULING_LINES = 2
+MIN_ALIGNED_ROWS = 4
+COLUMN_GAP = 12  # points between words that start a new column
+
+# Borderless tables are recovered from word positions instead of ruling lines
+TEXT_TABLE_SETTINGS = {"vertical_strategy": "text", "horizontal_strategy": "text"}
+
+# Longest line reported as a possible heading by page_font_cues
+MAX_HEADING_CHARS = 80
+
+_pool = None
+_pool_workers = None
+_pool_lock = threading.Lock()
+
+def has_pdfplumber():
+    try:
+        import pdfplumber  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def _get_pool(max_workers):
+    """Shared process pool; workers are spawned so they never inherit Streamlit threads."""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != max_workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            _pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+            _pool_workers = max_workers
+        return _pool
+
+def _reset_pool():
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+        _pool_workers = None
+
+def page_count(file_path):
+    import fitz
+    with fitz.open(file_path) as doc:
+        return doc.page_count
+
+def table_signals(page):
+    """
+    Cheap table evidence for a PyMuPDF page.
+
+    Returns:
+        dict: ``horizontal_rules`` / ``vertical_rules`` (ruling line segments,
+        boxed cells count for both) and ``aligned_rows`` (the largest number of
+        text rows sharing one layout of three or more columns)
+    """
+    horizontal = vertical = 0
+    half_page = page.rect.width * page.rect.height / 2
+
+    # get_cdrawings skips building Point/Rect objects; both unpack the same way
+    drawings = page.get_cdrawings() if hasattr(page, "get_cdrawings") else page.get_drawings()
+    for drawing in drawings:
+        for item in drawing["items"]:
+            if item[0] == "l":
+                (x0, y0), (x1, y1) = item[1], item[2]
+                dx, dy = abs(x1 - x0), abs(y1 - y0)
+            elif item[0] == "re":
+                x0, y0, x1, y1 = item[1]
+                dx, dy = abs(x1 - x0), abs(y1 - y0)
+                if dx > 2 and dy > 2:
+                    # A boxed cell, unless it is a page background or frame
+                    if dx * dy < half_page:
+                        horizontal += 2
+                        vertical += 2
+                    continue
+            else:
+                continue
+            if dy < 2 and dx > 20:
+                horizontal += 1
+            elif dx < 2 and dy > 10:
+                vertical += 1
+
+    # Table cells are separate blocks in PyMuPDF, so group words by baseline
+    rows = {}
+    for x0, _, x1, y1, *_ in page.get_text("words"):
+        rows.setdefault(round(y1 / 3), []).append((x0, x1))
+    layouts = Counter()
+    for words in rows.values():
+        words.sort()
+        columns = [words[0][0]] + [
+            x0 for (_, previous_end), (x0, _) in zip(words, words[1:]) if x0 - previous_end > COLUMN_GAP
+        ]
+        if len(columns) >= 3:
+            layouts[tuple(round(column / 10) for column in columns)] += 1
+
+    return {
+        "horizontal_rules": horizontal,
+        "vertical_rules": vertical,
+        "aligned_rows": max(layouts.values(), default=0)
+    }
+
+def table_settings_for(signals):
+    """pdfplumber table settings for a likely table page, or None to skip it."""
+    if signals["horizontal_rules"] >= MIN_RULING_LINES and signals["vertical_rules"] >= MIN_RULING_LINES:
+        return {}
+    if signals["aligned_rows"] >= MIN_ALIGNED_ROWS:
+        return TEXT_TABLE_SETTINGS
+    return None
+
+def page_font_cues(page, max_chars=MAX_HEADING_CHARS):
+    """
+    Font evidence for headings on a PyMuPDF page.
+
+    Returns:
+        dict: ``sizes`` ({font size: characters set in it}, to find the body
+        size) and ``lines`` ([text, size, bold] for every short line without
+        a closing full stop, the only ones that can be headings)
+    """
+    sizes = Counter()
+    lines = []
+    for block in page.get_text("dict").get("blocks", []):
+        for line in block.get("lines", []):
+            spans = [s for s in line.get("spans", []) if s.get("text", "").strip()]
+            if not spans:
+                continue
+            line_text = "".join(s["text"] for s in spans).strip()
+            size = max(s.get("size", 0) for s in spans)
+            # Weight font sizes by characters to find the body size
+            sizes[round(size, 1)] += len(line_text)
+            if len(line_text) <= max_chars and not line_text.endswith(".") and any(ch.isalpha() for ch in line_text):
+                lines.append([line_text, size, all(s.get("flags", 0) & 16 for s in spans)])
+    return {"sizes": dict(sizes), "lines": lines}
+
+def _table_text(tables):
+    """Tables as tab-separated rows, the way they are appended to page text."""
+    table_text = ""
+    for table in tables:
+        for row in table:
+            table_text += "\t".join([str(cell) for cell in row if cell]) + "\n"
+    return table_text
+
+def _page_record(index, text, seconds, engine, tables=None, error=None):
+    return {
+        "page": index + 1,
+        "text": text,
+        "tables": tables or [],
+        "seconds": seconds,
+        "engine": engine,
+        "error": error,
+        "fonts": None
+    }
+
+def extract_page_range(file_path, start, stop, tables="selective", fonts=False):
+    """
+    Extract pages ``start``..``stop - 1`` (0-based) of one PDF.
+
+    ``tables`` is one of ``TABLE_MODES``:
+        "selective": PyMuPDF text for every page; pdfplumber tables only on
+                     pages whose ruling lines or aligned columns suggest a table
+        "all":       pdfplumber text and tables on every page (slow)
+        "none":      PyMuPDF text only
+
+    With ``fonts`` each page also gets its ``page_font_cues``, so headings
+    are found in the workers rather than in a second pass over the file.
+
+    Returns:
+        list: {"page" (1-based), "text", "tables" (list of row lists),
+        "seconds", "engine", "error", "fonts"} per page. Table text is
+        appended to the page text. If pdfplumber fails, PyMuPDF text is kept.
+    """
+    results = []
+    error = None
+
+    if tables == "all":
+        try:
+            import pdfplumber
+            with pdfplumber.open(file_path) as pdf:
+                for index in range(start, stop):
+                    page_start = time.perf_counter()
+                    page = pdf.pages[index]
+                    page_tables = page.extract_tables() or []
+                    text = (page.extract_text() or "") + "\n" + _table_text(page_tables)
+                    results.append(_page_record(index, text, time.perf_counter() - page_start, "pdfplumber", page_tables))
+        except Exception as e:
+            error = str(e)
+
+    candidates = []
+    if start + len(results) < stop or fonts:
+        import fitz
+        with fitz.open(file_path) as doc:
+            if fonts:
+                for record in results:
+                    record["fonts"] = page_font_cues(doc[record["page"] - 1])
+            for index in range(start + len(results), stop):
+                page_start = time.perf_counter()
+                page = doc[index]
+                record = _page_record(index, page.get_text("text"), 0.0, "pymupdf", error=error)
+                if fonts:
+                    record["fonts"] = page_font_cues(page)
+                if tables == "selective":
+                    settings = table_settings_for(table_signals(page))
+                    if settings is not None:
+                        candidates.append((record, settings))
+                record["seconds"] = time.perf_counter() - page_start
+                results.append(record)
+
+    if candidates:
+        try:
+            import pdfplumber
+            with pdfplumber.open(file_path) as pdf:
+                for record, settings in candidates:
+                    page_start = time.perf_counter()
+                    page_tables = [t for t in pdf.pages[record["page"] - 1].extract_tables(settings) or [] if t]
+                    record["seconds"] += time.perf_counter() - page_start
+                    record["engine"] = "pymupdf+pdfplumber"
+                    if page_tables:
+                        record["tables"] = page_tables
+                        record["text"] += "\n" + _table_text(page_tables)
+        except Exception as e:
+            for record, _ in candidates:
+                record["error"] = record["error"] or str(e)
+
+    return results
+
+def iter_pages(file_path, tables=None, max_workers=None, pages_per_task=PAGES_PER_TASK, fonts=False):
+    """
+    Yield extracted pages of a PDF in order, extracting blocks in parallel.
+
+    At most two tasks per worker are in flight, so memory stays bounded for
+    very long documents while the consumer processes earlier pages.
+    ``fonts`` adds each page's font cues (see ``extract_page_range``).
+    """
+    if tables is None:
+        tables = "selective" if has_pdfplumber() else "none"
+    if tables not in TABLE_MODES:
+        raise ValueError(f"Unknown table mode {tables!r}; expected one of {TABLE_MODES}")
+    max_workers = max_workers or PDF_WORKERS
+    total = page_count(file_path)
+
+    if max_workers <= 1 or total < PARALLEL_MIN_PAGES:
+        for start in range(0, total, pages_per_task):
+            yield from extract_page_range(file_path, start, min(start + pages_per_task, total), tables, fonts)
+        return
+
+    pool = _get_pool(max_workers)
+    ranges = iter([(start, min(start + pages_per_task, total)) for start in range(0, total, pages_per_task)])
+    pending = []
+    next_page = 0
+
+    for start, stop in ranges:
+        pending.append(pool.submit(extract_page_range, file_path, start, stop, tables, fonts))
+        if len(pending) >= max_workers * 2:
+            break
+
+    try:
+        while pending:
+            pages = pending.pop(0).result()
+            next_range = next(ranges, None)
+            if next_range is not None:
+                pending.append(pool.submit(extract_page_range, file_path, *next_range, tables, fonts))
+            next_page += len(pages)
+            yield from pages
+    except BrokenProcessPool:
+        # A worker died; drop the pool and finish in-process
+        _reset_pool()
+        for start in range(next_page, total, pages_per_task):
+            yield from extract_page_range(file_path, start, min(start + pages_per_task, total), tables, fonts)
+    finally:
+        for future in pending:
+            future.cancel()
+
+def extract_pages(file_path, tables=None, max_workers=None):
+    """All pages of a PDF as a list of page dicts (see ``extract_page_range``)."""
+    return list(iter_pages(file_path, tables, max_workers))
+
+def summarize_timings(pages):
+    """Total, slowest page and per-engine page counts for a list of page dicts."""
+    if not pages:
+        return {"pages": 0, "total_seconds": 0.0, "slowest_page": None, "engines": {}}
+
+    slowest = max(pages, key=lambda p: p["seconds"])
+    engines = {}
+    for page in pages:
+        engines[page["engine"]] = engines.get(page["engine"], 0) + 1
+
+    return {
+        "pages": len(pages),
+        "total_seconds": sum(p["seconds"] for p in pages),
+        "slowest_page": (slowest["page"], slowest["seconds"]),
+        "engines": engines
+    }
@@ -0,0 +1,220 @@
+"""
+Dependency-aware stage scheduler for the document analysis pipeline.
+
+A stage is a dict with a ``name``, a ``func``, the names of the values it
+reads (``inputs``) and the names of the values it produces (``outputs``).
+A stage with one output returns the value itself; otherwise a dict keyed by
+output name.
+
+Independent stages run in parallel; outputs are memoized per cache key
+(normally the document hash) so repeat runs only compute what is missing.
+"""
+
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# Memoized stage outputs: {cache_key: {stage_name: {output_name: value}}}
+_stage_memo = OrderedDict()
+_stage_memo_lock = threading.Lock()
+
+# Number of documents whose stage outputs are kept in memory
+MAX_MEMOIZED_DOCUMENTS = 16
+
+def make_stage(name, func, inputs=(), outputs=None):
+    """Describe a pipeline stage; ``func`` receives its inputs as keyword arguments."""
+    return {
+        "name": name,
+        "func": func,
+        "inputs": tuple(inputs),
+        "outputs": tuple(outputs or (name,))
+    }
+
+def run_in_script_context(func):
+    """Wrap func so Streamlit calls made from a worker thread reach the current session."""
+    try:
+        from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+        ctx = get_script_run_ctx()
+    except ImportError:
+        ctx = None
+
+    def run(*args, **kwargs):
+        if ctx is not None:
+            add_script_run_ctx(threading.current_thread(), ctx)
+        return func(*args, **kwargs)
+
+    return run
+
+def validate_stages(stages):
+    """Check stage names are unique and every output has a single producer."""
+    names = set()
+    producers = {}
+
+    for stage in stages:
+        if stage["name"] in names:
+            raise ValueError(f"Duplicate stage name: {stage['name']}")
+        names.add(stage["name"])
+
+        for output in stage["outputs"]:
+            if output in producers:
+                raise ValueError(f"Output '{output}' produced by both {producers[output]} and {stage['name']}")
+            producers[output] = stage["name"]
+
+    return producers
+
+def required_stages(stages, targets, available=()):
+    """
+    Return the names of the stages needed to produce ``targets``.
+
+    Targets may be stage names or output names. Values already in
+    ``available`` stop the backwards walk.
+    """
+    producers = validate_stages(stages)
+    by_name = {stage["name"]: stage for stage in stages}
+    available = set(available)
+    needed = set()
+    pending = list(targets)
+
+    while pending:
+        target = pending.pop()
+        stage_name = target if target in by_name else producers.get(target)
+        if stage_name is None:
+            if target in available:
+                continue
+            raise ValueError(f"Nothing produces '{target}'")
+        if stage_name in needed:
+            continue
+
+        needed.add(stage_name)
+        for value in by_name[stage_name]["inputs"]:
+            if value not in available:
+                pending.append(value)
+
+    return needed
+
+def _get_memo(cache_key):
+    """Return (and mark as recently used) the memo entry for a document."""
+    with _stage_memo_lock:
+        memo = _stage_memo.setdefault(cache_key, {})
+        _stage_memo.move_to_end(cache_key)
+        while len(_stage_memo) > MAX_MEMOIZED_DOCUMENTS:
+            _stage_memo.popitem(last=False)
+        return memo
+
+def clear_stage_memo(cache_key=None):
+    """Drop memoized outputs for one document, or for all documents."""
+    with _stage_memo_lock:
+        if cache_key is None:
+            _stage_memo.clear()
+        else:
+            _stage_memo.pop(cache_key, None)
+
+def run_stages(stages, initial_values, targets=None, cache_key=None, max_workers=4, on_progress=None):
+    """
+    Execute the stages needed for ``targets`` in dependency order.
+
+    Args:
+        stages (list): Stage dicts from ``make_stage``
+        initial_values (dict): Values available before any stage runs
+        targets (list): Stage or output names to produce (all stages by default)
+        cache_key (str): Memoization key, e.g. the document hash
+        max_workers (int): Maximum number of stages running at once
+        on_progress (callable): Called on the calling thread with a status event
+            dict (``stage``, ``status``, ``seconds``, ``completed``, ``total``)
+
+    Returns:
+        tuple: (values dict, report dict of {stage_name: {"status", "seconds"}})
+    """
+    values = dict(initial_values)
+    by_name = {stage["name"]: stage for stage in stages}
+    targets = list(targets) if targets else list(by_name)
+    needed = required_stages(stages, targets, available=values)
+    memo = _get_memo(cache_key) if cache_key is not None else {}
+
+    report = {}
+    completed = 0
+
+    def notify(name, status, seconds=0.0):
+        report[name] = {"status": status, "seconds": round(seconds, 3)}
+        if on_progress:
+            on_progress({
+                "stage": name,
+                "status": status,
+                "seconds": seconds,
+                "completed": completed,
+                "total": len(needed)
+            })
+
+    # Memoized stages finish immediately
+    remaining = set()
+    for name in needed:
+        if name in memo:
+            values.update(memo[name])
+            completed += 1
+            notify(name, "cached")
+        else:
+            remaining.add(name)
+
+    def timed_call(stage, kwargs):
+        start = time.perf_counter()
+        result = stage["func"](**kwargs)
+        return result, time.perf_counter() - start
+
+    running = {}
+    failed = set()
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pipeline") as executor:
+        while remaining or running:
+            # Skip stages whose inputs can never arrive
+            for name in sorted(remaining):
+                stage = by_name[name]
+                if any(dep in failed for dep in _input_producers(stage, by_name)):
+                    remaining.discard(name)
+                    failed.add(name)
+                    completed += 1
+                    notify(name, "skipped")
+
+            for name in sorted(remaining):
+                stage = by_name[name]
+                if all(value in values for value in stage["inputs"]):
+                    kwargs = {value: values[value] for value in stage["inputs"]}
+                    future = executor.submit(run_in_script_context(timed_call), stage, kwargs)
+                    running[future] = name
+                    remaining.discard(name)
+                    notify(name, "running")
+
+            if not running:
+                if remaining:
+                    raise ValueError(f"Stages have unsatisfiable inputs: {sorted(remaining)}")
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                stage = by_name[name]
+                completed += 1
+                try:
+                    result, seconds = future.result()
+                except Exception as e:
+                    failed.add(name)
+                    notify(name, f"failed: {e}")
+                    continue
+
+                # Single-output stages return the value itself, others a dict
+                if len(stage["outputs"]) == 1:
+                    result = {stage["outputs"][0]: result}
+                outputs = {output: result[output] for output in stage["outputs"]}
+                values.update(outputs)
+                memo[name] = outputs
+                notify(name, "done", seconds)
+
+    return values, report
+
+def _input_producers(stage, by_name):
+    """Names of the stages that produce this stage's inputs."""
+    producers = []
+    for other in by_name.values():
+        if any(output in stage["inputs"] for output in other["outputs"]):
+            producers.append(other["name"])
+    return producers
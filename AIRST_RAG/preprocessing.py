@@ -1,115 +1,322 @@
-import re
-import nltk
-import streamlit as st
+import os
+import threading
 
-# Download NLTK data (only once)
-try:
-    nltk.data.find('tokenizers/punkt')
-except LookupError:
-    nltk.download("punkt", quiet=True)
+from text_cleaning import apply_rules, clean_with_offsets, map_to_clean
+from sentence_segmenter import sentence_spans, split_sentences
+from section_parser import parse_sections
 
-from nltk.tokenize import sent_tokenize
+# Sentence segmentation backend: "fast" (rule-based) or "punkt" (NLTK)
+SENTENCE_SEGMENTER = os.getenv("AIRST_SENTENCE_SEGMENTER", "fast")
 
-def clean_text(text):
-    """Remove headers, footers, extra spaces, and noise."""
-    if not text:
-        return ""
+# Bundled NLTK data, searched before NLTK's default locations. Nothing is
+# downloaded unless AIRST_NLTK_DOWNLOAD=1 (air-gapped deployments leave it unset).
+NLTK_DATA_DIR = os.getenv("AIRST_NLTK_DATA", os.path.join(os.path.dirname(os.path.abspath(__file__)), "nltk_data"))
+NLTK_ALLOW_DOWNLOAD = os.getenv("AIRST_NLTK_DOWNLOAD", "0") == "1"
+
+# Punkt tokenizer, loaded once per process on first use
+_punkt_tokenizer = None
+_punkt_error = None
+_punkt_lock = threading.Lock()
+
+def _load_punkt():
+    """Load the English punkt tokenizer from local NLTK data only."""
+    import nltk
     
-    # Remove page numbers
-    text = re.sub(r"Page \d+", "", text)
-    text = re.sub(r"\b\d+\s*of\s*\d+\b", "", text)
+    if NLTK_DATA_DIR not in nltk.data.path:
+        nltk.data.path.insert(0, NLTK_DATA_DIR)
+    
+    for attempt in range(2):
+        try:
+            try:
+                # NLTK >= 3.8.2 ships punkt as "punkt_tab"
+                from nltk.tokenize.punkt import PunktTokenizer
+                return PunktTokenizer("english")
+            except ImportError:
+                return nltk.data.load("tokenizers/punkt/english.pickle")
+        except LookupError:
+            if attempt or not NLTK_ALLOW_DOWNLOAD:
+                raise
+            os.makedirs(NLTK_DATA_DIR, exist_ok=True)
+            for resource in ("punkt_tab", "punkt"):
+                nltk.download(resource, download_dir=NLTK_DATA_DIR, quiet=True)
+
+def _warn(message):
+    """Show a warning in the Streamlit app, or print it outside Streamlit."""
+    try:
+        import streamlit as st
+    except ImportError:
+        print(f"⚠️ {message}")
+        return
+    st.warning(message)
+
+def get_punkt_tokenizer():
+    """
+    Return the cached punkt tokenizer, or None when NLTK or its data is missing.
     
-    # Remove excessive newlines and spaces
-    text = re.sub(r"\n+", " ", text)
-    text = re.sub(r"\s+", " ", text)
+    The lookup happens at most once per process; callers fall back to the
+    rule-based segmenter when this returns None.
+    """
+    global _punkt_tokenizer, _punkt_error
     
-    # Remove common PDF artifacts
-    text = re.sub(r"©\s*\d{4}", "", text)
-    text = re.sub(r"All rights reserved", "", text)
+    if _punkt_tokenizer is None and _punkt_error is None:
+        with _punkt_lock:
+            if _punkt_tokenizer is None and _punkt_error is None:
+                try:
+                    _punkt_tokenizer = _load_punkt()
+                except (ImportError, LookupError, OSError) as e:
+                    _punkt_error = e
+                    _warn(f"NLTK punkt unavailable ({e}); using the built-in sentence segmenter.")
     
-    # Remove email addresses
-    text = re.sub(r'\S+@\S+', '', text)
+    return _punkt_tokenizer
+
+def clean_text(text, return_offsets=False):
+    """Remove headers, footers, extra spaces, and noise.
     
-    # Remove URLs
-    text = re.sub(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+', '', text)
+    With ``return_offsets=True`` returns (cleaned_text, offset_map); use
+    ``text_cleaning.map_to_original`` to translate cleaned offsets back.
+    """
+    if return_offsets:
+        return clean_with_offsets(text or "", "document")
+    if not text:
+        return ""
     
-    return text.strip()
+    return apply_rules(text, "document")
 
-def segment_text(text):
-    """Split text into sentences for easier handling."""
+def segment_text(text, method=None):
+    """Split text into sentences for easier handling.
+    
+    ``method`` is "fast" (default, rule-based, script aware) or "punkt" (NLTK,
+    falling back to "fast" when its data is not installed).
+    """
     if not text:
         return []
     
-    try:
-        sentences = sent_tokenize(text)
-        return [s.strip() for s in sentences if s.strip()]
-    except Exception as e:
-        st.warning(f"Error in sentence tokenization: {e}")
-        # Fallback: split by periods
-        return [s.strip() for s in text.split('.') if s.strip()]
-
-def chunk_text_for_models(text, max_length=512):
-    """Split text into chunks suitable for transformer models."""
-    sentences = segment_text(text)
+    if (method or SENTENCE_SEGMENTER) == "punkt":
+        return [text[start:end] for start, end in _punkt_spans(text)]
+    
+    return split_sentences(text)
+
+def _punkt_spans(text):
+    """Sentence spans from punkt, or from the fast segmenter if punkt is unavailable."""
+    tokenizer = get_punkt_tokenizer()
+    if tokenizer is None:
+        return sentence_spans(text)
+    return [(start, end) for start, end in tokenizer.span_tokenize(text) if text[start:end].strip()]
+
+def segment_spans(text):
+    """Split text into sentences, returned as (start, end) offsets into ``text``."""
+    if not text:
+        return []
+    
+    if SENTENCE_SEGMENTER == "punkt":
+        return _punkt_spans(text)
+    
+    return sentence_spans(text)
+
+def chunk_sentence_spans(sentence_spans, max_length=512):
+    """Group consecutive sentence spans into chunk spans of at most ~max_length characters."""
     chunks = []
-    current_chunk = ""
+    chunk_start = None
+    chunk_end = None
+    current_length = 0
     
-    for sentence in sentences:
-        if len(current_chunk) + len(sentence) < max_length:
-            current_chunk += sentence + " "
+    for start, end in sentence_spans:
+        sentence_length = end - start
+        if chunk_start is not None and current_length + sentence_length < max_length:
+            chunk_end = end
+            current_length += sentence_length + 1
         else:
-            if current_chunk.strip():
-                chunks.append(current_chunk.strip())
-            current_chunk = sentence + " "
+            if chunk_start is not None:
+                chunks.append((chunk_start, chunk_end))
+            chunk_start, chunk_end = start, end
+            current_length = sentence_length + 1
     
-    if current_chunk.strip():
-        chunks.append(current_chunk.strip())
+    if chunk_start is not None:
+        chunks.append((chunk_start, chunk_end))
     
     return chunks
 
-def extract_key_sections(text):
+def chunk_text_for_models(text, max_length=512, doc_ir=None):
+    """Split text into chunks suitable for transformer models."""
+    if doc_ir is not None:
+        return doc_ir.chunks(max_length)
+    
+    spans = chunk_sentence_spans(segment_spans(text), max_length)
+    return [text[start:end] for start, end in spans]
+
+# Sections surfaced by extract_key_sections, in canonical section_parser names
+KEY_SECTIONS = ('abstract', 'introduction', 'conclusion', 'methodology', 'results', 'discussion')
+
+def find_section_spans(text, font_headings=None):
+    """
+    Locate key sections by their header lines.
+    
+    Args:
+        text (str): Raw text with line breaks
+        font_headings (iterable): Optional heading lines from PDF font cues
+    
+    Returns:
+        list: (section_name, content_start, content_end) offsets into ``text``
+    """
+    return [
+        (section['name'], section['content_start'], section['end'])
+        for section in parse_sections(text, font_headings)
+        if section['name'] in KEY_SECTIONS
+    ]
+
+def extract_key_sections(text, doc_ir=None):
     """Extract key sections like abstract, introduction, conclusion."""
+    if doc_ir is not None:
+        return doc_ir.sections
+    
     sections = {}
+    for section_name, start, end in find_section_spans(text):
+        content = ' '.join(line.strip() for line in text[start:end].split('\n') if line.strip())
+        if content:
+            sections[section_name] = content
+    
+    return sections
+
+# ---------- Streaming (page-wise) preprocessing ----------
+
+# A sentence fragment carried across pages never grows beyond this
+MAX_CARRY_CHARS = 20000
+
+def iter_clean_pages(pages, headings=None):
+    """
+    Clean pages one at a time.
     
-    # Common section headers
-    section_patterns = {
-        'abstract': r'(?i)(abstract|summary|executive\s+summary)',
-        'introduction': r'(?i)(introduction|intro)',
-        'conclusion': r'(?i)(conclusion|conclusions|summary)',
-        'methodology': r'(?i)(methodology|methods|method)',
-        'results': r'(?i)(results|findings)',
-        'discussion': r'(?i)(discussion|discuss)'
-    }
-    
-    lines = text.split('\n')
-    current_section = None
-    current_content = []
-    
-    for line in lines:
-        line = line.strip()
-        if not line:
+    Args:
+        pages (iterable): Raw page texts
+        headings: Optional heading lines (or {line: level}) for ``parse_sections``
+    
+    Yields:
+        tuple: (page_number, cleaned_text, headers) where ``headers`` lists
+        (cleaned_offset, section_name) for the top-level headings on the page
+    """
+    for page_number, raw_page in enumerate(pages, start=1):
+        raw_page = raw_page or ""
+        sections = [
+            section for section in parse_sections(raw_page, headings)
+            if section['level'] == 1
+        ]
+        if not sections:
+            # Offsets are only needed to place headings
+            yield page_number, apply_rules(raw_page, "document"), []
+            continue
+
+        cleaned, offset_map = clean_with_offsets(raw_page, "document")
+        headers = [
+            (map_to_clean(offset_map, section['start']), section['name'])
+            for section in sections
+        ]
+        yield page_number, cleaned, headers
+
+def _tag_sections(spans, headers, section):
+    """Pair each sentence span with the section active at its end."""
+    tagged = []
+    header_index = 0
+    for start, end in spans:
+        while header_index < len(headers) and headers[header_index][0] < end:
+            section = headers[header_index][1]
+            header_index += 1
+        tagged.append((start, end, section))
+    return tagged, section
+
+def iter_page_sentences(pages, max_carry_chars=MAX_CARRY_CHARS, headings=None):
+    """
+    Clean and segment an iterable of page texts incrementally.
+    
+    Only the current page and the unfinished last sentence of the previous
+    page are held in memory, so peak memory does not depend on the number of
+    pages. The active section carries over page boundaries. ``headings`` are
+    extra heading lines for the section parser (see ``iter_clean_pages``).
+    
+    Yields:
+        dict: {"text", "page", "section"} for every sentence
+    """
+    carry = ""
+    carry_page = None
+    carry_headers = []
+    section = None
+    
+    for page_number, cleaned, headers in iter_clean_pages(pages, headings):
+        if not cleaned:
             continue
-            
-        # Check if this line is a section header
-        found_section = None
-        for section_name, pattern in section_patterns.items():
-            if re.search(pattern, line):
-                found_section = section_name
-                break
         
-        if found_section:
-            # Save previous section
-            if current_section and current_content:
-                sections[current_section] = ' '.join(current_content)
-            
-            # Start new section
-            current_section = found_section
-            current_content = []
-        elif current_section:
-            current_content.append(line)
+        shift = len(carry) + 1 if carry else 0
+        text = f"{carry} {cleaned}" if carry else cleaned
+        headers = carry_headers + [(offset + shift, name) for offset, name in headers]
+        spans = segment_spans(text)
+        
+        # The last sentence may continue on the next page
+        tail_start = spans[-1][0] if spans else len(text)
+        if len(text) - tail_start > max_carry_chars:
+            tail_start = len(text)
+        complete = [span for span in spans if span[0] < tail_start]
+        
+        tagged, section = _tag_sections(complete, [h for h in headers if h[0] < tail_start], section)
+        for start, end, sentence_section in tagged:
+            page = carry_page if carry and start < shift else page_number
+            yield {"text": text[start:end], "page": page, "section": sentence_section}
+        
+        carry_page = (carry_page if carry and tail_start < shift else page_number)
+        carry = text[tail_start:].strip()
+        carry_headers = [(offset - tail_start, name) for offset, name in headers if offset >= tail_start]
     
-    # Save last section
-    if current_section and current_content:
-        sections[current_section] = ' '.join(current_content)
+    if carry:
+        tagged, section = _tag_sections(segment_spans(carry), carry_headers, section)
+        for start, end, sentence_section in tagged:
+            yield {"text": carry[start:end], "page": carry_page, "section": sentence_section}
+
+def iter_page_chunks(pages, max_length=512, overlap=0, page_aligned=False, headings=None):
+    """
+    Stream model-sized chunks from an iterable of page texts.
     
-    return sections
+    Chunks never span two sections. With ``overlap`` > 0, trailing sentences
+    of up to that many characters are repeated at the start of the next chunk
+    of the same section. With ``page_aligned=True`` a chunk also ends where a
+    new page starts, so editing one page leaves other pages' chunks unchanged.
+    ``headings`` (e.g. DOCX heading styles) also start new sections.
+    
+    Yields:
+        dict: {"index", "text", "page", "section"} where ``page`` is the page
+        the chunk starts on
+    """
+    chunk = []
+    length = 0
+    index = 0
+    
+    for sentence in iter_page_sentences(pages, headings=headings):
+        sentence_length = len(sentence["text"])
+        new_section = chunk and sentence["section"] != chunk[-1]["section"]
+        new_page = page_aligned and chunk and sentence["page"] != chunk[-1]["page"]
+        if chunk and (new_section or new_page or length + sentence_length >= max_length):
+            yield {
+                "index": index,
+                "text": " ".join(s["text"] for s in chunk),
+                "page": chunk[0]["page"],
+                "section": chunk[0]["section"]
+            }
+            index += 1
+            
+            kept = []
+            kept_length = 0
+            if overlap and not new_section and not new_page:
+                for previous in reversed(chunk[1:]):
+                    if kept_length + len(previous["text"]) > overlap:
+                        break
+                    kept.insert(0, previous)
+                    kept_length += len(previous["text"]) + 1
+            chunk, length = kept, kept_length
+        
+        chunk.append(sentence)
+        length += sentence_length + 1
+    
+    if chunk:
+        yield {
+            "index": index,
+            "text": " ".join(s["text"] for s in chunk),
+            "page": chunk[0]["page"],
+            "section": chunk[0]["section"]
+        }
@@ -1,8 +1,9 @@
+import io
 import os
-import uuid
 import json
 import requests
 import re
+import time
 from datetime import datetime
 from reportlab.lib.pagesizes import letter, A4
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak
@@ -11,6 +12,20 @@ from reportlab.lib.units import inch
 from reportlab.lib.enums import TA_LEFT, TA_CENTER, TA_JUSTIFY
 from reportlab.lib.colors import HexColor
 from models import process_text
+from text_cleaning import apply_rules
+from sentence_segmenter import split_sentences
+from section_parser import parse_sections, find_section, section_text
+from pdf_extraction import extract_pages, has_pdfplumber
+from upload_store import (
+    UPLOAD_DIR, get_user_files,
+    add_reference, release_upload, store_upload, mark_indexed, blob_path, compute_file_hash, get_blob
+)
+from extraction_cache import cache_key, cached_pages
+from docx_extraction import iter_docx_blocks, blocks_text
+from ingestion import (
+    EMBED_MODEL_NAME, iter_pdf_page_texts, docx_text, ingest_stored_file, attach_indexed_file,
+    start_reconciliation
+)
 
 # Ensure torch._classes is initialized to avoid AttributeError in some environments
 import torch
@@ -29,66 +44,59 @@ from ui_styles_new import apply_custom_styles, create_welcome_header, create_upl
 
 # --- Document Extraction Libraries ---
 import fitz  # PyMuPDF for PDF extraction
-from docx import Document  # for DOCX extraction
 
-# Importing pdfplumber for improved table extraction
-try:
-    import pdfplumber
-    USE_PDFPLUMBER = True
-except ImportError:
-    USE_PDFPLUMBER = False
+# pdfplumber is optional and only imported by the extraction workers
+USE_PDFPLUMBER = has_pdfplumber()
+
+# pdfplumber only runs on pages that look like tables (see pdf_extraction.py)
+PDF_TABLE_MODE = "selective" if USE_PDFPLUMBER else "none"
 
 # --- Embedding Model ---
 from sentence_transformers import SentenceTransformer
 
-# --- ChromaDB for Vector Storage ---
-from chromadb import Client
-from chromadb.config import Settings
+# --- Vector Storage ---
+# Chroma or the flat index (AIRST_VECTOR_BACKEND), opened on first use; one chunk index per user
+from vector_store import get_backend, embed_query, record_query
 
 # ---------- Global Setup ----------
-# Directory to save uploaded files
-UPLOAD_DIR = "uploads"
+# Uploads are stored by content hash (see upload_store.py)
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 # File for persistent mapping between original filename and unique filename
 PERSISTENCE_FILE = "processed_files.json"
 
-# User-specific file mapping
-USER_FILES_FILE = "user_files.json"
-
-# Initialize the ChromaDB client
-chroma_client = Client(Settings())
-
 # Load embedding model
-embed_model = SentenceTransformer("all-MiniLM-L6-v2")
+embed_model = SentenceTransformer(EMBED_MODEL_NAME)
+
+# Re-index files whose embeddings are missing from the vector store, once per
+# process and in the background; this also opens the store off the page load
+start_reconciliation(get_backend, embed_model.encode, PDF_TABLE_MODE)
 
 # ---------- Persistence Functions ----------
 
 def analyze_text(text: str):
     return process_text(text)
 
+def _iter_pdf_stream_pages(data):
+    """Page texts of an in-memory PDF."""
+    with fitz.open(stream=data, filetype="pdf") as pdf_document:
+        for page in pdf_document:
+            yield page.get_text()
+
 def extract_text_from_uploaded_file(uploaded_file):
     """Extract text from uploaded file without saving it permanently"""
     try:
         if uploaded_file.type == "application/pdf":
-            # Extract text from PDF using PyMuPDF
-            import fitz
-            pdf_document = fitz.open(stream=uploaded_file.read(), filetype="pdf")
-            text = ""
-            for page_num in range(pdf_document.page_count):
-                page = pdf_document[page_num]
-                text += page.get_text()
-            pdf_document.close()
-            return text
+            # Extract text from PDF using PyMuPDF; reruns reuse the cached pages
+            data = uploaded_file.getvalue()
+            key = cache_key(compute_file_hash(data), "pdf-none")
+            return "".join(cached_pages(key, lambda: _iter_pdf_stream_pages(data)))
             
         elif uploaded_file.type == "application/vnd.openxmlformats-officedocument.wordprocessingml.document":
             # Extract text from DOCX
-            from docx import Document
-            doc = Document(uploaded_file)
-            text = ""
-            for paragraph in doc.paragraphs:
-                text += paragraph.text + "\n"
-            return text
+            data = uploaded_file.getvalue()
+            key = cache_key(compute_file_hash(data), "docx-blocks")
+            return blocks_text(cached_pages(key, lambda: iter_docx_blocks(io.BytesIO(data))))
             
         elif uploaded_file.type == "application/msword":
             # Extract text from DOC (basic support)
@@ -119,69 +127,47 @@ def save_processed_files(mapping):
     with open(PERSISTENCE_FILE, "w") as f:
         json.dump(mapping, f)
 
-def load_user_files():
-    """Load user-specific file mappings"""
-    if os.path.exists(USER_FILES_FILE):
-        with open(USER_FILES_FILE, "r") as f:
-            return json.load(f)
-    return {}
-
-def save_user_files(user_files):
-    """Save user-specific file mappings"""
-    with open(USER_FILES_FILE, "w") as f:
-        json.dump(user_files, f, indent=2)
-
-def get_user_files(username):
-    """Get files for a specific user"""
-    user_files = load_user_files()
-    return user_files.get(username, {})
-
 def add_user_file(username, original_name, unique_filename):
     """Add a file to a user's file list"""
-    user_files = load_user_files()
-    if username not in user_files:
-        user_files[username] = {}
-    user_files[username][original_name] = unique_filename
-    save_user_files(user_files)
+    previous = get_user_files(username).get(original_name)
+    orphan = add_reference(username, original_name, unique_filename)
+    if orphan:
+        delete_file(orphan)
+    else:
+        _drop_unreferenced_chunks(username, previous)
 
 def remove_user_file(username, original_name):
-    """Remove a file from a user's file list"""
-    user_files = load_user_files()
-    if username in user_files and original_name in user_files[username]:
-        del user_files[username][original_name]
-        save_user_files(user_files)
+    """Remove a file from a user's file list, deleting it once no user references it"""
+    stored_filename = get_user_files(username).get(original_name)
+    orphan = release_upload(username, original_name)
+    if orphan:
+        delete_file(orphan)
+    else:
+        _drop_unreferenced_chunks(username, stored_filename)
+
+def _drop_unreferenced_chunks(username, stored_filename):
+    """Delete a user's chunks of a file they no longer list under any name"""
+    if stored_filename and stored_filename not in get_user_files(username).values():
+        get_backend().user_index(username).delete_file(stored_filename)
 
 # ---------- Helper Functions ----------
 def extract_text_from_pdf_pymupdf(file_path):
-    doc = fitz.open(file_path)
-    text = ""
-    for page in doc:
-        text += page.get_text("text") + "\n"
-    return text
+    pages = extract_pages(file_path, tables="none")
+    return "".join(page["text"] + "\n" for page in pages)
+
+def iter_pdf_pages(file_path):
+    """Yield the text of each PDF page, with its tables, in order.
+    
+    Pages are extracted in parallel worker processes with PyMuPDF; pdfplumber
+    only runs on pages that look like they contain a table.
+    """
+    return iter_pdf_page_texts(file_path, PDF_TABLE_MODE, on_warning=st.warning)
 
 def extract_text_from_pdf(file_path):
-    full_text = ""
-    if USE_PDFPLUMBER:
-        try:
-            with pdfplumber.open(file_path) as pdf:
-                for page in pdf.pages:
-                    page_text = page.extract_text() or ""
-                    table_text = ""
-                    tables = page.extract_tables() or []
-                    for table in tables:
-                        for row in table:
-                            table_text += "\t".join([str(cell) for cell in row if cell]) + "\n"
-                    full_text += page_text + "\n" + table_text + "\n"
-        except Exception as e:
-            st.warning(f"pdfplumber extraction failed: {e}. Falling back to PyMuPDF.")
-            full_text = extract_text_from_pdf_pymupdf(file_path)
-    else:
-        full_text = extract_text_from_pdf_pymupdf(file_path)
-    return full_text
+    return "".join(page_text + "\n" for page_text in iter_pdf_pages(file_path))
 
 def extract_text_from_docx(file_path):
-    doc = Document(file_path)
-    return "\n".join([p.text for p in doc.paragraphs])
+    return docx_text(file_path)
 
 def chunk_text_improved(text, max_chunk_chars=1000, overlap_chars=200):
     paragraphs = [p.strip() for p in text.split("\n\n") if p.strip()]
@@ -203,73 +189,79 @@ def chunk_text_improved(text, max_chunk_chars=1000, overlap_chars=200):
         chunks.append(current_chunk.strip())
     return chunks
 
-def process_file(uploaded_file):
-    file_extension = os.path.splitext(uploaded_file.name)[1]
-    unique_filename = f"{uuid.uuid4().hex}{file_extension}"
-    file_path = os.path.join(UPLOAD_DIR, unique_filename)
-    with open(file_path, "wb") as f:
-        f.write(uploaded_file.getbuffer())
+def process_file(uploaded_file, username=None):
+    username = username or get_current_user() or "anonymous"
+    # A re-upload under the same name is treated as a revision of that file
+    previous = get_user_files(username).get(uploaded_file.name)
+    previous_blob = get_blob(previous) if previous else None
 
-    if file_extension.lower() == ".pdf":
-        text = extract_text_from_pdf(file_path)
-    elif file_extension.lower() in [".doc", ".docx"]:
-        text = extract_text_from_docx(file_path)
-    else:
+    unique_filename, blob, orphan = store_upload(username, uploaded_file.name, uploaded_file.getvalue())
+    try:
+        if blob and blob.get("indexed") and attach_indexed_file(get_backend(), username, unique_filename):
+            # Same bytes were already extracted and embedded, possibly for another user
+            return unique_filename
+        return _ingest_file(uploaded_file.name, username, unique_filename, blob, previous, previous_blob)
+    finally:
+        # The previous version is only deleted after its pages and embeddings were reused
+        if orphan:
+            delete_file(orphan)
+        elif previous != unique_filename:
+            _drop_unreferenced_chunks(username, previous)
+
+def _ingest_file(original_name, username, unique_filename, blob, previous=None, previous_blob=None):
+    if os.path.splitext(unique_filename)[1] not in [".pdf", ".doc", ".docx"]:
         st.error("Unsupported file type.")
+        remove_user_file(username, original_name)
         return None
 
-    if not text.strip():
-        st.warning(f"No text could be extracted from {uploaded_file.name}.")
-        return None
+    # Pages are cleaned, chunked and embedded in batches as they are extracted
+    # (see ingestion.py); revisions reuse unchanged pages and embeddings
+    stats = ingest_stored_file(
+        get_backend().user_index(username), embed_model.encode, unique_filename, blob, PDF_TABLE_MODE,
+        previous, previous_blob, on_warning=st.warning
+    )
 
-    chunks = chunk_text_improved(text)
-    if not chunks:
-        st.warning("The extracted text is empty after chunking.")
+    if not stats["chunks"]:
+        st.warning(f"No text could be extracted from {original_name}.")
+        remove_user_file(username, original_name)
         return None
 
-    embeddings = embed_model.encode(chunks).tolist()
-    collection = chroma_client.create_collection(name=unique_filename)
-    doc_ids = [str(i) for i in range(len(chunks))]
-    collection.add(documents=chunks, embeddings=embeddings, ids=doc_ids)
+    if stats["revision"]:
+        extracted = f"re-extracted {stats['extracted']}/{stats['pages']} pages, " if "pages" in stats else ""
+        st.info(f"♻️ Updated {original_name}: {extracted}reused {stats['reused']}/{stats['chunks']} chunk embeddings")
+
+    mark_indexed(unique_filename)
     return unique_filename
 
 def delete_file(unique_filename):
-    file_path = os.path.join(UPLOAD_DIR, unique_filename)
+    """Delete a stored file and every user's chunks of it (callers check it is unreferenced)"""
+    file_path = blob_path(unique_filename)
     if os.path.exists(file_path):
         os.remove(file_path)
     try:
-        chroma_client.delete_collection(name=unique_filename)
+        get_backend().purge_file(unique_filename)
     except Exception as e:
-        st.error(f"Error deleting collection: {e}")
+        st.error(f"Error deleting chunks: {e}")
 
 def search_documents(query, top_k=5, username=None):
-    results = []
+    """Top-k chunks for ``query``: one query of the user's chunk index (of every user's if None)"""
+    start = time.perf_counter()
     try:
-        collections = chroma_client.list_collections()
+        # Embedded once, with the model used at ingestion, and reused across indexes
+        query_embedding = embed_query(query, embed_model.encode, username)
+        backend = get_backend()
+        indexes = [backend.user_index(username)] if username else list(backend.user_indexes())
+        results = [
+            (file_id, doc, distance)
+            for index in indexes
+            for file_id, doc, distance, _ in index.query(query_embedding, top_k=top_k)
+        ]
     except Exception as e:
-        st.error(f"Failed to list collections: {e}")
-        return results
-
-    # If username is provided, only search in user's collections
-    if username:
-        user_files = get_user_files(username)
-        user_collections = set(user_files.values())
-
-    for col in collections:
-        name = col.name
-        # Skip if this collection doesn't belong to the user
-        if username and name not in user_collections:
-            continue
-            
-        try:
-            coll = chroma_client.get_collection(name=name)
-            search_result = coll.query(query_texts=[query], n_results=top_k)
-            for doc, distance in zip(search_result["documents"][0], search_result["distances"][0]):
-                results.append((name, doc, distance))
-        except Exception as e:
-            st.error(f"Error querying collection {name}: {e}")
+        st.error(f"Error querying documents: {e}")
+        return []
     results.sort(key=lambda x: x[2])
-    return results
+    record_query(time.perf_counter() - start)
+    return results[:top_k]
 
 def get_api_key():
     """Get API key from multiple sources with better error handling"""
@@ -521,8 +513,6 @@ def create_research_summary_with_citations(text, filename, length_preference="De
 
 def create_detailed_summary_with_line_citations(text, filename):
     """Create a detailed summary with line-by-line citations"""
-    import re
-    
     # Split text into paragraphs
     paragraphs = text.split('\n\n')
     detailed_summary = []
@@ -532,8 +522,8 @@ def create_detailed_summary_with_line_citations(text, filename):
         if not paragraph.strip():
             continue
             
-        # Split paragraph into sentences
-        sentences = re.split(r'[.!?]+', paragraph)
+        # Split paragraph into sentences (terminal punctuation is re-added below)
+        sentences = [s.rstrip('.!?') for s in split_sentences(paragraph)]
         sentences = [s.strip() for s in sentences if s.strip()]
         
         para_summary = []
@@ -565,8 +555,6 @@ def create_detailed_summary_with_line_citations(text, filename):
 
 def create_chatgpt_style_summary(text, filename):
     """Create a comprehensive ChatGPT-style detailed summary with proper citations"""
-    import re
-    
     # Extract introduction section
     introduction_text = extract_introduction_section(text)
     if not introduction_text:
@@ -618,7 +606,7 @@ def create_chatgpt_style_summary(text, filename):
         paragraph = paragraph.strip()
         
         # Split into sentences for detailed processing
-        sentences = re.split(r'[.!?]+', paragraph)
+        sentences = [s.rstrip('.!?') for s in split_sentences(paragraph)]
         sentences = [s.strip() for s in sentences if s.strip() and len(s.strip()) > 10]
         
         para_summary = []
@@ -671,25 +659,8 @@ def create_chatgpt_style_summary(text, filename):
 
 def ensure_proper_word_spacing(text):
     """Ensure proper spacing between words in the text"""
-    import re
-    
-    # Fix common spacing issues
-    # Remove multiple spaces
-    text = re.sub(r'\s+', ' ', text)
-    
-    # Fix spacing around punctuation
-    text = re.sub(r'\s*([.!?,;:])\s*', r'\1 ', text)
-    
-    # Fix spacing around citations
-    text = re.sub(r'\s*(\[\d+\])\s*', r' \1 ', text)
-    
-    # Fix spacing around paragraph citations
-    text = re.sub(r'\s*(\[Paragraph \d+, Lines \d+-\d+\])\s*', r' \1 ', text)
-    
-    # Remove extra spaces at the beginning and end
-    text = text.strip()
-    
-    return text
+    # Citation, punctuation and whitespace fixes share one precompiled pass
+    return apply_rules(text, "spacing")
 
 def generate_pdf_summary(summary_text, filename, original_filename):
     """Generate a PDF file from the summary text"""
@@ -779,58 +750,18 @@ def generate_pdf_summary(summary_text, filename, original_filename):
 
 def extract_introduction_section(text):
     """Extract the introduction section from research paper text"""
-    lines = text.split('\n')
-    introduction_lines = []
-    in_introduction = False
-    
-    for line in lines:
-        line = line.strip()
-        if not line:
-            continue
-            
-        # Check if we're entering introduction section
-        if any(keyword in line.lower() for keyword in ['i. introduction', 'introduction', '1. introduction']):
-            in_introduction = True
-            continue
-            
-        # If in introduction section, collect all lines
-        if in_introduction and line:
-            # Stop if we hit another major section header
-            if any(keyword in line.lower() for keyword in ['ii.', '2.', 'method', 'related work', 'background', 'conclusion']):
-                break
-            introduction_lines.append(line)
-    
-    if introduction_lines:
-        return '\n'.join(introduction_lines)
+    introduction = find_section(parse_sections(text), 'introduction')
+    if introduction:
+        return section_text(text, introduction)
     return ""
 
 def extract_references_section(text):
     """Extract the references section from the original text"""
-    lines = text.split('\n')
-    references = []
-    in_references = False
-    
-    for line in lines:
-        # Don't strip whitespace to preserve original formatting
-        original_line = line
-        
-        # Check if we're entering references section (case insensitive)
-        if any(keyword in line.lower() for keyword in ['references', 'bibliography', 'works cited', 'cited literature']):
-            in_references = True
-            continue
-            
-        # If in references section, collect all lines including empty ones
-        if in_references:
-            # Stop if we hit another major section header
-            if any(keyword in line.lower() for keyword in ['abstract', 'introduction', 'conclusion', 'appendix']):
-                break
-            # Preserve the original line exactly as it appears
-            references.append(original_line)
-    
+    references = find_section(parse_sections(text), 'references')
     if references:
         # Return references exactly as they appear in the original document
         # Preserve original formatting, line breaks, and structure
-        return '\n'.join(references)
+        return section_text(text, references, keep_blank_lines=True)
     
     return ""
 
@@ -841,7 +772,7 @@ def add_citations_to_text(text, filename):
         return text  # Already has citations
     
     # Split into sentences
-    sentences = re.split(r'[.!?]+', text)
+    sentences = [s.rstrip('.!?') for s in split_sentences(text)]
     cited_text = ""
     
     for sentence in sentences:
@@ -1,16 +1,157 @@
 import streamlit as st
-from preprocessing import clean_text, segment_text, extract_key_sections, chunk_text_for_models
-from ner_module import extract_key_entities, categorize_entities, format_entities_for_display
-from classification_module import get_document_metadata, format_classification_for_display
-from summarizer_module import generate_multi_length_summaries, generate_section_summaries, hybrid_summarization, format_summary_for_display
+from document_ir import DocumentIR
+from preprocessing import clean_text
+from ner_module import extract_key_entities, categorize_entities, format_entities_for_display, get_entity_index, ranked_entities, compute_document_hash, get_domain_specific_ner_model
+from classification_module import (
+    get_document_metadata, format_classification_for_display, load_classifier, needs_language_model,
+    LANGUAGE_DETECTION_MODEL
+)
+from summarizer_module import generate_multi_length_summaries, generate_length_summary, generate_section_summaries, hybrid_summarization, format_summary_for_display, SUMMARY_LENGTHS, load_summarizer, get_domain_specific_summarizer
+from pipeline_dag import make_stage, run_stages, required_stages
 
-def process_document_comprehensive(text, document_type="general"):
+# Progress labels for each pipeline stage
+STAGE_LABELS = {
+    "preprocessing": "🔄 Preprocessing document",
+    "metadata": "📊 Analyzing document metadata",
+    "entity_index": "🏷️ Extracting named entities",
+    "entities": "🏷️ Ranking named entities",
+    "brief_summary": "📝 Generating brief summary",
+    "standard_summary": "📝 Generating standard summary",
+    "detailed_summary": "📝 Generating detailed summary",
+    "section_summaries": "📝 Summarizing sections",
+    "hybrid_summary": "📝 Generating hybrid summary",
+    "insights": "💡 Extracting key insights"
+}
+
+def _preprocess_stage(text, pages, headings):
+    """Build the document IR and collect basic structure statistics."""
+    if pages:
+        doc_ir = DocumentIR.from_pages(pages, font_headings=headings)
+    else:
+        doc_ir = DocumentIR(text, font_headings=headings)
+    cleaned_text = doc_ir.cleaned_text
+    
+    return {
+        "doc_ir": doc_ir,
+        "cleaned_text": cleaned_text,
+        "preprocessing": {
+            "cleaned_text_length": len(cleaned_text),
+            "num_sentences": len(doc_ir.sentences),
+            "num_sections": len(doc_ir.sections),
+            "num_chunks": len(doc_ir.chunks()),
+            "sections_found": list(doc_ir.sections.keys())
+        }
+    }
+
+def _entities_stage(cleaned_text, document_type, entity_index):
+    """Top entities and their categories, read from the entity index."""
+    entities = extract_key_entities(cleaned_text, document_type, top_k=15, entity_index=entity_index)
+    
+    return {
+        "all_entities": entities,
+        "categorized_entities": categorize_entities(entities),
+        "total_entities": len(entities),
+        "unique_entities": len(entity_index["entities"]),
+        "total_mentions": sum(e["count"] for e in entity_index["entities"].values())
+    }
+
+def _summary_stage(length):
+    """Build a stage function producing one summary length."""
+    def run(cleaned_text, document_type, doc_ir):
+        return generate_length_summary(cleaned_text, length, document_type, doc_ir=doc_ir)
+    return run
+
+def build_document_stages():
+    """The comprehensive analysis pipeline as a DAG of named stages."""
+    return [
+        make_stage("preprocessing", _preprocess_stage,
+                   inputs=("text", "pages", "headings"), outputs=("doc_ir", "cleaned_text", "preprocessing")),
+        make_stage("metadata", lambda cleaned_text, doc_ir: get_document_metadata(cleaned_text, doc_ir=doc_ir),
+                   inputs=("cleaned_text", "doc_ir")),
+        make_stage("entity_index",
+                   lambda cleaned_text, document_type, artifact_path, doc_ir: get_entity_index(
+                       cleaned_text, document_type, artifact_path=artifact_path,
+                       page_offsets=doc_ir.cleaned_page_offsets),
+                   inputs=("cleaned_text", "document_type", "artifact_path", "doc_ir")),
+        make_stage("entities", _entities_stage,
+                   inputs=("cleaned_text", "document_type", "entity_index")),
+        make_stage("brief_summary", _summary_stage("brief"),
+                   inputs=("cleaned_text", "document_type", "doc_ir")),
+        make_stage("standard_summary", _summary_stage("standard"),
+                   inputs=("cleaned_text", "document_type", "doc_ir")),
+        make_stage("detailed_summary", _summary_stage("detailed"),
+                   inputs=("cleaned_text", "document_type", "doc_ir")),
+        make_stage("section_summaries",
+                   lambda cleaned_text, doc_ir: generate_section_summaries(cleaned_text, doc_ir=doc_ir),
+                   inputs=("cleaned_text", "doc_ir")),
+        make_stage("hybrid_summary",
+                   lambda cleaned_text, document_type, doc_ir: hybrid_summarization(
+                       cleaned_text, document_type, doc_ir=doc_ir),
+                   inputs=("cleaned_text", "document_type", "doc_ir")),
+        make_stage("insights",
+                   lambda cleaned_text, entities, metadata, brief_summary, entity_index: extract_key_insights(
+                       cleaned_text, entities["all_entities"], metadata,
+                       {"multi_length": {"brief": brief_summary}}, entity_index=entity_index),
+                   inputs=("cleaned_text", "entities", "metadata", "brief_summary", "entity_index"))
+    ]
+
+def preload_models(stage_names, document_type="general", text=None):
+    """
+    Load the models of ``stage_names`` on the calling (script) thread.
+    
+    Stages run on worker threads; loading here first means their spinners and
+    load errors show in the session, and the stages only read the caches.
+    Threads asking the loaders for one model share one load. A failed load is
+    reported once and then returns None without retrying unless ``retry`` is
+    set, so stages do not repeat it; the loads here pass ``retry=True``.
+    ``text`` decides whether language detection needs its transformer.
+    """
+    stage_names = set(stage_names)
+    if stage_names & {f"{length}_summary" for length in SUMMARY_LENGTHS} or "hybrid_summary" in stage_names:
+        get_domain_specific_summarizer(document_type, retry=True)
+    if "section_summaries" in stage_names:
+        load_summarizer(retry=True)
+    if "entity_index" in stage_names:
+        get_domain_specific_ner_model(document_type, retry=True)
+    if "metadata" in stage_names:
+        load_classifier(retry=True)
+        if text is None or needs_language_model(clean_text(text)):
+            load_classifier(LANGUAGE_DETECTION_MODEL, retry=True)
+
+def _streamlit_stage_progress():
+    """Progress callback rendering per-stage status with a Streamlit progress bar."""
+    progress_bar = st.progress(0.0)
+    status_line = st.empty()
+    
+    def on_progress(event):
+        label = STAGE_LABELS.get(event["stage"], event["stage"])
+        if event["status"] == "running":
+            status_line.caption(f"{label}...")
+        else:
+            progress_bar.progress(event["completed"] / max(event["total"], 1))
+            status_line.caption(f"{label}: {event['status']} ({event['seconds']:.1f}s)")
+    
+    return on_progress
+
+def process_document_comprehensive(text, document_type="general", artifact_path=None, stages=None, progress_callback=None, pages=None,
+                                   headings=None):
     """
     Comprehensive document processing pipeline.
     
+    Stages run through the DAG scheduler: independent stages execute in
+    parallel and outputs are memoized per document hash. The document is
+    cleaned and segmented once into a DocumentIR shared by every stage.
+    
     Args:
         text (str): Input document text
         document_type (str): Expected document type (research, legal, medical, general)
+        artifact_path (str): Optional stored upload path (``upload_store.blob_path``); the
+            entity index is cached next to it
+        stages (list): Optional subset of stage names to run, e.g. ["entities", "brief_summary"]
+        progress_callback (callable): Receives scheduler progress events; defaults to a Streamlit progress bar
+        pages (list): Optional per-page texts from the extractor, used for the page map
+        headings (dict): Optional {heading line: level} from PDF font cues or DOCX
+            heading styles, e.g. as filled by ``ingestion.file_pages``
     
     Returns:
         dict: Comprehensive analysis results
@@ -19,55 +160,55 @@ def process_document_comprehensive(text, document_type="general"):
         return {"error": "No text provided for analysis."}
     
     try:
-        results = {}
+        initial_values = {
+            "text": text,
+            "pages": pages,
+            "headings": headings,
+            "document_type": document_type,
+            "artifact_path": artifact_path
+        }
+        cache_key = f"{compute_document_hash(text)}:{document_type.lower()}"
+        if headings:
+            # Font headings change the sections, so they are part of the memo key
+            cache_key += ":" + compute_document_hash("\n".join(sorted(headings)))
+        document_stages = build_document_stages()
+        preload_models(
+            required_stages(document_stages, stages or [stage["name"] for stage in document_stages],
+                            available=initial_values),
+            document_type, text
+        )
         
-        # Step 1: Preprocessing
-        with st.spinner("🔄 Preprocessing document..."):
-            cleaned_text = clean_text(text)
-            sentences = segment_text(cleaned_text)
-            sections = extract_key_sections(cleaned_text)
-            chunks = chunk_text_for_models(cleaned_text)
-            
-            results["preprocessing"] = {
-                "cleaned_text_length": len(cleaned_text),
-                "num_sentences": len(sentences),
-                "num_sections": len(sections),
-                "num_chunks": len(chunks),
-                "sections_found": list(sections.keys())
-            }
+        values, report = run_stages(
+            document_stages,
+            initial_values,
+            targets=stages,
+            cache_key=cache_key,
+            on_progress=progress_callback or _streamlit_stage_progress()
+        )
         
-        # Step 2: Document Metadata Analysis
-        with st.spinner("📊 Analyzing document metadata..."):
-            metadata = get_document_metadata(cleaned_text)
-            results["metadata"] = metadata
+        if "cleaned_text" not in values:
+            return {"error": f"Processing failed: {report.get('preprocessing', {}).get('status', 'preprocessing did not run')}"}
         
-        # Step 3: Named Entity Recognition
-        with st.spinner("🏷️ Extracting named entities..."):
-            entities = extract_key_entities(cleaned_text, document_type, top_k=15)
-            entity_categories = categorize_entities(entities)
-            
-            results["entities"] = {
-                "all_entities": entities,
-                "categorized_entities": entity_categories,
-                "total_entities": len(entities)
-            }
+        results = {"stage_report": report}
         
-        # Step 4: Multi-length Summarization
-        with st.spinner("📝 Generating summaries..."):
-            summaries = generate_multi_length_summaries(cleaned_text, document_type)
-            section_summaries = generate_section_summaries(cleaned_text)
-            hybrid_results = hybrid_summarization(cleaned_text, document_type)
-            
-            results["summaries"] = {
-                "multi_length": summaries,
-                "section_summaries": section_summaries,
-                "hybrid_summarization": hybrid_results
-            }
+        for key in ("preprocessing", "metadata", "entities", "insights"):
+            if key in values:
+                results[key] = values[key]
         
-        # Step 5: Key Insights
-        with st.spinner("💡 Extracting key insights..."):
-            key_insights = extract_key_insights(cleaned_text, entities, metadata, summaries)
-            results["insights"] = key_insights
+        summaries = {}
+        multi_length = {
+            length: values[f"{length}_summary"]
+            for length in SUMMARY_LENGTHS
+            if f"{length}_summary" in values
+        }
+        if multi_length:
+            summaries["multi_length"] = multi_length
+        if "section_summaries" in values:
+            summaries["section_summaries"] = values["section_summaries"]
+        if "hybrid_summary" in values:
+            summaries["hybrid_summarization"] = values["hybrid_summary"]
+        if summaries:
+            results["summaries"] = summaries
         
         return results
         
@@ -75,8 +216,12 @@ def process_document_comprehensive(text, document_type="general"):
         st.error(f"Error in comprehensive document processing: {e}")
         return {"error": f"Processing failed: {str(e)}"}
 
-def extract_key_insights(text, entities, metadata, summaries):
-    """Extract key insights from the document analysis."""
+def extract_key_insights(text, entities, metadata, summaries, entity_index=None):
+    """Extract key insights from the document analysis.
+    
+    When an entity index is supplied, entity insights are read from it directly
+    instead of being limited to the already-truncated ``entities`` list.
+    """
     insights = {}
     
     # Document complexity insights
@@ -88,16 +233,26 @@ def extract_key_insights(text, entities, metadata, summaries):
     }
     
     # Entity insights
-    entity_categories = categorize_entities(entities)
-    insights["entities"] = {
-        "most_common_type": get_most_common_entity_type(entity_categories),
-        "key_people": [e for e in entities if e.get("entity_group") == "PERSON"][:5],
-        "key_organizations": [e for e in entities if e.get("entity_group") == "ORG"][:5],
-        "key_locations": [e for e in entities if e.get("entity_group") == "LOC"][:5]
-    }
+    if entity_index:
+        entity_categories = categorize_entities(ranked_entities(entity_index))
+        insights["entities"] = {
+            "most_common_type": get_most_common_entity_type(entity_categories),
+            "key_people": ranked_entities(entity_index, top_k=5, entity_group="PERSON"),
+            "key_organizations": ranked_entities(entity_index, top_k=5, entity_group="ORG"),
+            "key_locations": ranked_entities(entity_index, top_k=5, entity_group="LOC"),
+            "most_mentioned": sorted(ranked_entities(entity_index), key=lambda e: e["count"], reverse=True)[:5]
+        }
+    else:
+        entity_categories = categorize_entities(entities)
+        insights["entities"] = {
+            "most_common_type": get_most_common_entity_type(entity_categories),
+            "key_people": entity_categories["PERSON"][:5],
+            "key_organizations": entity_categories["ORG"][:5],
+            "key_locations": entity_categories["LOC"][:5]
+        }
     
     # Summary insights
-    brief_summary = summaries.get("multi_length", {}).get("brief", "")
+    brief_summary = summaries.get("multi_length", summaries).get("brief", "")
     insights["summary"] = {
         "key_topics": extract_key_topics_from_summary(brief_summary),
         "summary_length": len(brief_summary),
@@ -198,6 +353,10 @@ def format_comprehensive_results(results):
         st.write("**Complexity:**", complexity.get("complexity", "Unknown"))
         st.write("**Readability Score:**", complexity.get("readability_score", 0))
     
+    incomplete = {name: status for name, status in metadata.get("status", {}).items() if status != "ok"}
+    if incomplete:
+        st.warning("Some metadata is incomplete: " + ", ".join(f"{name} ({status})" for name, status in incomplete.items()))
+    
     # Display entities
     st.subheader("🏷️ Named Entities")
     entities = results.get("entities", {})
@@ -207,7 +366,7 @@ def format_comprehensive_results(results):
         if entity_list:
             with st.expander(f"{entity_type} ({len(entity_list)})"):
                 for entity in entity_list[:10]:  # Show first 10
-                    st.write(f"• **{entity.get('word', '')}** (confidence: {entity.get('score', 0):.2f})")
+                    st.write(f"• **{entity.get('word', '')}** (confidence: {entity.get('score', 0):.2f}, mentions: {entity.get('count', 1)})")
     
     # Display summaries
     st.subheader("📝 Summaries")
@@ -248,24 +407,36 @@ def format_comprehensive_results(results):
         summary_insights = insights.get("summary", {})
         st.write("**Key Topics:**", ", ".join(summary_insights.get("key_topics", [])))
         st.write("**Has Conclusions:**", "Yes" if summary_insights.get("has_conclusions", False) else "No")
+    
+    # Display per-stage timings from the scheduler
+    stage_report = results.get("stage_report", {})
+    if stage_report:
+        with st.expander("⏱️ Pipeline Stage Timings"):
+            for stage_name, stage_info in stage_report.items():
+                label = STAGE_LABELS.get(stage_name, stage_name)
+                st.write(f"• **{label}**: {stage_info['status']} ({stage_info['seconds']:.2f}s)")
 
-def process_document_simple(text, document_type="general"):
-    """Simplified document processing for quick analysis."""
+def process_document_simple(text, document_type="general", artifact_path=None):
+    """Simplified document processing for quick analysis.
+    
+    ``artifact_path`` is the stored upload, as for ``process_document_comprehensive``.
+    """
     if not text or not text.strip():
         return {"error": "No text provided."}
     
     try:
-        # Clean text
-        cleaned_text = clean_text(text)
+        # Clean and segment once
+        doc_ir = DocumentIR(text)
+        cleaned_text = doc_ir.cleaned_text
         
         # Get basic metadata
-        metadata = get_document_metadata(cleaned_text)
+        metadata = get_document_metadata(cleaned_text, doc_ir=doc_ir)
         
         # Extract key entities
-        entities = extract_key_entities(cleaned_text, document_type, top_k=10)
+        entities = extract_key_entities(cleaned_text, document_type, top_k=10, artifact_path=artifact_path)
         
         # Generate standard summary
-        summaries = generate_multi_length_summaries(cleaned_text, document_type)
+        summaries = generate_multi_length_summaries(cleaned_text, document_type, doc_ir=doc_ir)
         
         return {
             "metadata": metadata,
@@ -0,0 +1,247 @@
+"""
+Single-pass section parser shared by preprocessing and the RAG summarizers.
+
+One combined, precompiled header grammar is matched against the whole text
+with ``re.finditer`` (line-anchored), so detection is linear in the document
+length. A line only counts as a header when the *whole* line is a heading:
+
+* a known section keyword ("Abstract", "3. Methods", "IV. CONCLUSION"), or
+* a numbered / roman heading in title or upper case ("2.1 Data Collection"),
+* or a line that PyMuPDF reports in a larger or bold font (``FontHeadings``),
+  or that a DOCX heading style marks, when available.
+
+Prose lines that merely contain "summary" or "method" are never headers.
+"""
+
+import re
+from collections import Counter
+
+# Heading keyword -> canonical section name
+SECTION_KEYWORDS = {
+    "abstract": "abstract",
+    "executive summary": "abstract",
+    "summary": "abstract",
+    "introduction": "introduction",
+    "intro": "introduction",
+    "background": "background",
+    "related work": "background",
+    "related works": "background",
+    "literature review": "background",
+    "literature survey": "background",
+    "methodology": "methodology",
+    "methods": "methodology",
+    "method": "methodology",
+    "materials and methods": "methodology",
+    "proposed method": "methodology",
+    "proposed system": "methodology",
+    "experiments": "results",
+    "experimental results": "results",
+    "results": "results",
+    "findings": "results",
+    "results and discussion": "results",
+    "discussion": "discussion",
+    "conclusion": "conclusion",
+    "conclusions": "conclusion",
+    "conclusion and future work": "conclusion",
+    "future work": "future_work",
+    "acknowledgment": "acknowledgements",
+    "acknowledgments": "acknowledgements",
+    "acknowledgement": "acknowledgements",
+    "acknowledgements": "acknowledgements",
+    "references": "references",
+    "bibliography": "references",
+    "works cited": "references",
+    "cited literature": "references",
+    "appendix": "appendix",
+}
+
+# Sections whose heading may carry content on the same line ("Abstract—We ...")
+INLINE_CONTENT_SECTIONS = frozenset(["abstract"])
+
+# Roman section numbers run I. to XXXIX.; "C." or "L." are initials, not headings
+_ROMAN = r"(?=[IVX])X{0,3}(?:IX|IV|V?I{0,3})\."
+_NUMBER = rf"(?:\d{{1,2}}(?:\.\d{{1,2}})*\.?|{_ROMAN})"
+_KEYWORDS = "|".join(sorted((re.escape(k).replace(r"\ ", r"\s+") for k in SECTION_KEYWORDS), key=len, reverse=True))
+
+_HEADER_GRAMMAR = (
+    # Keyword headings, optionally numbered, optionally followed by inline text
+    rf"^[ \t]*(?:(?P<num>{_NUMBER})[ \t]+)?(?P<kw>(?i:{_KEYWORDS}))"
+    r"(?:[ \t]*:?[ \t]*$|[ \t]*(?::|—|–|--?)[ \t]*(?P<inline>\S[^\n]*)$)"
+    # Generic numbered headings in Title Case or UPPER CASE, no sentence punctuation
+    rf"|^[ \t]*(?P<gnum>{_NUMBER})[ \t]+(?P<gtitle>[A-Z][^\n.:;!?]{{1,78}}?)[ \t]*$"
+)
+_HEADER = re.compile(_HEADER_GRAMMAR, re.MULTILINE)
+
+_SMALL_WORDS = frozenset(["a", "an", "and", "as", "at", "by", "for", "in", "of", "on", "or", "the", "to", "with", "vs"])
+
+def _looks_like_title(title):
+    """Title Case or UPPER CASE heading text of at most ten words."""
+    words = title.split()
+    if not words or len(words) > 10:
+        return False
+    if title.isupper():
+        return True
+    return all(w[0].isupper() or w.lower() in _SMALL_WORDS or not w[0].isalpha() for w in words)
+
+def _level(number):
+    """Heading depth from its number: '3' -> 1, '3.1' -> 2, 'IV.' -> 1."""
+    if not number:
+        return 1
+    parts = [p for p in number.rstrip(".").split(".") if p]
+    return max(1, len(parts))
+
+def _slug(title):
+    return re.sub(r"[^a-z0-9]+", "_", title.lower()).strip("_")
+
+def _font_heading_pattern(font_headings):
+    """Line-anchored alternation matching the given heading lines exactly."""
+    if not font_headings:
+        return None
+    alternatives = sorted({re.escape(h.strip()) for h in font_headings if h and h.strip()}, key=len, reverse=True)
+    if not alternatives:
+        return None
+    return re.compile(rf"^[ \t]*(?P<ftitle>{'|'.join(alternatives)})[ \t]*$", re.MULTILINE)
+
+def parse_sections(text, font_headings=None):
+    """
+    Find every section header in one pass over ``text``.
+
+    Args:
+        text (str): Raw document text with line breaks
+        font_headings (iterable): Optional heading lines detected from font cues,
+            or a {line: level} mapping (e.g. from DOCX heading styles)
+
+    Returns:
+        list: Flat, ordered section dicts with ``name``, ``title``, ``number``,
+        ``level``, ``start`` (header offset), ``content_start`` and ``end``.
+        A section ends where the next header of the same or a higher level starts.
+    """
+    if not text:
+        return []
+
+    headers = []
+    for match in _HEADER.finditer(text):
+        if match.group("kw"):
+            keyword = re.sub(r"\s+", " ", match.group("kw").lower())
+            name = SECTION_KEYWORDS[keyword]
+            inline = match.group("inline")
+            if inline and name not in INLINE_CONTENT_SECTIONS:
+                continue
+            headers.append({
+                "name": name,
+                "title": match.group("kw").strip(),
+                "number": match.group("num"),
+                "level": _level(match.group("num")),
+                "start": match.start(),
+                "content_start": match.start("inline") if inline else min(match.end() + 1, len(text))
+            })
+        else:
+            title = match.group("gtitle").strip()
+            if not _looks_like_title(title):
+                continue
+            # "V. Kumar, Robust Methods" is a reference line, not heading V.
+            if match.group("gnum")[0] in "IVX" and "," in title:
+                continue
+            headers.append({
+                "name": _slug(title),
+                "title": title,
+                "number": match.group("gnum"),
+                "level": _level(match.group("gnum")),
+                "start": match.start(),
+                "content_start": min(match.end() + 1, len(text))
+            })
+
+    font_pattern = _font_heading_pattern(font_headings)
+    if font_pattern:
+        known_starts = {h["start"] for h in headers}
+        for match in font_pattern.finditer(text):
+            if match.start() in known_starts:
+                continue
+            title = match.group("ftitle")
+            keyword = re.sub(r"\s+", " ", title.lower())
+            headers.append({
+                "name": SECTION_KEYWORDS.get(keyword, _slug(title)),
+                "title": title,
+                "number": None,
+                "level": font_headings.get(title, 1) if isinstance(font_headings, dict) else 1,
+                "start": match.start(),
+                "content_start": min(match.end() + 1, len(text))
+            })
+        headers.sort(key=lambda h: h["start"])
+
+    # Close each section at the next header of the same or a higher level
+    open_sections = []
+    for header in headers:
+        while open_sections and open_sections[-1]["level"] >= header["level"]:
+            open_sections.pop()["end"] = header["start"]
+        open_sections.append(header)
+    for header in open_sections:
+        header["end"] = len(text)
+
+    return headers
+
+def build_section_tree(sections):
+    """Nest a flat section list by heading level."""
+    root = {"name": "document", "level": 0, "children": []}
+    stack = [root]
+
+    for section in sections:
+        node = dict(section, children=[])
+        while stack[-1]["level"] >= node["level"]:
+            stack.pop()
+        stack[-1]["children"].append(node)
+        stack.append(node)
+
+    return root
+
+def find_section(sections, name):
+    """First section with the given canonical name, or None."""
+    for section in sections:
+        if section["name"] == name:
+            return section
+    return None
+
+def section_text(text, section, keep_blank_lines=False):
+    """Content lines of a section (without its header line)."""
+    lines = text[section["content_start"]:section["end"]].split("\n")
+    if keep_blank_lines:
+        return "\n".join(lines).rstrip("\n")
+    return "\n".join(line.strip() for line in lines if line.strip())
+
+def heading_level(line):
+    """Level the header grammar gives ``line`` as a whole, or None if it is not a heading."""
+    sections = parse_sections(line.strip())
+    return sections[0]["level"] if sections and sections[0]["start"] == 0 else None
+
+class FontHeadings:
+    """
+    Heading lines from per-page PDF font cues, collected as pages stream in.
+
+    Lines set noticeably larger than the body text seen so far, or entirely
+    in bold, become headings (see ``pdf_extraction.page_font_cues``). Only
+    those the header grammar also accepts ("Methods", "2.1 Data") get its
+    level; other font-cue lines ("Key Observations", a bold caption) are
+    level-2 sub-headings, which do not end chunks. A line found on a second
+    page is a running header or footer and is dropped.
+    """
+
+    def __init__(self, headings=None, size_ratio=1.15):
+        # {line: level}, updated in place for the chunker reading it
+        self.headings = {} if headings is None else headings
+        self.size_ratio = size_ratio
+        self._sizes = Counter()
+        self._pages = Counter()   # font-cue line -> pages it was found on
+
+    def add_page(self, cues):
+        """Take in one page's ``page_font_cues``."""
+        if not cues:
+            return
+        self._sizes.update({float(size): chars for size, chars in cues["sizes"].items()})
+        body_size = max(self._sizes, key=self._sizes.get, default=0)
+        found = {text for text, size, bold in cues["lines"] if bold or size >= body_size * self.size_ratio}
+        for text in found:
+            self._pages[text] += 1
+            if self._pages[text] > 1:
+                self.headings.pop(text, None)
+            else:
+                self.headings[text] = heading_level(text) or 2
@@ -0,0 +1,110 @@
+"""
+Fast rule-based sentence segmenter returning character spans.
+
+One regex scan finds candidate terminators; each candidate is accepted or
+rejected by looking at the token before it and the character after it.
+Handles common abbreviations ("e.g.", "Fig.", "et al."), initials, numeric
+citations such as "[12]." and the Devanagari danda used in Marathi and Hindi.
+"""
+
+import re
+
+# Abbreviations that never end a sentence on their own
+ABBREVIATIONS = frozenset([
+    "approx", "cf", "ch", "col", "dept", "dr", "e.g", "eq", "eqs", "est",
+    "fig", "figs", "i.e", "jr", "mr", "mrs", "ms", "nos", "op", "p", "pp",
+    "prof", "ref", "refs", "sec", "sect", "sr", "st", "tab", "univ", "viz",
+    "vol", "vols", "vs", "w.r.t"
+])
+
+# Abbreviations that end a sentence when the next word is capitalised;
+# "et al. [4]" and "no. 5" carry on, "et al. The" and "is no. We" do not
+SENTENCE_FINAL_ABBREVIATIONS = frozenset(["al", "co", "corp", "etc", "inc", "ltd", "no"])
+
+# Dotted initialisms such as "U.S" or "Ph.D" before the final period
+_DOTTED_ABBREVIATION = re.compile(r"(?:[^\W\d_]{1,2}\.)+[^\W\d_]{1,2}")
+
+# Terminator run, optional closing quotes/brackets, then whitespace or end of text.
+# The danda (।) and double danda (॥) end a sentence even without trailing space.
+_CANDIDATE = re.compile(r"[.!?]+[\"'”’)\]]*(?=\s|$)|[।॥]+[\"'”’)\]]*")
+
+def _token_before(text, position):
+    """The whitespace-delimited token ending at ``position`` (exclusive)."""
+    start = position
+    while start > 0 and not text[start - 1].isspace():
+        start -= 1
+    return text[start:position]
+
+def _next_visible_char(text, position):
+    """First non-space character at or after ``position``, or '' at the end."""
+    length = len(text)
+    while position < length and text[position].isspace():
+        position += 1
+    return text[position] if position < length else ""
+
+def _is_boundary(text, match):
+    """Decide whether a candidate terminator really ends a sentence."""
+    terminator = match.group()
+    if terminator[0] in "।॥" or terminator[0] in "!?":
+        return True
+    if not terminator.startswith(".") or terminator.startswith(".."):
+        return True
+
+    token = _token_before(text, match.start()).lstrip("([\"'“‘")
+    word = token.lower()
+    next_char = _next_visible_char(text, match.end())
+
+    # A lowercase continuation almost never starts a new sentence
+    if next_char.islower():
+        return False
+    if word in ABBREVIATIONS:
+        return False
+    if word in SENTENCE_FINAL_ABBREVIATIONS:
+        return next_char.isupper()
+    if _DOTTED_ABBREVIATION.fullmatch(token):
+        return False
+    # Initials such as "J." in "J. Smith"
+    if len(token) == 1 and token.isalpha() and token.isupper():
+        return False
+    # Heading numbers like "2." or "3.1." right after a finished sentence
+    if token.replace(".", "").isdigit() and len(token) <= 5:
+        position = match.start() - len(token)
+        while position > 0 and text[position - 1].isspace():
+            position -= 1
+        if position == 0 or text[position - 1] in ".!?।॥":
+            return False
+    return True
+
+def iter_sentence_spans(text):
+    """Yield (start, end) offsets of sentences in ``text`` without copying it."""
+    if not text:
+        return
+
+    start = 0
+    length = len(text)
+
+    for match in _CANDIDATE.finditer(text):
+        if not _is_boundary(text, match):
+            continue
+
+        while start < match.end() and text[start].isspace():
+            start += 1
+        if start < match.end():
+            yield start, match.end()
+        start = match.end()
+
+    while start < length and text[start].isspace():
+        start += 1
+    end = length
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    if start < end:
+        yield start, end
+
+def sentence_spans(text):
+    """List of (start, end) sentence offsets in ``text``."""
+    return list(iter_sentence_spans(text))
+
+def split_sentences(text):
+    """Sentences of ``text`` as strings."""
+    return [text[start:end] for start, end in iter_sentence_spans(text)]
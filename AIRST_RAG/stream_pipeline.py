@@ -0,0 +1,131 @@
+"""
+Backpressured streaming pipeline of threaded stages.
+
+A source iterable and each stage run on their own thread, connected by
+bounded queues: a fast producer blocks once ``queue_size`` items are waiting
+downstream, so memory holds at most a few batches per stage no matter how long
+the stream is, while I/O and compute in different stages overlap.
+
+A stage is a callable that takes an iterable and returns an iterable, so it
+can map items one to one or regroup them into differently sized batches. The
+first exception raised by any stage stops the others and is re-raised to the
+consumer.
+"""
+
+import os
+import queue
+import threading
+from itertools import islice
+
+# Items each queue holds before its producer blocks
+PIPELINE_QUEUE_SIZE = int(os.getenv("AIRST_PIPELINE_QUEUE_SIZE", 4))
+
+# Seconds between checks of the stop flag while blocked on a queue
+_POLL_SECONDS = 0.1
+
+_END = object()
+
+class _Failure:
+    def __init__(self, error):
+        self.error = error
+
+def batched(items, size):
+    """Lists of up to ``size`` consecutive items."""
+    items = iter(items)
+    while True:
+        batch = list(islice(items, size))
+        if not batch:
+            return
+        yield batch
+
+def _put(q, item, stop):
+    """Block until ``item`` fits in ``q``; False if the pipeline was stopped meanwhile."""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=_POLL_SECONDS)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def _drain(q, stop, failed):
+    """Items from ``q`` until the end marker; records an upstream failure in ``failed``."""
+    while not stop.is_set():
+        try:
+            item = q.get(timeout=_POLL_SECONDS)
+        except queue.Empty:
+            continue
+        if item is _END:
+            return
+        if isinstance(item, _Failure):
+            failed.append(item)
+            return
+        yield item
+
+def _run_stage(inputs, outbox, stop):
+    """Push a stage's outputs downstream; False if it failed (the failure is sent on) or was stopped."""
+    try:
+        for item in inputs:
+            if not _put(outbox, item, stop):
+                return False
+        return True
+    except BaseException as error:
+        _put(outbox, _Failure(error), stop)
+        return False
+    finally:
+        close = getattr(inputs, "close", None)
+        if close is not None:
+            close()
+
+def iter_pipeline(source, stages, queue_size=None):
+    """
+    Stream ``source`` through ``stages``, each on its own thread.
+
+    Args:
+        source (iterable): Items for the first stage; iterated on a worker thread
+        stages (list): Callables mapping an iterable of items to an iterable
+        queue_size (int): Bound of every queue between stages
+
+    Yields:
+        The outputs of the last stage, in order
+    """
+    queue_size = queue_size or PIPELINE_QUEUE_SIZE
+    stop = threading.Event()
+    queues = [queue.Queue(maxsize=queue_size) for _ in range(len(stages) + 1)]
+    threads = []
+
+    def feed():
+        if _run_stage(iter(source), queues[0], stop):
+            _put(queues[0], _END, stop)
+
+    def work(stage, inbox, outbox):
+        failed = []
+        try:
+            outputs = iter(stage(_drain(inbox, stop, failed)))
+        except BaseException as error:
+            _put(outbox, _Failure(error), stop)
+            return
+        if _run_stage(outputs, outbox, stop):
+            _put(outbox, failed[0] if failed else _END, stop)
+
+    threads.append(threading.Thread(target=feed, name="pipeline-source", daemon=True))
+    for index, stage in enumerate(stages):
+        threads.append(threading.Thread(
+            target=work, args=(stage, queues[index], queues[index + 1]),
+            name=f"pipeline-stage-{index}", daemon=True
+        ))
+    for thread in threads:
+        thread.start()
+
+    try:
+        while True:
+            item = queues[-1].get()
+            if item is _END:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
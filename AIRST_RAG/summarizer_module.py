@@ -1,28 +1,42 @@
+import threading
+
 import streamlit as st
 from transformers import pipeline
 import torch
 
 # Global cache for summarizers
 _summarizers = {}
+_summarizers_lock = threading.Lock()
+
+# {model_name: error} of loads that failed
+_summarizer_errors = {}
 
-def load_summarizer(model_name="facebook/bart-large-cnn"):
-    """Load summarization model with caching."""
+def load_summarizer(model_name="facebook/bart-large-cnn", retry=False):
+    """Load summarization model with caching (see ``preload_models`` for ``retry``)."""
     if model_name in _summarizers:
         return _summarizers[model_name]
     
-    try:
-        with st.spinner(f"Loading summarizer: {model_name}"):
-            summarizer = pipeline(
-                "summarization", 
-                model=model_name,
-                device=0 if torch.cuda.is_available() else -1
-            )
-            _summarizers[model_name] = summarizer
-            return summarizer
-            
-    except Exception as e:
-        st.error(f"Error loading summarizer {model_name}: {e}")
-        return None
+    with _summarizers_lock:
+        if model_name in _summarizers:
+            return _summarizers[model_name]
+        if model_name in _summarizer_errors and not retry:
+            return None
+        
+        try:
+            with st.spinner(f"Loading summarizer: {model_name}"):
+                summarizer = pipeline(
+                    "summarization", 
+                    model=model_name,
+                    device=0 if torch.cuda.is_available() else -1
+                )
+                _summarizers[model_name] = summarizer
+                _summarizer_errors.pop(model_name, None)
+                return summarizer
+                
+        except Exception as e:
+            _summarizer_errors[model_name] = e
+            st.error(f"Error loading summarizer {model_name}: {e}")
+            return None
 
 def safe_summarize(text, summarizer, max_len=200, min_len=80):
     """Safe wrapper for summarization with comprehensive error handling"""
@@ -66,15 +80,19 @@ def safe_summarize(text, summarizer, max_len=200, min_len=80):
     except Exception as e:
         return f"Summarization error: {str(e)}"
 
-def generate_summary(text, summarizer, max_len=200, min_len=80):
-    """Generate summary using the provided summarizer."""
+def generate_summary(text, summarizer, max_len=200, min_len=80, chunks=None):
+    """Generate summary using the provided summarizer.
+    
+    ``chunks`` may carry precomputed chunks of ``text`` (e.g. from a DocumentIR).
+    """
     if not text or not summarizer:
         return "Unable to generate summary."
     
     try:
         # Handle long texts by chunking
         if len(text) > 1024:
-            chunks = chunk_text_for_summarization(text)
+            if chunks is None:
+                chunks = chunk_text_for_summarization(text)
             summaries = []
             
             for chunk in chunks[:3]:  # Limit to first 3 chunks
@@ -99,28 +117,13 @@ def generate_summary(text, summarizer, max_len=200, min_len=80):
         st.error(f"Error in summarization: {e}")
         return f"Summarization failed: {str(e)}"
 
-def chunk_text_for_summarization(text, chunk_size=1000):
+def chunk_text_for_summarization(text, chunk_size=1000, doc_ir=None):
     """Split text into chunks suitable for summarization."""
-    from preprocessing import segment_text
-    
-    sentences = segment_text(text)
-    chunks = []
-    current_chunk = ""
-    
-    for sentence in sentences:
-        if len(current_chunk) + len(sentence) < chunk_size:
-            current_chunk += sentence + " "
-        else:
-            if current_chunk.strip():
-                chunks.append(current_chunk.strip())
-            current_chunk = sentence + " "
-    
-    if current_chunk.strip():
-        chunks.append(current_chunk.strip())
+    from preprocessing import chunk_text_for_models
     
-    return chunks
+    return chunk_text_for_models(text, max_length=chunk_size, doc_ir=doc_ir)
 
-def get_domain_specific_summarizer(document_type):
+def get_domain_specific_summarizer(document_type, retry=False):
     """Get appropriate summarizer based on document type."""
     model_mapping = {
         "research": "facebook/bart-large-cnn",  # Good for academic text
@@ -132,48 +135,53 @@ def get_domain_specific_summarizer(document_type):
     }
     
     model_name = model_mapping.get(document_type.lower(), "facebook/bart-large-cnn")
-    return load_summarizer(model_name)
+    return load_summarizer(model_name, retry=retry)
 
-def generate_multi_length_summaries(text, document_type="general"):
-    """Generate summaries of different lengths."""
+# (max_len, min_len) for each summary length
+SUMMARY_LENGTHS = {
+    "brief": (100, 30),      # 1-2 sentences
+    "standard": (200, 80),   # 2-3 paragraphs
+    "detailed": (300, 150)   # 3-4 paragraphs
+}
+
+def generate_length_summary(text, length="standard", document_type="general", doc_ir=None):
+    """Generate a single summary of the given length."""
     summarizer = get_domain_specific_summarizer(document_type)
-    
-    summaries = {}
-    
-    # Brief summary (1-2 sentences)
-    summaries["brief"] = generate_summary(text, summarizer, max_len=100, min_len=30)
-    
-    # Standard summary (2-3 paragraphs)
-    summaries["standard"] = generate_summary(text, summarizer, max_len=200, min_len=80)
-    
-    # Detailed summary (3-4 paragraphs)
-    summaries["detailed"] = generate_summary(text, summarizer, max_len=300, min_len=150)
-    
-    return summaries
+    max_len, min_len = SUMMARY_LENGTHS[length]
+    chunks = doc_ir.chunks(1000) if doc_ir is not None else None
+    return generate_summary(text, summarizer, max_len=max_len, min_len=min_len, chunks=chunks)
+
+def generate_multi_length_summaries(text, document_type="general", doc_ir=None):
+    """Generate summaries of different lengths."""
+    return {
+        length: generate_length_summary(text, length, document_type, doc_ir=doc_ir)
+        for length in SUMMARY_LENGTHS
+    }
 
-def generate_section_summaries(text):
+def generate_section_summaries(text, doc_ir=None):
     """Generate summaries for different sections of a document."""
     from preprocessing import extract_key_sections
     
-    sections = extract_key_sections(text)
+    sections = extract_key_sections(text, doc_ir=doc_ir)
     section_summaries = {}
     
     summarizer = load_summarizer()
     
     for section_name, section_text in sections.items():
         if section_text and len(section_text) > 50:
-            summary = generate_summary(section_text, summarizer, max_len=150, min_len=50)
+            chunks = doc_ir.section_chunks(section_name) if doc_ir is not None else None
+            summary = generate_summary(section_text, summarizer, max_len=150, min_len=50, chunks=chunks)
             section_summaries[section_name] = summary
     
     return section_summaries
 
-def extractive_summarization(text, top_k=5):
+def extractive_summarization(text, top_k=5, doc_ir=None):
     """Extractive summarization using sentence ranking."""
     from preprocessing import segment_text
     from sentence_transformers import SentenceTransformer
     import numpy as np
     
-    sentences = segment_text(text)
+    sentences = doc_ir.sentences if doc_ir is not None else segment_text(text)
     
     if len(sentences) <= top_k:
         return " ".join(sentences)
@@ -207,10 +215,10 @@ def extractive_summarization(text, top_k=5):
         # Fallback to first few sentences
         return " ".join(sentences[:top_k])
 
-def hybrid_summarization(text, document_type="general"):
+def hybrid_summarization(text, document_type="general", doc_ir=None):
     """Combine extractive and abstractive summarization."""
     # First, do extractive summarization to get key sentences
-    extractive_summary = extractive_summarization(text, top_k=8)
+    extractive_summary = extractive_summarization(text, top_k=8, doc_ir=doc_ir)
     
     # Then, do abstractive summarization on the extractive summary
     summarizer = get_domain_specific_summarizer(document_type)
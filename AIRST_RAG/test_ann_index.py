@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Test script for the IVF-PQ approximate index
+"""
+
+import os
+import sys
+import tempfile
+
+try:
+    import numpy as np
+    import ann_index
+except ImportError:
+    np = None
+
+def _add_files(index, rng, centers, files, chunks=50):
+    """Add files of chunks clustered around ``centers``."""
+    for number in files:
+        file_id = f"f{number}.pdf"
+        embeddings = centers[rng.integers(len(centers), size=chunks)]
+        embeddings = embeddings + rng.normal(scale=0.3, size=embeddings.shape)
+        index.add(
+            file_id,
+            [f"{file_id} chunk {i}" for i in range(chunks)],
+            embeddings,
+            [{"file_id": file_id, "page": 1, "section": "", "chunk": i} for i in range(chunks)]
+        )
+
+def _settings(**values):
+    saved = {name: getattr(ann_index, name) for name in values}
+    for name, value in values.items():
+        setattr(ann_index, name, value)
+    return saved
+
+def test_recall_against_exact():
+    """A build answers like exact search, including files written or deleted after it."""
+    print("🔍 Testing IVF-PQ recall...")
+
+    if np is None:
+        print("⚠️ NumPy not installed, skipping")
+        return True
+
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(20, 32))
+    saved = _settings(IVF_MIN_ROWS=1000, IVF_REBUILD_FRACTION=10.0)
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            index = ann_index.IvfBackend(directory).user_index("alice")
+            _add_files(index, rng, centers, range(60))
+            result = index.build(nlist=16, m=8, log=lambda message: None)
+            assert result["rows"] == 3000 and result["nlist"] == 16
+
+            # Probing every list leaves only the PQ approximation, which re-scoring removes
+            full = ann_index.measure_recall(index, top_k=10, queries=30, nprobe=16, rerank=200)
+            assert full["recall"] >= 0.95, full
+            narrow = ann_index.measure_recall(index, top_k=10, queries=30, nprobe=2, rerank=200)
+            assert narrow["recall"] <= full["recall"]
+
+            # Files added and deleted since the build
+            _add_files(index, rng, centers, [100])
+            new_chunk = index.get_file("f100.pdf")["embeddings"][7]
+            assert index.query(new_chunk, top_k=1)[0][1] == "f100.pdf chunk 7"
+            deleted_chunk = index.get_file("f3.pdf")["embeddings"][0]
+            index.delete_file("f3.pdf")
+            assert all(hit[0] != "f3.pdf" for hit in index.query(deleted_chunk, top_k=20))
+
+            # Compaction moves rows; the build still finds them
+            index.compact()
+            kept_chunk = index.get_file("f5.pdf")["embeddings"][2]
+            assert index.query(kept_chunk, top_k=1)[0][1] == "f5.pdf chunk 2"
+    finally:
+        _settings(**saved)
+
+    print("✅ IVF-PQ results match exact search")
+    return True
+
+def test_background_rebuild():
+    """Changes past the rebuild fraction start a background build; the old one serves until it is done."""
+    print("🔍 Testing IVF-PQ background rebuild...")
+
+    if np is None:
+        print("⚠️ NumPy not installed, skipping")
+        return True
+
+    rng = np.random.default_rng(1)
+    centers = rng.normal(size=(10, 16))
+    saved = _settings(IVF_MIN_ROWS=500, IVF_REBUILD_FRACTION=0.1, IVF_NLIST=8, IVF_PQ_M=4)
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            index = ann_index.IvfBackend(directory).user_index("alice")
+            _add_files(index, rng, centers, range(8))
+            # Below IVF_MIN_ROWS: exact search, nothing built
+            assert index.start_build() is None and index.query(centers[0], top_k=3)
+
+            _add_files(index, rng, centers, range(8, 12))
+            # The first search over IVF_MIN_ROWS builds in the background, and is exact meanwhile
+            assert len(index.query(centers[0], top_k=3)) == 3
+            index._build_thread.join()
+            first = index._current_build()
+            assert first is not None and first.rows == 600
+
+            _add_files(index, rng, centers, range(12, 14))
+            hits = index.query(centers[1], top_k=3)
+            assert len(hits) == 3
+            index._build_thread.join()
+            second = index._current_build()
+            assert second.name != first.name and second.rows == 700
+            assert not os.path.exists(os.path.join(index.directory, first.name))
+
+            # Another process's handle picks up the new build
+            other = ann_index.IvfBackend(directory).user_index("alice")
+            assert other._current_build().name == second.name
+    finally:
+        _settings(**saved)
+
+    print("✅ IVF-PQ rebuilds in the background")
+    return True
+
+def test_runs_without_origins():
+    """Runs written before origins were recorded keep apart the batches of one file."""
+    print("🔍 Testing IVF-PQ on a manifest without origins...")
+
+    if np is None:
+        print("⚠️ NumPy not installed, skipping")
+        return True
+
+    import json
+    rng = np.random.default_rng(2)
+    centers = rng.normal(size=(10, 16))
+    saved = _settings(IVF_MIN_ROWS=100, IVF_REBUILD_FRACTION=10.0)
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            index = ann_index.IvfBackend(directory).user_index("alice")
+            # One file written in three batches, as write_chunks does
+            embeddings = centers[rng.integers(len(centers), size=150)] + rng.normal(scale=0.3, size=(150, 16))
+            for batch in range(3):
+                rows = range(batch * 50, batch * 50 + 50)
+                index.add("big.pdf", [f"big.pdf chunk {i}" for i in rows], embeddings[batch * 50:batch * 50 + 50],
+                          [{"file_id": "big.pdf", "page": 1, "section": "", "chunk": i} for i in rows])
+            _add_files(index, rng, centers, range(3))
+
+            manifest_path = os.path.join(index.directory, "manifest.json")
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            for segment in manifest["segments"]:
+                segment["files"] = [run[:3] for run in segment["files"]]
+            with open(manifest_path, "w", encoding="utf-8") as f:
+                json.dump(manifest, f)
+
+            legacy = ann_index.IvfBackend(directory).user_index("alice")
+            legacy.build(nlist=8, m=4, log=lambda message: None)
+            for i in (0, 75, 149):
+                hits = legacy.query(embeddings[i], top_k=1, nprobe=8, rerank=50)
+                assert hits[0][1] == f"big.pdf chunk {i}", (i, hits)
+            assert legacy._current_view(legacy._current_build())[2] == 0
+
+            # A compaction keeps the origins, so the build still finds every batch
+            legacy.compact()
+            hits = legacy.query(embeddings[120], top_k=1, nprobe=8, rerank=50)
+            assert hits[0][1] == "big.pdf chunk 120", hits
+    finally:
+        _settings(**saved)
+
+    print("✅ Batches of one file stay apart without origins")
+    return True
+
+def main():
+    """Main test function."""
+    print("🤖 IVF-PQ Index Test Suite")
+    print("=" * 50)
+
+    if not test_recall_against_exact():
+        return False
+
+    if not test_background_rebuild():
+        return False
+
+    if not test_runs_without_origins():
+        return False
+
+    print("\n🎉 All IVF-PQ index tests passed!")
+    return True
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Test script for resumable bulk ingestion
+"""
+
+import os
+import sys
+import shutil
+
+import upload_store
+import vector_store
+from bulk_ingest import ingest_directory, load_checkpoint
+from testing_helpers import write_pdf, scratch_store
+
+def _indexed_files(backend, username):
+    index = backend.user_index(username)
+    return {hit[0] for hit in index.query([0.0] * 3 + [1.0], top_k=max(index.count(), 1))}
+
+def _write_paper(path, text):
+    write_pdf(path, [f"{text} Page {number} has a few sentences of content." for number in range(3)])
+
+def test_resume_skips_finished_files():
+    """A second run only ingests files the checkpoint has not recorded."""
+    print("🔍 Testing resumable bulk ingestion...")
+
+    try:
+        import fitz  # noqa: F401
+        import chromadb  # noqa: F401
+    except ImportError:
+        print("⚠️ PyMuPDF or chromadb not installed, skipping")
+        return True
+
+    with scratch_store() as directory:
+        papers = os.path.join(directory, "papers")
+        os.makedirs(os.path.join(papers, "nested"))
+        _write_paper(os.path.join(papers, "a.pdf"), "Alpha study.")
+        _write_paper(os.path.join(papers, "nested", "b.pdf"), "Beta study.")
+        shutil.copy(os.path.join(papers, "a.pdf"), os.path.join(papers, "a copy.pdf"))
+
+        backend = vector_store.open_backend("chroma", os.path.join(directory, "chroma"))
+        encoded = []
+        def encode(texts):
+            encoded.extend(texts)
+            return [[0.0] * 4 for _ in texts]
+
+        counts = ingest_directory(papers, "alice", backend, encode, workers=1, log=lambda line: None)
+        assert counts["files"] == 3 and counts["errors"] == 0, counts
+        # The duplicate shares one blob and one set of chunks
+        assert len(_indexed_files(backend, "alice")) == 2
+        first_encoded = len(encoded)
+
+        files = upload_store.get_user_files("alice")
+        assert files["a.pdf"] == files["a copy.pdf"] and os.path.join("nested", "b.pdf") in files
+        assert all(upload_store.get_blob(name)["indexed"] for name in files.values())
+
+        _write_paper(os.path.join(papers, "c.pdf"), "Gamma study.")
+        counts = ingest_directory(papers, "alice", backend, encode, workers=1, log=lambda line: None)
+        assert counts["files"] == 1 and counts["skipped"] == 3, counts
+        assert len(_indexed_files(backend, "alice")) == 3 and len(encoded) > first_encoded
+        checkpoint_path = os.path.join(papers, ".airst_ingest_checkpoint.jsonl")
+        assert len(load_checkpoint(checkpoint_path, "alice", "ChromaBackend")) == 4
+
+        # Another user's run reuses alice's embeddings
+        second_encoded = len(encoded)
+        counts = ingest_directory(papers, "bob", backend, encode, workers=1,
+                                  checkpoint_path=os.path.join(directory, "bob.jsonl"), log=lambda line: None)
+        assert counts["files"] == 4 and len(encoded) == second_encoded, counts
+        assert _indexed_files(backend, "bob") == _indexed_files(backend, "alice")
+
+        # The shared checkpoint only skips files finished for the same user and store
+        counts = ingest_directory(papers, "carol", backend, encode, workers=1, log=lambda line: None)
+        assert counts["files"] == 4 and counts["skipped"] == 0, counts
+        flat = vector_store.open_backend("flat", os.path.join(directory, "flat"))
+        counts = ingest_directory(papers, "alice", flat, encode, workers=1, log=lambda line: None)
+        assert counts["files"] == 4 and counts["skipped"] == 0, counts
+        assert len(_indexed_files(flat, "alice")) == 3
+        counts = ingest_directory(papers, "alice", flat, encode, workers=1, log=lambda line: None)
+        assert counts["files"] == 0 and counts["skipped"] == 4, counts
+
+    print("✅ Interrupted runs resume from the checkpoint")
+    return True
+
+def main():
+    """Main test function."""
+    print("🤖 Bulk Ingestion Test Suite")
+    print("=" * 50)
+
+    if not test_resume_skips_finished_files():
+        return False
+
+    print("\n🎉 All bulk ingestion tests passed!")
+    return True
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
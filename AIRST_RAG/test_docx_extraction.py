@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Test script for streaming DOCX extraction
+"""
+
+import os
+import sys
+import tempfile
+
+from docx_extraction import iter_docx_blocks, text_and_headings
+from preprocessing import iter_page_chunks
+
+def _write_docx(path):
+    from docx import Document
+    doc = Document()
+    doc.sections[0].header.paragraphs[0].text = "Acme Confidential"
+    doc.add_heading("Overview", level=1)
+    doc.add_paragraph("The pilot ran for six weeks across two sites.")
+    table = doc.add_table(rows=2, cols=2)
+    for r, values in enumerate([("Site", "Users"), ("Pune", "120")]):
+        for c, value in enumerate(values):
+            table.cell(r, c).text = value
+    doc.add_heading("Costs and Staffing", level=2)
+    doc.add_paragraph("Costs stayed within the approved budget.")
+    doc.add_heading("Outlook", level=1)
+    doc.add_paragraph("A third site joins next quarter.")
+    doc.save(path)
+
+def test_blocks_in_document_order():
+    """Paragraphs, tables and headers stream in order with style-based heading levels."""
+    print("🔍 Testing DOCX block stream...")
+
+    try:
+        import docx  # noqa: F401
+    except ImportError:
+        print("⚠️ python-docx not installed, skipping")
+        return True
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "report.docx")
+        _write_docx(path)
+        blocks = [b for b in iter_docx_blocks(path) if b["text"]]
+
+    assert [b["kind"] for b in blocks] == ["header", "paragraph", "paragraph", "table",
+                                           "paragraph", "paragraph", "paragraph", "paragraph"]
+    assert blocks[3]["text"] == "Site\tUsers\nPune\t120"
+    assert (blocks[1]["style"], blocks[1]["level"]) == ("Heading 1", 1)
+    assert blocks[4]["level"] == 2 and blocks[2]["level"] is None
+
+    text, headings = text_and_headings(blocks)
+    assert headings == {"Overview": 1, "Costs and Staffing": 2, "Outlook": 1}
+    assert text.startswith("Acme Confidential\nOverview\n")
+
+    # Heading styles feed the section parser: chunks split at level-1 headings only
+    chunks = list(iter_page_chunks([text], max_length=1000, headings=headings))
+    assert [c["section"] for c in chunks] == ["overview", "outlook"], chunks
+    assert "Pune 120" in chunks[0]["text"] and "Costs and Staffing" in chunks[0]["text"]
+
+    print("✅ Blocks, tables and heading levels extracted in order")
+    return True
+
+def main():
+    """Main test function."""
+    print("🤖 DOCX Extraction Test Suite")
+    print("=" * 50)
+
+    if not test_blocks_in_document_order():
+        return False
+
+    print("\n🎉 All DOCX extraction tests passed!")
+    return True
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
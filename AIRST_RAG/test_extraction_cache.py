@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Test script for the on-disk extraction cache
+"""
+
+import os
+import sys
+import time
+
+import extraction_cache
+from testing_helpers import scratch_store
+
+def test_hit_skips_extraction():
+    """A second read of the same content never calls the extractor."""
+    print("🔍 Testing extraction cache hits...")
+
+    calls = []
+    def extract():
+        calls.append(1)
+        yield "page one"
+        yield "page two"
+
+    with scratch_store():
+        directory = extraction_cache.EXTRACTION_CACHE_DIR
+        key = extraction_cache.cache_key("abc123", "pdf-none")
+        assert list(extraction_cache.cached_pages(key, extract)) == ["page one", "page two"]
+        assert list(extraction_cache.cached_pages(key, extract)) == ["page one", "page two"]
+        assert len(calls) == 1
+
+        # An abandoned extraction leaves no entry behind
+        partial = extraction_cache.cached_pages(extraction_cache.cache_key("def456", "pdf-none"), extract)
+        next(partial)
+        partial.close()
+        assert os.listdir(directory) == [f"{key}.jsonl"]
+
+    print("✅ Cached pages replayed without re-extraction")
+    return True
+
+def test_lru_eviction():
+    """Eviction removes the least recently read entries first."""
+    print("\n🧹 Testing LRU eviction...")
+
+    with scratch_store():
+        directory = extraction_cache.EXTRACTION_CACHE_DIR
+        keys = [extraction_cache.cache_key(f"file{i}", "docx") for i in range(3)]
+        for i, key in enumerate(keys):
+            list(extraction_cache.cached_pages(key, lambda: ["x" * 1000]))
+            os.utime(os.path.join(directory, f"{key}.jsonl"), (i, i))
+
+        # Reading the oldest entry makes it the most recently used
+        time.sleep(0.01)
+        list(extraction_cache.cached_pages(keys[0], lambda: []))
+
+        assert extraction_cache.evict(max_bytes=2100) == 1
+        assert sorted(os.listdir(directory)) == sorted(f"{k}.jsonl" for k in (keys[0], keys[2]))
+
+    print("✅ Least recently used entry evicted")
+    return True
+
+def main():
+    """Main test function."""
+    print("🤖 Extraction Cache Test Suite")
+    print("=" * 50)
+
+    for test in (test_hit_skips_extraction, test_lru_eviction):
+        if not test():
+            return False
+
+    print("\n🎉 All extraction cache tests passed!")
+    return True
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
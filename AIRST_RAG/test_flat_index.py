@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Test script for the flat (NumPy memmap) vector index
+"""
+
+import sys
+import tempfile
+import multiprocessing
+
+try:
+    import numpy as np
+    import file_lock
+    import flat_index
+except ImportError:
+    np = None
+
+def _add_files(index, rng, files, chunks=6, dimensions=16):
+    """Add random files; returns {(file_id, chunk): unit vector}."""
+    vectors = {}
+    for number in files:
+        file_id = f"f{number}.pdf"
+        embeddings = rng.normal(size=(chunks, dimensions))
+        index.add(
+            file_id,
+            [f"{file_id} chunk {i}" for i in range(chunks)],
+            embeddings,
+            [{"file_id": file_id, "page": 1, "section": "", "chunk": i} for i in range(chunks)]
+        )
+        for i, embedding in enumerate(embeddings):
+            vectors[(file_id, i)] = embedding / np.linalg.norm(embedding)
+    return vectors
+
+def _exact_top(vectors, query, top_k):
+    query = query / np.linalg.norm(query)
+    ranked = sorted(vectors, key=lambda key: -float(vectors[key] @ query))
+    return [f"{file_id} chunk {i}" for file_id, i in ranked[:top_k]]
+
+def test_matches_exact_search():
+    """Top-k results equal a brute-force cosine ranking, before and after deletes and compaction."""
+    print("🔍 Testing flat index search...")
+
+    if np is None:
+        print("⚠️ NumPy not installed, skipping")
+        return True
+
+    rng = np.random.default_rng(0)
+    saved = flat_index.FLAT_MAX_SEGMENTS
+    flat_index.FLAT_MAX_SEGMENTS = 4
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            index = flat_index.FlatBackend(directory).user_index("alice")
+            vectors = _add_files(index, rng, range(12))
+            # Small segments were merged as they piled up
+            assert len(index._load()["segments"]) <= flat_index.FLAT_MAX_SEGMENTS
+
+            query = rng.normal(size=16)
+            hits = index.query(query, top_k=8)
+            assert [hit[1] for hit in hits] == _exact_top(vectors, query, 8), hits
+            assert [hit[2] for hit in hits] == sorted(hit[2] for hit in hits)
+
+            index.delete_file("f3.pdf")
+            index.delete_file("f7.pdf")
+            vectors = {key: vector for key, vector in vectors.items() if key[0] not in ("f3.pdf", "f7.pdf")}
+            assert not index.has_file("f3.pdf") and index.count() == len(vectors)
+            assert [hit[1] for hit in index.query(query, top_k=8)] == _exact_top(vectors, query, 8)
+
+            index.compact()
+            assert len(index._load()["segments"]) == 1
+            assert [hit[1] for hit in index.query(query, top_k=8)] == _exact_top(vectors, query, 8)
+    finally:
+        flat_index.FLAT_MAX_SEGMENTS = saved
+
+    print("✅ Flat index results match exact search")
+    return True
+
+def test_reopen_and_shared_changes():
+    """A second handle (another process, or a restart) sees the same chunks and later changes."""
+    print("🔍 Testing flat index persistence...")
+
+    if np is None:
+        print("⚠️ NumPy not installed, skipping")
+        return True
+
+    rng = np.random.default_rng(1)
+    with tempfile.TemporaryDirectory() as directory:
+        writer = flat_index.FlatBackend(directory).user_index("alice")
+        vectors = _add_files(writer, rng, range(3))
+
+        reader = flat_index.FlatBackend(directory).user_index("alice")
+        assert reader.count() == len(vectors)
+        stored = reader.get_file("f1.pdf")
+        assert stored["documents"] == [f"f1.pdf chunk {i}" for i in range(6)]
+        # float16 storage keeps unit vectors to about three decimals
+        expected = np.array([vectors[("f1.pdf", i)] for i in range(6)])
+        assert np.abs(np.array(stored["embeddings"]) - expected).max() < 1e-2
+
+        writer.delete_file("f1.pdf")
+        _add_files(writer, rng, [9])
+        assert not reader.has_file("f1.pdf") and reader.has_file("f9.pdf")
+        assert [index.username for index in flat_index.FlatBackend(directory).user_indexes()] == ["alice"]
+
+    print("✅ Flat indexes persist and pick up changes")
+    return True
+
+def _add_from_process(directory, first):
+    """Child process body: add eight files numbered from ``first``."""
+    index = flat_index.FlatBackend(directory).user_index("alice")
+    _add_files(index, np.random.default_rng(first), range(first, first + 8))
+
+def test_writers_in_several_processes():
+    """Processes writing one index (the app and bulk_ingest.py) keep every file."""
+    print("🔒 Testing flat index writes from several processes...")
+
+    if np is None:
+        print("⚠️ NumPy not installed, skipping")
+        return True
+    if file_lock.fcntl is None:
+        print("⚠️ fcntl not available, skipping")
+        return True
+
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as directory:
+        workers = [context.Process(target=_add_from_process, args=(directory, first)) for first in (0, 100, 200)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+            assert worker.exitcode == 0
+
+        index = flat_index.FlatBackend(directory).user_index("alice")
+        assert index.count() == 3 * 8 * 6
+        assert all(index.has_file(f"f{first + i}.pdf") for first in (0, 100, 200) for i in range(8))
+
+    print("✅ No write lost between processes")
+    return True
+
+def main():
+    """Main test function."""
+    print("🤖 Flat Index Test Suite")
+    print("=" * 50)
+
+    if not test_matches_exact_search():
+        return False
+
+    if not test_reopen_and_shared_changes():
+        return False
+
+    if not test_writers_in_several_processes():
+        return False
+
+    print("\n🎉 All flat index tests passed!")
+    return True
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
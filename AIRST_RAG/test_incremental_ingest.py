@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Test script for incremental re-ingestion of revised documents
+"""
+
+import os
+import sys
+import tempfile
+
+from incremental_ingest import iter_revised_pages, embed_with_reuse, chunk_hash
+from preprocessing import iter_page_chunks
+from testing_helpers import write_pdf
+
+def _write_form_pdf(path, page_texts):
+    """Pages that all draw a form XObject through one identical content stream."""
+    import fitz
+    source = fitz.open()
+    for text in page_texts:
+        source.new_page().insert_text((72, 72), text)
+    doc = fitz.open()
+    for number in range(len(page_texts)):
+        page = doc.new_page()
+        page.show_pdf_page(page.rect, source, number)
+    doc.save(path)
+    doc.close()
+    source.close()
+
+def _page_text(number, edited=False):
+    sentences = [f"Sentence {i} on page {number} describes the results in detail." for i in range(12)]
+    if edited:
+        sentences[5] = f"Sentence 5 on page {number} was rewritten in the revision."
+    return " ".join(sentences)
+
+def test_only_changed_pages_are_reprocessed():
+    """Editing one page re-extracts that page and re-embeds only its chunks."""
+    print("🔍 Testing incremental re-ingestion...")
+
+    try:
+        import fitz  # noqa: F401
+    except ImportError:
+        print("⚠️ PyMuPDF not installed, skipping")
+        return True
+
+    with tempfile.TemporaryDirectory() as directory:
+        old_path = os.path.join(directory, "v1.pdf")
+        new_path = os.path.join(directory, "v2.pdf")
+        write_pdf(old_path, [_page_text(n) for n in range(20)])
+        write_pdf(new_path, [_page_text(n, edited=(n == 7)) for n in range(20)])
+
+        old_pages = list(iter_revised_pages(old_path, old_path, None))
+        stats = {}
+        new_pages = list(iter_revised_pages(new_path, old_path, old_pages, stats=stats))
+        assert stats == {"pages": 20, "extracted": 1}, stats
+        assert new_pages[8] == old_pages[8] and new_pages[7] != old_pages[7]
+
+        old_chunks = [c["text"] for c in iter_page_chunks(old_pages, max_length=300, page_aligned=True)]
+        new_chunks = [c["text"] for c in iter_page_chunks(new_pages, max_length=300, page_aligned=True)]
+        reusable = {chunk_hash(text): [0.0] for text in old_chunks}
+
+        encoded = []
+        def encode(texts):
+            encoded.extend(texts)
+            return [[1.0] for _ in texts]
+
+        embeddings, reused = embed_with_reuse(new_chunks, reusable, encode)
+        assert len(embeddings) == len(new_chunks)
+        assert all("page 7" in text for text in encoded), encoded
+        assert 0 < len(encoded) <= 3 and reused == len(new_chunks) - len(encoded)
+
+    print(f"✅ Re-extracted 1/20 pages and re-embedded {len(encoded)}/{len(new_chunks)} chunks")
+    return True
+
+def test_pages_sharing_a_content_stream():
+    """Pages are told apart by the resources they draw, and repeated pages are never reused."""
+    print("🔍 Testing revisions of form XObject pages...")
+
+    try:
+        import fitz  # noqa: F401
+    except ImportError:
+        print("⚠️ PyMuPDF not installed, skipping")
+        return True
+
+    with tempfile.TemporaryDirectory() as directory:
+        old_path = os.path.join(directory, "v1.pdf")
+        new_path = os.path.join(directory, "v2.pdf")
+        _write_form_pdf(old_path, ["Alpha one", "Beta two", "Gamma three", "Blank", "Blank"])
+        _write_form_pdf(new_path, ["Alpha one", "Beta revised", "Gamma three", "Blank", "Blank"])
+
+        old_pages = list(iter_revised_pages(old_path, old_path, None))
+        stats = {}
+        new_pages = list(iter_revised_pages(new_path, old_path, old_pages, stats=stats))
+        assert [page.strip() for page in new_pages] == ["Alpha one", "Beta revised", "Gamma three", "Blank", "Blank"]
+        # The edited page and both copies of the repeated page are extracted
+        assert stats == {"pages": 5, "extracted": 3}, stats
+        assert new_pages[0] == old_pages[0] and new_pages[2] == old_pages[2]
+
+    print("✅ Form XObject pages re-extracted only where they changed")
+    return True
+
+def main():
+    """Main test function."""
+    print("🤖 Incremental Ingestion Test Suite")
+    print("=" * 50)
+
+    if not test_only_changed_pages_are_reprocessed():
+        return False
+
+    if not test_pages_sharing_a_content_stream():
+        return False
+
+    print("\n🎉 All incremental ingestion tests passed!")
+    return True
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Test script for the language detection pre-filter
+"""
+
+import sys
+
+try:
+    from classification_module import _prefilter_language
+except ImportError:
+    _prefilter_language = None
+
+def test_danda_terminated_sentences():
+    """Marker words right before a danda still decide Marathi and Hindi."""
+    print("🔍 Testing the Devanagari pre-filter...")
+
+    if _prefilter_language is None:
+        print("⚠️ classification_module dependencies not installed, skipping")
+        return True
+
+    marathi = "हे पुस्तक खूप चांगले आहे। मला ते वाचायला आवडते। ते सर्वांना नाही।"
+    assert _prefilter_language(marathi) == {"label": "mr", "score": 0.9}
+
+    hindi = "यह किताब बहुत अच्छी है। मुझे पढ़ना पसंद है। वह घर पर नहीं॥"
+    assert _prefilter_language(hindi) == {"label": "hi", "score": 0.9}
+
+    print("✅ Danda-terminated sentences are recognised")
+    return True
+
+def main():
+    """Main test function."""
+    print("🤖 Language Detection Test Suite")
+    print("=" * 50)
+
+    if not test_danda_terminated_sentences():
+        return False
+
+    print("\n🎉 All language detection tests passed!")
+    return True
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
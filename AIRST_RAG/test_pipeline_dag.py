@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Test script for the pipeline stage scheduler
+"""
+
+import sys
+import time
+import threading
+
+from pipeline_dag import make_stage, run_stages, required_stages, clear_stage_memo
+
+def _build_stages(calls):
+    """Small diamond-shaped pipeline that records how often each stage runs."""
+    lock = threading.Lock()
+
+    def record(name, value, delay=0.0):
+        def run(**kwargs):
+            time.sleep(delay)
+            with lock:
+                calls[name] = calls.get(name, 0) + 1
+            return value(**kwargs)
+        return run
+
+    return [
+        make_stage("clean", record("clean", lambda text: text.strip()), inputs=("text",)),
+        make_stage("left", record("left", lambda clean: clean.upper(), 0.2), inputs=("clean",)),
+        make_stage("right", record("right", lambda clean: len(clean), 0.2), inputs=("clean",)),
+        make_stage("both", record("both", lambda left, right: f"{left}:{right}"), inputs=("left", "right")),
+    ]
+
+def test_dependency_order_and_parallelism():
+    """Independent stages run concurrently and dependents see their outputs."""
+    print("🔍 Testing dependency order and parallel execution...")
+    clear_stage_memo()
+    calls = {}
+
+    start = time.perf_counter()
+    values, report = run_stages(_build_stages(calls), {"text": " abc "})
+    elapsed = time.perf_counter() - start
+
+    assert values["both"] == "ABC:3"
+    assert all(info["status"] == "done" for info in report.values())
+    # left and right sleep 0.2s each; run serially this would take 0.4s
+    assert elapsed < 0.35, elapsed
+    print(f"✅ Diamond pipeline finished in {elapsed:.2f}s")
+    return True
+
+def test_subset_and_memoization():
+    """Requesting a subset runs only its dependencies; repeats hit the memo."""
+    print("\n🧠 Testing subset execution and memoization...")
+    clear_stage_memo()
+    calls = {}
+    stages = _build_stages(calls)
+
+    assert required_stages(stages, ["left"], available={"text"}) == {"clean", "left"}
+
+    values, _ = run_stages(stages, {"text": "abc"}, targets=["left"], cache_key="doc-1")
+    assert values["left"] == "ABC"
+    assert "right" not in calls
+
+    values, report = run_stages(stages, {"text": "abc"}, cache_key="doc-1")
+    assert calls["clean"] == 1 and calls["left"] == 1
+    assert report["left"]["status"] == "cached"
+    print("✅ Subset and memoized runs reuse earlier stage outputs")
+    return True
+
+def test_failure_skips_dependents():
+    """A failing stage marks its dependents as skipped instead of raising."""
+    print("\n🚨 Testing failure propagation...")
+    stages = [
+        make_stage("a", lambda text: 1 / 0, inputs=("text",)),
+        make_stage("b", lambda a: a + 1, inputs=("a",)),
+        make_stage("c", lambda text: text, inputs=("text",)),
+    ]
+
+    values, report = run_stages(stages, {"text": "x"})
+    assert report["a"]["status"].startswith("failed")
+    assert report["b"]["status"] == "skipped"
+    assert values["c"] == "x"
+    print("✅ Failed stage reported and dependents skipped")
+    return True
+
+def main():
+    """Main test function."""
+    print("🤖 Pipeline Scheduler Test Suite")
+    print("=" * 50)
+
+    for test in (test_dependency_order_and_parallelism, test_subset_and_memoization, test_failure_skips_dependents):
+        if not test():
+            return False
+
+    print("\n🎉 All scheduler tests passed!")
+    return True
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
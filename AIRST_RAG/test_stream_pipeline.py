@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Test script for the backpressured streaming pipeline
+"""
+
+import sys
+import time
+import threading
+
+from stream_pipeline import iter_pipeline, batched
+
+def test_stages_preserve_order():
+    """Items flow through every stage in order, including regrouping stages."""
+    print("🔍 Testing staged streaming...")
+
+    def double(items):
+        for item in items:
+            yield item * 2
+
+    def regroup(batches):
+        yield from batched((item for batch in batches for item in batch), 5)
+
+    outputs = list(iter_pipeline(batched(range(23), 4), [lambda batches: ([x * 2 for x in batch] for batch in batches), regroup]))
+    assert [x for batch in outputs for x in batch] == [x * 2 for x in range(23)]
+    assert [len(batch) for batch in outputs] == [5, 5, 5, 5, 3]
+    assert list(iter_pipeline(range(5), [double])) == [0, 2, 4, 6, 8]
+
+    print("✅ Outputs arrive in order")
+    return True
+
+def test_backpressure_bounds_memory():
+    """A slow consumer stops the source from running ahead of the queues."""
+    print("\n🚰 Testing backpressure...")
+
+    produced = []
+    def source():
+        for i in range(200):
+            produced.append(i)
+            yield i
+
+    def slow(items):
+        for item in items:
+            time.sleep(0.002)
+            yield item
+
+    consumed = 0
+    ahead = 0
+    for _ in iter_pipeline(source(), [slow, slow], queue_size=2):
+        consumed += 1
+        ahead = max(ahead, len(produced) - consumed)
+    # Three queues of two plus one item held by each of three threads
+    assert consumed == 200 and ahead <= 9, ahead
+
+    print(f"✅ Source ran at most {ahead} items ahead of the consumer")
+    return True
+
+def test_failure_stops_pipeline():
+    """A failing stage re-raises in the consumer and leaves no threads behind."""
+    print("\n💥 Testing failure propagation...")
+
+    def explode(items):
+        for item in items:
+            if item == 7:
+                raise ValueError("bad item")
+            yield item
+
+    threads_before = threading.active_count()
+    try:
+        list(iter_pipeline(range(1000), [explode, lambda items: items]))
+        assert False, "expected ValueError"
+    except ValueError as e:
+        assert str(e) == "bad item"
+    assert threading.active_count() == threads_before
+
+    print("✅ Stage errors reach the consumer")
+    return True
+
+def main():
+    """Main test function."""
+    print("🤖 Streaming Pipeline Test Suite")
+    print("=" * 50)
+
+    for test in (test_stages_preserve_order, test_backpressure_bounds_memory, test_failure_stops_pipeline):
+        if not test():
+            return False
+
+    print("\n🎉 All streaming pipeline tests passed!")
+    return True
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Test script for the text cleaning and segmentation engines
+"""
+
+import os
+import subprocess
+import sys
+
+from text_cleaning import apply_rules, clean_with_offsets, map_to_original
+from sentence_segmenter import sentence_spans, split_sentences
+from section_parser import parse_sections, build_section_tree, find_section, section_text
+
+SAMPLE_PDF_TEXT = (
+    "  Title\n\nPage 3\nSome text here, see  http://x.com/a and mail me@x.org now.\n"
+    "© 2024 All rights reserved\n12 of 30\nEnd.  "
+)
+
+def test_document_cleaning():
+    """Page artifacts, contact details and extra whitespace are removed."""
+    print("🧹 Testing document cleaning rules...")
+
+    cleaned = apply_rules(SAMPLE_PDF_TEXT, "document")
+    assert cleaned == "Title Some text here, see and mail now. End.", cleaned
+
+    # Individual rules can be switched off
+    kept = apply_rules(SAMPLE_PDF_TEXT, "document", disabled={"email"})
+    assert "me@x.org" in kept
+
+    print("✅ Document cleaning removes artifacts")
+    return True
+
+def test_document_cleaning_matches_legacy():
+    """Removals that join text into a new match behave like the original regex chain."""
+    print("\n🧹 Testing document cleaning against the original clean_text...")
+
+    from benchmarks import _legacy_clean_text
+    normalize = lambda text: " ".join(text.split())
+    for text in [
+        "© 2020a@b.com",
+        "[1]http://ex.com/aPage 3?",
+        "wordPage 3 © 2020a@b.coma@b.com",
+        "1Page 2 of 3 remains",
+        "All rights\nreserved here",
+        SAMPLE_PDF_TEXT,
+    ]:
+        expected = normalize(_legacy_clean_text(text))
+        assert apply_rules(text, "document") == expected, text
+        assert clean_with_offsets(text, "document")[0] == expected, text
+
+    print("✅ Document cleaning matches the original clean_text")
+    return True
+
+def test_offset_map():
+    """Offsets in cleaned text map back to the same words in the original."""
+    print("\n🧭 Testing cleaned-to-original offset map...")
+
+    cleaned, offset_map = clean_with_offsets(SAMPLE_PDF_TEXT, "document")
+    assert cleaned == apply_rules(SAMPLE_PDF_TEXT, "document")
+
+    for word in ["Title", "Some", "see", "now", "End"]:
+        original = map_to_original(offset_map, cleaned.index(word))
+        assert SAMPLE_PDF_TEXT[original:original + len(word)] == word, word
+
+    print("✅ Offset map points back to the original text")
+    return True
+
+def test_spacing_rules():
+    """Spacing around punctuation and citations is normalized in one pass."""
+    print("\n✍️ Testing summary spacing rules...")
+
+    text = "Hello ,world.This is [1] fine;ok [Paragraph 2, Lines 3-4]end"
+    expected = "Hello, world. This is [1] fine; ok [Paragraph 2, Lines 3-4] end"
+    assert apply_rules(text, "spacing") == expected
+    assert clean_with_offsets(text, "spacing")[0] == expected
+
+    print("✅ Spacing rules produce normalized text")
+    return True
+
+def test_sentence_segmenter():
+    """Abbreviations, citations and initials do not end sentences; dandas do."""
+    print("\n✂️ Testing sentence segmenter...")
+
+    text = "We follow Chen et al. [4]. Results improve. See Fig. 3 for details. J. Smith agreed."
+    assert split_sentences(text) == [
+        "We follow Chen et al. [4].",
+        "Results improve.",
+        "See Fig. 3 for details.",
+        "J. Smith agreed.",
+    ]
+
+    # Spans index into the original string
+    assert [text[s:e] for s, e in sentence_spans(text)] == split_sentences(text)
+
+    marathi = "महाराष्ट्र हे राज्य आहे। येथे मराठी बोलली जाते॥ शेवट"
+    assert len(split_sentences(marathi)) == 3
+
+    assert split_sentences("Prior work [12]. 1. Introduction Things matter.") == [
+        "Prior work [12].",
+        "1. Introduction Things matter.",
+    ]
+
+    # "et al." and "no." end a sentence before a capitalised word only
+    assert split_sentences("This follows Chen et al. The results hold.") == [
+        "This follows Chen et al.",
+        "The results hold.",
+    ]
+    assert split_sentences("Is it solved? The answer is no. We show why.") == [
+        "Is it solved?",
+        "The answer is no.",
+        "We show why.",
+    ]
+    assert split_sentences("See item no. 5 in the list.") == ["See item no. 5 in the list."]
+
+    # Dotted abbreviations stay inside the sentence
+    assert split_sentences("The U.S. Army funded it. Ph.D. students helped.") == [
+        "The U.S. Army funded it.",
+        "Ph.D. students helped.",
+    ]
+
+    print("✅ Sentence boundaries detected correctly")
+    return True
+
+SAMPLE_PAPER = """Contrastive Learning for HAR
+Abstract—We propose a method. This summary of our method is short.
+I. INTRODUCTION
+Activity recognition matters. In summary, methods help.
+II. PROPOSED SYSTEM
+We design things.
+3.1 Data Collection Process
+Details here.
+1. The model is trained on data
+IV. CONCLUSION
+It works.
+REFERENCES
+[1] A. Author, Title, 2020.
+
+[2] B. Author, Other, 2021.
+"""
+
+def test_section_parser():
+    """Only whole-line headings start sections; numbering gives the tree depth."""
+    print("\n📑 Testing section parser...")
+
+    sections = parse_sections(SAMPLE_PAPER)
+    assert [s["name"] for s in sections] == [
+        "abstract", "introduction", "methodology", "data_collection_process", "conclusion", "references"
+    ]
+
+    abstract = find_section(sections, "abstract")
+    assert SAMPLE_PAPER[abstract["content_start"]:].startswith("We propose")
+    assert section_text(SAMPLE_PAPER, find_section(sections, "introduction")) == (
+        "Activity recognition matters. In summary, methods help."
+    )
+    assert section_text(SAMPLE_PAPER, find_section(sections, "references"), keep_blank_lines=True) == (
+        "[1] A. Author, Title, 2020.\n\n[2] B. Author, Other, 2021."
+    )
+
+    tree = build_section_tree(sections)
+    methodology = [c for c in tree["children"] if c["name"] == "methodology"][0]
+    assert [c["name"] for c in methodology["children"]] == ["data_collection_process"]
+    assert "Details here." in SAMPLE_PAPER[methodology["content_start"]:methodology["end"]]
+
+    # Font cues promote otherwise unnumbered headings
+    with_fonts = parse_sections("Overview\nText body.\nOutlook\nMore.", font_headings={"Overview", "Outlook"})
+    assert [s["name"] for s in with_fonts] == ["overview", "outlook"]
+
+    # Author initials that look like roman numerals are not headings
+    assert parse_sections("C. Wang, Deep Learning For Vision\nV. Kumar, Robust Methods\n") == []
+    assert [s["name"] for s in parse_sections("XII. Future Directions\nText.")] == ["future_directions"]
+
+    print("✅ Section tree built from header lines")
+    return True
+
+def test_page_streaming():
+    """A sentence split across pages stays whole, and sections carry over."""
+    print("\n📄 Testing page streaming...")
+
+    from preprocessing import iter_page_chunks
+    pages = ["1. Introduction\nStreaming keeps memory flat. This sentence", "continues here.\n2. Results\nIt works."]
+    chunks = list(iter_page_chunks(pages, max_length=512))
+    assert [c["section"] for c in chunks] == ["introduction", "results"], chunks
+    assert chunks[0]["text"].endswith("This sentence continues here.")
+
+    print(f"✅ Page streaming: {len(chunks)} chunks")
+    return True
+
+def test_pdf_font_headings():
+    """Font cues found during extraction mark headings; running headers and plain bold lines end no chunk."""
+    print("\n🔠 Testing PDF font headings...")
+
+    try:
+        import fitz
+    except ImportError:
+        print("⚠️ PyMuPDF not installed, skipping")
+        return True
+
+    from ingestion import file_pages, prepare_chunks
+    from testing_helpers import scratch_store
+
+    with scratch_store() as directory:
+        path = os.path.join(directory, "paper.pdf")
+        doc = fitz.open()
+        body = "Plain body text about sensors. It goes on for a while here."
+        for number in range(2):
+            page = doc.new_page()
+            page.insert_text((72, 40), "Journal of Sensing", fontsize=11, fontname="hebo")
+            page.insert_text((72, 72), "Methods" if number == 0 else "Results", fontsize=18)
+            if number == 0:
+                page.insert_text((72, 100), "Key Observations", fontsize=11, fontname="hebo")
+            for line in range(5):
+                page.insert_text((72, 130 + 16 * line), body, fontsize=11)
+        doc.save(path)
+        doc.close()
+
+        for _ in range(2):  # extracted, then from the cache
+            headings = {}
+            list(file_pages(path, "paper-hash", "none", headings=headings))
+            assert headings == {"Methods": 1, "Results": 1, "Key Observations": 2}, headings
+
+        _, chunks = prepare_chunks(path, "paper-hash")
+        sections = [chunk["section"] for chunk in chunks if "sensors" in chunk["text"]]
+        assert sorted(set(sections)) == ["methodology", "results"], chunks
+
+    print("✅ PDF font headings start sections")
+    return True
+
+def test_preprocessing_import_is_offline():
+    """Importing preprocessing loads neither NLTK nor Streamlit; punkt falls back."""
+    print("\n📦 Testing lazy NLTK handling...")
+
+    code = (
+        "import sys, preprocessing; "
+        "print('nltk' in sys.modules, 'streamlit' in sys.modules)"
+    )
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+    assert output.strip() == "False False", output
+
+    import preprocessing
+    if preprocessing.get_punkt_tokenizer() is None:
+        assert preprocessing.segment_text("One. Two.", method="punkt") == ["One.", "Two."]
+
+    print("✅ preprocessing imports without touching NLTK")
+    return True
+
+def main():
+    """Main test function."""
+    print("🤖 Text Processing Test Suite")
+    print("=" * 50)
+
+    for test in (test_document_cleaning, test_document_cleaning_matches_legacy, test_offset_map, test_spacing_rules,
+                 test_sentence_segmenter, test_section_parser, test_page_streaming, test_pdf_font_headings,
+                 test_preprocessing_import_is_offline):
+        if not test():
+            return False
+
+    print("\n🎉 All text processing tests passed!")
+    return True
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
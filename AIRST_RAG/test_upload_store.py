@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Test script for the content-addressed upload store
+"""
+
+import os
+import sys
+import multiprocessing
+
+import file_lock
+import upload_store
+from testing_helpers import scratch_store
+
+def test_deduplication_and_refcounts():
+    """Identical bytes are stored once; the blob survives until its last reference goes."""
+    print("🔍 Testing upload deduplication and reference counts...")
+
+    with scratch_store():
+        name, blob, orphan = upload_store.store_upload("alice", "paper.pdf", b"%PDF same bytes")
+        assert name == upload_store.compute_file_hash(b"%PDF same bytes") + ".pdf"
+        assert blob["refs"] == {"alice": 1} and orphan is None
+
+        upload_store.mark_indexed(name)
+        again, blob, _ = upload_store.store_upload("bob", "Copy.PDF", b"%PDF same bytes")
+        assert again == name and blob["indexed"]
+        assert blob["refs"] == {"alice": 1, "bob": 1}
+        assert os.listdir(upload_store.UPLOAD_DIR) == [name]
+
+        assert upload_store.release_upload("alice", "paper.pdf") is None
+        assert upload_store.release_upload("bob", "Copy.PDF") == name
+        assert upload_store.get_blob(name) is None
+
+    print("✅ Shared blob released only after the last reference")
+    return True
+
+def test_legacy_migration():
+    """uuid-named duplicates collapse into one hashed blob with rebuilt refcounts."""
+    print("\n📦 Testing legacy upload migration...")
+
+    with scratch_store():
+        os.makedirs(upload_store.UPLOAD_DIR)
+        for legacy in ("aaa.pdf", "bbb.pdf"):
+            with open(upload_store.blob_path(legacy), "wb") as f:
+                f.write(b"%PDF duplicate")
+        upload_store.save_user_files({"carol": {"a.pdf": "aaa.pdf"}, "dave": {"b.pdf": "bbb.pdf"}})
+
+        renamed = upload_store.migrate_legacy_uploads()
+        stored = upload_store.compute_file_hash(b"%PDF duplicate") + ".pdf"
+        assert renamed == {"aaa.pdf": stored, "bbb.pdf": stored}
+        assert os.listdir(upload_store.UPLOAD_DIR) == [stored]
+        assert upload_store.get_blob(stored)["refs"] == {"carol": 1, "dave": 1}
+        assert upload_store.get_user_files("dave") == {"b.pdf": stored}
+
+    print("✅ Legacy uploads migrated to content-addressed blobs")
+    return True
+
+def _register_many(upload_dir, user_files_file, username, count):
+    """Child process body: reference ``count`` files for ``username`` one at a time."""
+    upload_store.UPLOAD_DIR = upload_dir
+    upload_store.USER_FILES_FILE = user_files_file
+    for i in range(count):
+        upload_store.store_upload(username, f"paper{i}.pdf", b"%PDF shared")
+
+def test_cross_process_updates():
+    """Concurrent processes (the app and bulk_ingest.py) do not lose each other's references."""
+    print("\n🔒 Testing user_files.json updates from several processes...")
+
+    if file_lock.fcntl is None:
+        print("⚠️ fcntl not available, skipping")
+        return True
+
+    with scratch_store():
+        context = multiprocessing.get_context("spawn")
+        users = [f"user{i}" for i in range(4)]
+        workers = [
+            context.Process(target=_register_many,
+                            args=(upload_store.UPLOAD_DIR, upload_store.USER_FILES_FILE, user, 10))
+            for user in users
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+            assert worker.exitcode == 0
+
+        stored = upload_store.compute_file_hash(b"%PDF shared") + ".pdf"
+        assert upload_store.get_blob(stored)["refs"] == {user: 10 for user in users}
+
+    print("✅ No reference lost between processes")
+    return True
+
+def main():
+    """Main test function."""
+    print("🤖 Upload Store Test Suite")
+    print("=" * 50)
+
+    for test in (test_deduplication_and_refcounts, test_legacy_migration, test_cross_process_updates):
+        if not test():
+            return False
+
+    print("\n🎉 All upload store tests passed!")
+    return True
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Test script for the persistent vector store and startup reconciliation
+"""
+
+import os
+import sys
+import tempfile
+
+import upload_store
+import vector_store
+from ingestion import ingest_stored_file, reconcile_index
+from testing_helpers import write_pdf, scratch_store
+
+def _encode(texts):
+    return [[float(len(text) % 7), 1.0, 0.5] for text in texts]
+
+def _open_backends(directory):
+    """(name, backend) of every backend whose dependencies are installed, stored under ``directory``."""
+    backends = []
+    for name, module in [("chroma", "chromadb"), ("flat", "numpy"), ("ivf", "numpy")]:
+        try:
+            __import__(module)
+        except ImportError:
+            print(f"⚠️ {module} not installed, skipping the {name} backend")
+            continue
+        backends.append((name, vector_store.open_backend(name, os.path.join(directory, name))))
+    return backends
+
+def _check_reconcile(backend, directory):
+    index = backend.user_index("alice")
+    names = []
+    for i, text in enumerate(["Alpha results are strong.", "Beta methods are simple."]):
+        path = os.path.join(directory, f"{i}.pdf")
+        write_pdf(path, [text])
+        with open(path, "rb") as f:
+            stored, blob, _ = upload_store.store_upload("alice", f"{i}.pdf", f.read())
+        assert ingest_stored_file(index, _encode, stored, blob, tables="none")["chunks"] == 1
+        upload_store.mark_indexed(stored)
+        names.append(stored)
+
+    stats = reconcile_index(backend, _encode, tables="none", log=lambda line: None)
+    assert (stats["files"], stats["missing"], stats["reindexed"]) == (2, 0, 0), stats
+
+    # Lose one file's embeddings
+    index.delete_file(names[1])
+    stats = reconcile_index(backend, _encode, tables="none", log=lambda line: None)
+    assert (stats["missing"], stats["reindexed"], stats["failed"]) == (1, 1, 0), stats
+    assert index.has_file(names[1])
+    assert upload_store.get_blob(names[1])["indexed"]
+
+    # A second user with the same content gets alice's chunks copied, not re-embedded
+    upload_store.register_uploads("bob", [("beta.pdf", names[1], 0)])
+    stats = reconcile_index(backend, _encode, tables="none", log=lambda line: None)
+    assert (stats["missing"], stats["copied"], stats["reindexed"]) == (1, 1, 0), stats
+    hits = backend.user_index("bob").query([3.0, 1.0, 0.5])
+    assert [hit[0] for hit in hits] == [names[1]], hits
+
+def test_reconcile_reindexes_only_missing():
+    """After a restart only files whose chunks are gone are re-indexed, and shared content is copied."""
+    print("🔍 Testing vector store reconciliation...")
+
+    try:
+        import fitz  # noqa: F401
+    except ImportError:
+        print("⚠️ PyMuPDF not installed, skipping")
+        return True
+
+    with tempfile.TemporaryDirectory() as directory:
+        for name, backend in _open_backends(directory):
+            with scratch_store(os.path.join(directory, name)):
+                _check_reconcile(backend, tempfile.mkdtemp(dir=directory))
+            print(f"   {name}: ok")
+
+    print("✅ Only the file with missing embeddings was re-indexed")
+    return True
+
+def test_search_is_scoped_to_user():
+    """A user's search only returns chunks of their own files."""
+    print("🔍 Testing per-user chunk indexes...")
+
+    with tempfile.TemporaryDirectory() as directory:
+        for name, backend in _open_backends(directory):
+            for username, file_id in [("alice", "a.pdf"), ("bob", "b.pdf"), ("carol@example.com", "shared.pdf")]:
+                backend.user_index(username).add(
+                    file_id,
+                    [f"{username} chunk {i}" for i in range(3)],
+                    [[float(i), 1.0, 0.0] for i in range(3)],
+                    [{"file_id": file_id, "page": 1, "section": "", "chunk": i} for i in range(3)]
+                )
+            bob = backend.user_index("bob")
+            assert vector_store.copy_file_chunks(backend.user_index("carol@example.com"), bob, "shared.pdf") == 3
+
+            hits = bob.query([0.0, 1.0, 0.0], top_k=10)
+            assert len(hits) == 6 and {hit[0] for hit in hits} == {"b.pdf", "shared.pdf"}, hits
+
+            backend.purge_file("shared.pdf")
+            assert [hit[1] for hit in bob.query([0.0, 1.0, 0.0])] == ["bob chunk 0", "bob chunk 1", "bob chunk 2"]
+            assert sorted(index.count() for index in backend.user_indexes()) == [0, 3, 3]
+            print(f"   {name}: ok")
+
+    print("✅ Searches only see the user's own chunks")
+    return True
+
+def test_query_embedding_cache():
+    """A query is embedded once per user within the TTL."""
+    print("🔍 Testing the query embedding cache...")
+
+    calls = []
+    def encode(texts):
+        calls.append(list(texts))
+        return [[float(len(text)), 1.0] for text in texts]
+
+    saved = vector_store.QUERY_CACHE_TTL
+    vector_store.clear_query_cache()
+    try:
+        assert vector_store.embed_query("what methods?", encode, "alice") == [13.0, 1.0]
+        vector_store.embed_query("what methods?", encode, "alice")
+        assert calls == [["what methods?"]]
+
+        vector_store.embed_query("what methods?", encode, "bob")
+        assert len(calls) == 2
+
+        vector_store.QUERY_CACHE_TTL = 0
+        vector_store.clear_query_cache()
+        vector_store.embed_query("what methods?", encode, "alice")
+        vector_store.embed_query("what methods?", encode, "alice")
+        assert len(calls) == 4
+    finally:
+        vector_store.QUERY_CACHE_TTL = saved
+        vector_store.clear_query_cache()
+
+    print("✅ Repeated searches reuse the query embedding")
+    return True
+
+def main():
+    """Main test function."""
+    print("🤖 Vector Store Test Suite")
+    print("=" * 50)
+
+    if not test_reconcile_reindexes_only_missing():
+        return False
+
+    if not test_search_is_scoped_to_user():
+        return False
+
+    if not test_query_embedding_cache():
+        return False
+
+    print("\n🎉 All vector store tests passed!")
+    return True
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,43 @@
+"""
+Helpers shared by the test scripts.
+"""
+
+import os
+import tempfile
+from contextlib import contextmanager, nullcontext
+
+def write_pdf(path, page_texts):
+    """Write a PDF with one page per text (needs PyMuPDF)."""
+    import fitz
+    doc = fitz.open()
+    for text in page_texts:
+        page = doc.new_page()
+        page.insert_textbox(page.rect + (50, 50, -50, -50), text)
+    doc.save(path)
+    doc.close()
+
+@contextmanager
+def scratch_store(directory=None):
+    """
+    Point the upload store and the extraction cache at a scratch directory.
+
+    ``upload_store.UPLOAD_DIR``, ``upload_store.USER_FILES_FILE`` and
+    ``extraction_cache.EXTRACTION_CACHE_DIR`` become ``uploads``,
+    ``user_files.json`` and ``cache`` under ``directory`` (default: a new
+    temporary directory) and are restored on exit.
+
+    Yields:
+        str: The directory
+    """
+    import upload_store
+    import extraction_cache
+
+    saved = upload_store.UPLOAD_DIR, upload_store.USER_FILES_FILE, extraction_cache.EXTRACTION_CACHE_DIR
+    with nullcontext(directory) if directory else tempfile.TemporaryDirectory() as root:
+        upload_store.UPLOAD_DIR = os.path.join(root, "uploads")
+        upload_store.USER_FILES_FILE = os.path.join(root, "user_files.json")
+        extraction_cache.EXTRACTION_CACHE_DIR = os.path.join(root, "cache")
+        try:
+            yield root
+        finally:
+            upload_store.UPLOAD_DIR, upload_store.USER_FILES_FILE, extraction_cache.EXTRACTION_CACHE_DIR = saved
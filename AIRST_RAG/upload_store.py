@@ -0,0 +1,302 @@
+"""
+Content-addressed store for uploaded files.
+
+Uploads are saved once under ``<sha256><ext>`` in ``UPLOAD_DIR``, so the same
+paper uploaded by several users (or several times) shares one file, one
+extraction and one set of chunks in the vector store. ``user_files.json``
+keeps each user's {original_name: stored_filename} mapping plus a reserved
+``_blobs`` section:
+
+    "_blobs": {
+        "<sha256>.pdf": {"sha256": ..., "size": ..., "refs": {"user": 1}, "indexed": true}
+    }
+
+A blob is dropped only when its last reference is released.
+"""
+
+import os
+import sys
+import json
+import shutil
+import hashlib
+
+from file_lock import FileLock
+
+# Directory to save uploaded files
+UPLOAD_DIR = "uploads"
+
+# User-specific file mapping (and blob reference counts)
+USER_FILES_FILE = "user_files.json"
+
+# Reserved key in USER_FILES_FILE holding blob metadata
+BLOBS_KEY = "_blobs"
+
+# Serializes read-modify-write cycles of USER_FILES_FILE across Streamlit sessions
+# and processes (the app and bulk_ingest.py); follows USER_FILES_FILE when it is patched
+_store_lock = FileLock(lambda: f"{USER_FILES_FILE}.lock")
+
+def compute_file_hash(data):
+    """SHA-256 hex digest of file bytes."""
+    return hashlib.sha256(data).hexdigest()
+
+def hash_file(path, block_size=1024 * 1024):
+    """SHA-256 hex digest of a file on disk, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def stored_filename_for(data, original_name):
+    """Content-addressed file name: the hash plus the original extension."""
+    extension = os.path.splitext(original_name)[1].lower()
+    return f"{compute_file_hash(data)}{extension}"
+
+def blob_path(stored_filename):
+    return os.path.join(UPLOAD_DIR, stored_filename)
+
+def load_user_files():
+    """Load user-specific file mappings (including the ``_blobs`` section)"""
+    if os.path.exists(USER_FILES_FILE):
+        with open(USER_FILES_FILE, "r") as f:
+            return json.load(f)
+    return {}
+
+def save_user_files(user_files):
+    """Save user-specific file mappings atomically"""
+    temp_path = f"{USER_FILES_FILE}.tmp"
+    with open(temp_path, "w") as f:
+        json.dump(user_files, f, indent=2)
+    os.replace(temp_path, USER_FILES_FILE)
+
+def get_user_files(username):
+    """Get {original_name: stored_filename} for a specific user"""
+    if username == BLOBS_KEY:
+        return {}
+    return load_user_files().get(username, {})
+
+def get_blob(stored_filename):
+    """Blob metadata, or None for files not managed by the store."""
+    return load_user_files().get(BLOBS_KEY, {}).get(stored_filename)
+
+def _release(user_files, username, original_name):
+    """Drop one reference; return the stored filename if nothing references it anymore."""
+    stored_filename = user_files.get(username, {}).pop(original_name, None)
+    if stored_filename is None:
+        return None
+
+    blob = user_files.get(BLOBS_KEY, {}).get(stored_filename)
+    if blob is None:
+        # Legacy upload without reference counts: it was only ever this user's
+        return stored_filename
+
+    refs = blob["refs"]
+    refs[username] = refs.get(username, 1) - 1
+    if refs[username] <= 0:
+        del refs[username]
+    if not refs:
+        del user_files[BLOBS_KEY][stored_filename]
+        return stored_filename
+    return None
+
+def add_reference(username, original_name, stored_filename):
+    """
+    Point a user's original file name at a stored blob.
+
+    Returns:
+        str: A stored filename that lost its last reference because the user
+        re-pointed ``original_name`` at different content, else None
+    """
+    if username == BLOBS_KEY:
+        raise ValueError(f"'{BLOBS_KEY}' is reserved")
+
+    with _store_lock:
+        user_files = load_user_files()
+        if user_files.get(username, {}).get(original_name) == stored_filename:
+            return None
+
+        orphan = _release(user_files, username, original_name)
+        user_files.setdefault(username, {})[original_name] = stored_filename
+        blob = user_files.setdefault(BLOBS_KEY, {}).get(stored_filename)
+        if blob is not None:
+            blob["refs"][username] = blob["refs"].get(username, 0) + 1
+        save_user_files(user_files)
+        return orphan if orphan != stored_filename else None
+
+def store_upload(username, original_name, data):
+    """
+    Save upload bytes by content hash and reference them for ``username``.
+
+    Returns:
+        tuple: (stored_filename, blob metadata, orphaned stored filename or None).
+        ``blob["indexed"]`` tells whether the content was already embedded.
+    """
+    stored_filename = stored_filename_for(data, original_name)
+    path = blob_path(stored_filename)
+
+    with _store_lock:
+        if not os.path.exists(path):
+            os.makedirs(UPLOAD_DIR, exist_ok=True)
+            temp_path = f"{path}.tmp"
+            with open(temp_path, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+
+        user_files = load_user_files()
+        blobs = user_files.setdefault(BLOBS_KEY, {})
+        if stored_filename not in blobs:
+            blobs[stored_filename] = {
+                "sha256": stored_filename.split(".")[0],
+                "size": len(data),
+                "refs": {},
+                "indexed": False
+            }
+            save_user_files(user_files)
+
+        orphan = add_reference(username, original_name, stored_filename)
+        return stored_filename, get_blob(stored_filename), orphan
+
+def store_file(source_path, stored_filename):
+    """Copy a file on disk into the store under ``stored_filename`` unless it is already there."""
+    path = blob_path(stored_filename)
+    if not os.path.exists(path):
+        os.makedirs(UPLOAD_DIR, exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        shutil.copyfile(source_path, temp_path)
+        os.replace(temp_path, path)
+
+def register_uploads(username, entries, indexed=True):
+    """
+    Reference many stored files for ``username`` with one read and write of USER_FILES_FILE.
+
+    Args:
+        entries (list): (original_name, stored_filename, size) tuples; the
+            files must already be in the store
+        indexed (bool): Record the blobs as embedded in the vector store
+
+    Returns:
+        tuple: (orphans, released). Orphans lost their last reference (the
+        caller deletes them and their chunks); released files are still
+        referenced by others but no longer by ``username`` (the caller drops
+        that user's chunks)
+    """
+    if username == BLOBS_KEY:
+        raise ValueError(f"'{BLOBS_KEY}' is reserved")
+
+    with _store_lock:
+        user_files = load_user_files()
+        blobs = user_files.setdefault(BLOBS_KEY, {})
+        files = user_files.setdefault(username, {})
+        orphans = []
+        released = set()
+
+        for original_name, stored_filename, size in entries:
+            blob = blobs.setdefault(stored_filename, {
+                "sha256": stored_filename.split(".")[0],
+                "size": size,
+                "refs": {},
+                "indexed": False
+            })
+            if indexed:
+                blob["indexed"] = True
+            if files.get(original_name) == stored_filename:
+                continue
+            previous = files.get(original_name)
+            orphan = _release(user_files, username, original_name)
+            if orphan and orphan != stored_filename:
+                orphans.append(orphan)
+            elif previous is not None:
+                released.add(previous)
+            files[original_name] = stored_filename
+            blob["refs"][username] = blob["refs"].get(username, 0) + 1
+
+        save_user_files(user_files)
+        # A blob released early in the batch may have been referenced again later on
+        orphans = [orphan for orphan in orphans if orphan not in blobs]
+        referenced = set(files.values())
+        return orphans, sorted(name for name in released if name not in referenced and name not in orphans)
+
+def mark_indexed(stored_filename, indexed=True):
+    """Record whether a blob's chunks and embeddings are in the vector store."""
+    mark_indexed_many([stored_filename], indexed)
+
+def mark_indexed_many(stored_filenames, indexed=True):
+    """``mark_indexed`` for several blobs with one read and write of USER_FILES_FILE."""
+    with _store_lock:
+        user_files = load_user_files()
+        changed = False
+        for stored_filename in stored_filenames:
+            blob = user_files.get(BLOBS_KEY, {}).get(stored_filename)
+            if blob is not None and blob.get("indexed") != indexed:
+                blob["indexed"] = indexed
+                changed = True
+        if changed:
+            save_user_files(user_files)
+
+def release_upload(username, original_name):
+    """
+    Remove a file from a user's list.
+
+    Returns:
+        str: The stored filename if no references remain (the caller deletes
+        the file and its chunks), else None
+    """
+    with _store_lock:
+        user_files = load_user_files()
+        orphan = _release(user_files, username, original_name)
+        save_user_files(user_files)
+        return orphan
+
+def migrate_legacy_uploads():
+    """
+    Rename uuid-named uploads to content hashes and merge duplicates.
+
+    Every user mapping is re-pointed at the hashed blob and reference counts
+    are rebuilt. Duplicate files are removed.
+
+    Returns:
+        dict: {legacy_filename: stored_filename}; the caller drops the legacy
+        Chroma collections, which are named after the legacy files
+    """
+    with _store_lock:
+        user_files = load_user_files()
+        blobs = user_files.setdefault(BLOBS_KEY, {})
+        renamed = {}
+
+        for username, files in user_files.items():
+            if username == BLOBS_KEY:
+                continue
+            for original_name, stored_filename in files.items():
+                if stored_filename in blobs:
+                    continue
+                if stored_filename not in renamed:
+                    path = blob_path(stored_filename)
+                    if not os.path.exists(path):
+                        continue
+                    with open(path, "rb") as f:
+                        data = f.read()
+                    new_name = stored_filename_for(data, original_name)
+                    if os.path.exists(blob_path(new_name)):
+                        os.remove(path)
+                    else:
+                        os.replace(path, blob_path(new_name))
+                    blobs.setdefault(new_name, {
+                        "sha256": new_name.split(".")[0],
+                        "size": len(data),
+                        "refs": {},
+                        "indexed": False
+                    })
+                    renamed[stored_filename] = new_name
+                new_name = renamed[stored_filename]
+                files[original_name] = new_name
+                blobs[new_name]["refs"][username] = blobs[new_name]["refs"].get(username, 0) + 1
+
+        save_user_files(user_files)
+        return renamed
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["migrate"]:
+        renamed = migrate_legacy_uploads()
+        print(f"✅ Migrated {len(renamed)} upload(s) into {len(set(renamed.values()))} content-addressed file(s)")
+    else:
+        print("Usage: python upload_store.py migrate")
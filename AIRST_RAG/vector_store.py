@@ -0,0 +1,300 @@
+"""
+Vector store shared by the Streamlit app and the bulk ingestion CLI.
+
+Chunks are stored through a backend chosen with ``AIRST_VECTOR_BACKEND``:
+
+- ``chroma`` (default): ChromaDB on disk in ``AIRST_CHROMA_PATH`` (default
+  ``chroma_db/``; ``:memory:`` for an ephemeral store)
+- ``flat``: exact search over float16 memory-mapped files in
+  ``AIRST_FLAT_INDEX_PATH`` (default ``flat_index/``, see flat_index.py),
+  with no dependency beyond NumPy
+- ``ivf``: the flat index plus an approximate IVF-PQ index per user, built in
+  the background, for tenants past exact search's latency (see ann_index.py)
+
+Either way embeddings survive restarts and documents indexed by
+``bulk_ingest.py`` are searchable from the app.
+
+Chunks are sharded by user: a backend hands out one chunk index per user
+holding the chunks of all their files, so a search is a single top-k query
+however many files the user, or the whole deployment, has. An index has:
+
+    add(file_id, documents, embeddings, metadatas)
+    get_file(file_id) -> {"documents", "embeddings", "metadatas"}
+    has_file(file_id), delete_file(file_id), count()
+    query(embedding, top_k) -> [(file_id, document, distance, metadata)]
+    start_build() -> background thread building a search index, or None
+
+and a backend:
+
+    user_index(username), user_indexes(), purge_file(file_id),
+    migrate_legacy_file(index, file_id), drop_legacy_file(file_id)
+
+Metadata holds "file_id", "page", "section" and "chunk". Distances are
+squared L2, so nearest first is smallest first for every backend.
+
+The app's backend is opened lazily by ``get_backend``, off the import path:
+the first search (or the startup reconciliation thread, see
+``ingestion.start_reconciliation``) pays the open cost, not every page load.
+"""
+
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+# Backend of the app and the bulk CLI: "chroma", "flat" or "ivf"
+VECTOR_BACKEND = os.getenv("AIRST_VECTOR_BACKEND", "chroma")
+
+# Directory of the persistent Chroma database; ":memory:" for an in-memory store
+CHROMA_PATH = os.getenv("AIRST_CHROMA_PATH", "chroma_db")
+
+# Directory of the flat and ivf backends
+FLAT_INDEX_PATH = os.getenv("AIRST_FLAT_INDEX_PATH", "flat_index")
+
+IN_MEMORY = ":memory:"
+
+# Seconds a query's embedding is reused for the same user and query text
+QUERY_CACHE_TTL = float(os.getenv("AIRST_QUERY_CACHE_TTL", 300))
+
+# Number of (user, query) embeddings kept in memory
+MAX_CACHED_QUERIES = 256
+
+_backend = None
+_backend_lock = threading.Lock()
+_store_stats = {"backend": None, "path": None, "open_seconds": None, "first_query_seconds": None}
+
+# {(username, query): (expiry time, embedding)}, least recently used first
+_query_cache = OrderedDict()
+_query_cache_lock = threading.Lock()
+
+def get_chroma_client(path=None):
+    """A new persistent Chroma client for ``path`` (default ``CHROMA_PATH``), or an in-memory one."""
+    from chromadb.config import Settings
+
+    path = path or CHROMA_PATH
+    if path != IN_MEMORY:
+        from chromadb import PersistentClient
+        return PersistentClient(path=path, settings=Settings(anonymized_telemetry=False))
+
+    from chromadb import Client
+    return Client(Settings(anonymized_telemetry=False))
+
+def _open_chroma(path):
+    return ChromaBackend(get_chroma_client(path))
+
+def _open_flat(path):
+    from flat_index import FlatBackend
+    return FlatBackend(path or FLAT_INDEX_PATH)
+
+def _open_ivf(path):
+    from ann_index import IvfBackend
+    return IvfBackend(path or FLAT_INDEX_PATH)
+
+# Backend name -> opener taking a path (None for the backend's default)
+BACKENDS = {
+    "chroma": _open_chroma,
+    "flat": _open_flat,
+    "ivf": _open_ivf,
+}
+
+def backend_path(name=None):
+    """Default storage path of a backend."""
+    return {"chroma": CHROMA_PATH, "flat": FLAT_INDEX_PATH, "ivf": FLAT_INDEX_PATH}.get(name or VECTOR_BACKEND)
+
+def open_backend(name=None, path=None):
+    """A new backend ``name`` (default ``VECTOR_BACKEND``) stored at ``path`` (default: its own)."""
+    name = name or VECTOR_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown vector backend: {name} (choose from {', '.join(BACKENDS)})")
+    return BACKENDS[name](path)
+
+def get_backend():
+    """The process-wide backend, opened on first use."""
+    global _backend
+    if _backend is not None:
+        return _backend
+    with _backend_lock:
+        if _backend is None:
+            start = time.perf_counter()
+            _backend = open_backend()
+            _store_stats["backend"] = VECTOR_BACKEND
+            _store_stats["path"] = backend_path()
+            _store_stats["open_seconds"] = time.perf_counter() - start
+            print(f"🗄️ Opened {VECTOR_BACKEND} vector store {_store_stats['path']} "
+                  f"in {_store_stats['open_seconds'] * 1000:.0f} ms")
+    return _backend
+
+def record_query(seconds):
+    """Note a search's latency; the first one after a restart is kept for reporting."""
+    if _store_stats["first_query_seconds"] is None:
+        _store_stats["first_query_seconds"] = seconds
+        print(f"🔎 First vector store query took {seconds * 1000:.0f} ms")
+
+def get_store_stats():
+    """Backend, open time and first-query latency of this process's store."""
+    return dict(_store_stats)
+
+def embed_query(query, encode, username=None):
+    """
+    Embedding of ``query`` from ``encode``, the model the chunks were embedded with.
+
+    Cached per (user, query) for ``QUERY_CACHE_TTL`` seconds, so repeating a
+    search (or a Streamlit rerun) does not run the model again.
+    """
+    key = (username, query)
+    now = time.monotonic()
+    with _query_cache_lock:
+        cached = _query_cache.get(key)
+        if cached is not None and cached[0] > now:
+            _query_cache.move_to_end(key)
+            return cached[1]
+
+    embedding = encode([query])[0]
+
+    with _query_cache_lock:
+        _query_cache[key] = (now + QUERY_CACHE_TTL, embedding)
+        _query_cache.move_to_end(key)
+        while len(_query_cache) > MAX_CACHED_QUERIES:
+            _query_cache.popitem(last=False)
+    return embedding
+
+def clear_query_cache():
+    with _query_cache_lock:
+        _query_cache.clear()
+
+# Prefix of per-user index names
+USER_INDEX_PREFIX = "chunks-"
+
+def user_index_name(username):
+    """Name of the user's index (hashed: Chroma collection names only allow [a-zA-Z0-9._-])."""
+    return USER_INDEX_PREFIX + hashlib.sha256(username.encode("utf-8")).hexdigest()[:32]
+
+def chunk_id(file_id, index):
+    return f"{file_id}/{index}"
+
+def copy_file_chunks(source, target, file_id):
+    """
+    Copy a file's chunks from one user's index to another's.
+
+    Embeddings are copied, not recomputed, so a second user uploading the same
+    content costs one read and one write.
+
+    Returns:
+        int: Chunks copied (0 if ``source`` does not have the file)
+    """
+    stored = source.get_file(file_id)
+    if not stored["documents"]:
+        return 0
+    target.add(file_id, stored["documents"], stored["embeddings"], stored["metadatas"])
+    return len(stored["documents"])
+
+# ---------- Chroma backend ----------
+# Each user's index is a collection. Chroma applies ``where`` filters by
+# scanning every matching record, so one shared collection filtered by user
+# gets slower as a tenant grows; an unfiltered query of the user's collection
+# stays on the HNSW index
+
+class ChromaIndex:
+    """One user's chunks in a Chroma collection."""
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.name = collection.name
+
+    def add(self, file_id, documents, embeddings, metadatas):
+        self.collection.add(
+            ids=[chunk_id(file_id, metadata["chunk"]) for metadata in metadatas],
+            documents=list(documents),
+            embeddings=embeddings,
+            metadatas=list(metadatas)
+        )
+
+    def get_file(self, file_id):
+        stored = self.collection.get(where={"file_id": file_id}, include=["documents", "embeddings", "metadatas"])
+        embeddings = stored["embeddings"]
+        return {
+            "documents": stored["documents"] or [],
+            "embeddings": [] if embeddings is None else embeddings,
+            "metadatas": stored["metadatas"] or []
+        }
+
+    def has_file(self, file_id):
+        return bool(self.collection.get(where={"file_id": file_id}, limit=1, include=[])["ids"])
+
+    def delete_file(self, file_id):
+        self.collection.delete(where={"file_id": file_id})
+
+    def count(self):
+        return self.collection.count()
+
+    def query(self, embedding, top_k=5):
+        result = self.collection.query(
+            query_embeddings=[embedding],
+            n_results=top_k,
+            include=["documents", "distances", "metadatas"]
+        )
+        return [
+            (metadata["file_id"], document, distance, metadata)
+            for document, distance, metadata in zip(
+                result["documents"][0], result["distances"][0], result["metadatas"][0]
+            )
+        ]
+
+    def start_build(self):
+        # Chroma keeps its HNSW index up to date on every write
+        return None
+
+class ChromaBackend:
+    """Per-user chunk collections in one Chroma database."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def user_index(self, username):
+        """The user's index, created on first use."""
+        return ChromaIndex(self.client.get_or_create_collection(
+            name=user_index_name(username), metadata={"user": username}
+        ))
+
+    def user_indexes(self):
+        """Every user's index."""
+        for collection in self.client.list_collections():
+            if collection.name.startswith(USER_INDEX_PREFIX):
+                yield ChromaIndex(collection)
+
+    def _collection_names(self):
+        return [c.name for c in self.client.list_collections()]
+
+    def purge_file(self, file_id):
+        """Delete a file's chunks from every user's index, and its pre-shard per-file collection."""
+        for index in self.user_indexes():
+            index.delete_file(file_id)
+        self.drop_legacy_file(file_id)
+
+    def migrate_legacy_file(self, index, file_id):
+        """Copy a per-file collection from before chunks were sharded by user into ``index``; False if none."""
+        if file_id not in self._collection_names():
+            return False
+        legacy = self.client.get_collection(name=file_id).get(include=["documents", "embeddings", "metadatas"])
+        if not legacy["ids"]:
+            return False
+        index.add(
+            file_id,
+            legacy["documents"],
+            legacy["embeddings"],
+            [
+                {
+                    "file_id": file_id,
+                    "page": (metadata or {}).get("page", 1),
+                    "section": (metadata or {}).get("section", ""),
+                    "chunk": int(legacy_id) if legacy_id.isdigit() else position
+                }
+                for position, (legacy_id, metadata) in enumerate(zip(legacy["ids"], legacy["metadatas"]))
+            ]
+        )
+        return True
+
+    def drop_legacy_file(self, file_id):
+        if file_id in self._collection_names():
+            self.client.delete_collection(name=file_id)